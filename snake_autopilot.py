@@ -0,0 +1,274 @@
+import argparse
+import time
+from array import array
+from collections import deque
+
+from snake_core import ACTIONS, is_reverse, percentile
+from snake_profiler import RingBuffer
+
+# Built-in AI player for demo kiosks and soak tests. It drives the same
+# snake_core.Game the keyboard does, one turn per tick.
+#
+# Planning is a breadth-first search outward from the food on the
+# wrap-around grid. The food doesn't move until it is eaten and body cells
+# only free up as the tail moves on, so a distance field computed once
+# stays usable while the snake walks down it. The search is resumable: when
+# a tick's time budget runs out it carries on from the same frontier next
+# tick, and the snake makes a safe fallback move in the meantime. Every
+# move is also checked not to seal the head into a pocket it can't get out
+# of before the tail moves away.
+
+
+class Autopilot:
+    # budget_ms: planning time allowed per tick
+    # window: how many recent ticks the timing stats cover
+    def __init__(self, game, budget_ms=1.0, window=600):
+        self.game = game
+        self.budget = budget_ms / 1000
+        self.times = RingBuffer(window)
+        self.searches = 0
+        self.fallbacks = 0
+        self.timeouts = 0
+        self.over_budget = 0  # Ticks that took longer than budget_ms, all told
+        self.build()
+
+    def build(self):
+        # Per-board tables, allocated once and reused by every search
+        game = self.game
+        cols, rows = game.cols, game.rows
+        cells = cols * rows
+        self.cols = cols
+        # Neighbours of cell i are neighbors[4 * i:4 * i + 4], in ACTIONS
+        # order. Built a row at a time from shifted slices of range(cells),
+        # so a 1000x1000 board costs 16 MB and no per-cell Python objects
+        base = array('i', range(cells))
+        self.neighbors = array('i', bytes(4 * base.itemsize * cells))
+        for d, (dx, dy) in enumerate(ACTIONS):
+            shifted = array('i')
+            k = dx % cols
+            for y in range(rows):
+                row = base[(y + dy) % rows * cols:((y + dy) % rows + 1) * cols]
+                shifted += row[k:] + row[:k]
+            self.neighbors[d::4] = shifted
+        self.entered = array('q', bytes(8 * cells))  # Tick the head entered each body cell
+        self.dist = array('l', bytes(array('l').itemsize * cells))
+        self.label = array('L', bytes(array('L').itemsize * cells))  # Search generation per cell
+        self.seen = array('L', bytes(array('L').itemsize * cells))  # Flood generation per cell
+        self.generation = 0
+        self.flood = 0
+        self.frontier = deque()
+        self.target = None
+        self.exhausted = False
+        self.last_tick = None
+
+    def sync(self):
+        # Keep entered[] in step with the snake: one write per tick, or a
+        # walk over the body after a reset or a missed tick
+        game = self.game
+        positions = game.snake.positions
+        cols = self.cols
+        if self.last_tick is not None and game.ticks == self.last_tick + 1:
+            x, y = positions[0]
+            self.entered[y * cols + x] = game.ticks
+        elif game.ticks != self.last_tick:
+            for k, (x, y) in enumerate(positions):
+                self.entered[y * cols + x] = game.ticks - k
+            self.target = None
+        self.last_tick = game.ticks
+
+    def vacates_by(self, i, tick):
+        # True if cell i is empty, or its body segment is gone by the move on `tick`
+        if not self.game.board.occupancy[i]:
+            return True
+        snake = self.game.snake
+        return self.entered[i] + snake.length + snake.grow_pending <= tick
+
+    def start_search(self, target):
+        self.generation += 1
+        self.target = target
+        self.exhausted = False
+        self.dist[target] = 0
+        self.label[target] = self.generation
+        self.frontier.clear()
+        self.frontier.append(target)
+        self.searches += 1
+
+    def search(self, head, deadline):
+        # Grow the distance field until it reaches the head, runs out of
+        # cells or runs out of time
+        frontier = self.frontier
+        label, dist, neighbors = self.label, self.dist, self.neighbors
+        generation = self.generation
+        occupancy, entered = self.game.board.occupancy, self.entered
+        snake = self.game.snake
+        # Body cells that are free by the next move (inlined vacates_by)
+        freed_before = self.game.ticks + 1 - snake.length - snake.grow_pending
+        expanded = 0
+        while frontier and label[head] != generation:
+            expanded += 1
+            if not expanded & 15 and time.perf_counter() > deadline:
+                self.timeouts += 1
+                return
+            cell = frontier.popleft()
+            d = dist[cell] + 1
+            for n in neighbors[4 * cell:4 * cell + 4]:
+                if label[n] != generation and (not occupancy[n] or n == head
+                                               or entered[n] <= freed_before):
+                    label[n] = generation
+                    dist[n] = d
+                    if n != head:
+                        frontier.append(n)
+        if not frontier and label[head] != generation:
+            self.exhausted = True
+
+    def safe(self, start, deadline):
+        # Flood from the cell the head would move to. Safe when the pocket
+        # holds more cells than the snake, or touches a body segment that
+        # will have moved on by the time the head could get there (so the
+        # head can keep following the tail). Unknown when out of time,
+        # which counts as safe.
+        snake = self.game.snake
+        limit = snake.length + snake.grow_pending
+        if start == self.target:
+            limit += 1
+        tick = self.game.ticks + 1
+        if time.perf_counter() > deadline:
+            return True
+        self.flood += 1
+        flood, seen = self.flood, self.seen
+        occupancy, entered, neighbors = self.game.board.occupancy, self.entered, self.neighbors
+        seen[start] = flood
+        # Breadth first, a ring of cells at a time; the head can reach the
+        # ring's neighbours on the move at `arrive`
+        ring = [start]
+        arrive = tick + 1
+        count = 1
+        expanded = 0
+        while ring:
+            outer = []
+            for cell in ring:
+                expanded += 1
+                if not expanded & 15 and time.perf_counter() > deadline:
+                    return True
+                for n in neighbors[4 * cell:4 * cell + 4]:
+                    if seen[n] == flood:
+                        continue
+                    seen[n] = flood
+                    if occupancy[n]:
+                        if entered[n] + limit <= arrive:
+                            return True
+                        continue
+                    count += 1
+                    if count > limit:
+                        return True
+                    outer.append(n)
+            ring = outer
+            arrive += 1
+        return False
+
+    def next_turn(self):
+        # Direction for the coming tick
+        start = time.perf_counter()
+        # Searches only look at the clock every 16 cells, and the choosing
+        # after them takes a little too, so stop them with 5% to spare
+        deadline = start + self.budget * 0.95
+        game = self.game
+        self.sync()
+        cols = self.cols
+        heading = game.snake.direction
+        hx, hy = game.snake.positions[0]
+        head = hy * cols + hx
+        fx, fy = game.food.position
+        food = fy * cols + fx
+
+        if food != self.target or self.exhausted:
+            self.start_search(food)
+        self.search(head, start + self.budget * 0.6)
+
+        next_tick = game.ticks + 1
+        moves = [(n, direction) for n, direction in zip(self.neighbors[4 * head:4 * head + 4], ACTIONS)
+                 if not is_reverse(direction, heading) and self.vacates_by(n, next_tick)]
+
+        choice = None
+        labelled = [(self.dist[n], n, direction) for n, direction in moves
+                    if self.label[n] == self.generation]
+        if labelled:
+            _, n, direction = min(labelled)
+            if self.safe(n, deadline):
+                choice = direction
+        elif self.label[head] == self.generation:
+            # The field reached us but the cells it crossed have filled
+            # since; search again from scratch next tick
+            self.exhausted = True
+
+        if choice is None:
+            # Fallback: keep heading if that is safe, else any safe move,
+            # else any move that doesn't crash right away
+            self.fallbacks += 1
+            moves.sort(key=lambda move: move[1] != heading)
+            for n, direction in moves:
+                if self.safe(n, deadline):
+                    choice = direction
+                    break
+            else:
+                choice = moves[0][1] if moves else heading
+
+        elapsed = time.perf_counter() - start
+        if elapsed > self.budget:
+            self.over_budget += 1
+        self.times.add(elapsed * 1000)
+        return choice
+
+    def stats(self):
+        values = sorted(self.times.values())
+        if not values:
+            return {"ticks": 0}
+        return {
+            "ticks": len(values),
+            "mean_ms": round(sum(values) / len(values), 4),
+            "p50_ms": round(percentile(values, 50), 4),
+            "p95_ms": round(percentile(values, 95), 4),
+            "p99_ms": round(percentile(values, 99), 4),
+            "max_ms": round(values[-1], 4),
+            "searches": self.searches,
+            "fallbacks": self.fallbacks,
+            "timeouts": self.timeouts,
+            "over_budget": self.over_budget,
+        }
+
+
+def soak(cols, rows, steps, seed, budget_ms, length=1):
+    # Plays headless games back to back; length > 1 starts each game with
+    # a snake already that long (laid along a serpentine, see snake_core)
+    import snake_core
+
+    game = snake_core.Game(cols, rows, seed=seed)
+    cycle = snake_core.serpentine_cycle(cols, rows) if length > 1 else None
+    autopilot = Autopilot(game, budget_ms)
+    scores = []
+    if cycle:
+        snake_core.layout_snake(game, cycle, length)
+    for _ in range(steps):
+        _, done = game.step(autopilot.next_turn())
+        if done or not game.board.free_cells:
+            scores.append(game.score)
+            game.reset()
+            if cycle:
+                snake_core.layout_snake(game, cycle, length)
+    return scores, autopilot.stats()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless autopilot soak test")
+    parser.add_argument("--cols", type=int, default=80)
+    parser.add_argument("--rows", type=int, default=60)
+    parser.add_argument("--steps", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--budget", type=float, default=1.0, help="planning budget per tick (ms)")
+    parser.add_argument("--length", type=int, default=1, help="starting snake length")
+    args = parser.parse_args()
+
+    scores, stats = soak(args.cols, args.rows, args.steps, args.seed, args.budget, args.length)
+    print(f"games finished: {len(scores)}, scores: {scores[:20]}{' ...' if len(scores) > 20 else ''}")
+    for key, value in stats.items():
+        print(f"{key}: {value}")
@@ -0,0 +1,171 @@
+import argparse
+import time
+
+import numpy as np
+
+from snake_core import COLS, ROWS
+
+# N games of snake stepped together with NumPy. Same rules as
+# snake_core.Game for movement: wrap-around edges, no reversing, growth on
+# the tick after eating, and a self-collision ends the game. Power-ups and
+# levels only change real-time speed, so they are left out here.
+#
+# Cells are flat indices (y * cols + x). Each game keeps its body in a ring
+# buffer with one slot per board cell, so the snake can fill the board.
+
+# Action indices match snake_core.ACTIONS: UP, DOWN, LEFT, RIGHT.
+# -1 keeps the current heading.
+DX = np.array([0, 0, -1, 1], dtype=np.int64)
+DY = np.array([-1, 1, 0, 0], dtype=np.int64)
+OPPOSITE = np.array([1, 0, 3, 2], dtype=np.int8)
+
+# Observation values
+EMPTY, BODY, HEAD, FOOD = 0, 1, 2, 3
+
+
+class BatchGame:
+    def __init__(self, n, cols=COLS, rows=ROWS, seed=None):
+        self.n = n
+        self.cols = cols
+        self.rows = rows
+        self.cells = cols * rows
+        self.rng = np.random.default_rng(seed)
+
+        cell_dtype = np.int16 if self.cells < 2**15 else np.int32
+        self.body = np.zeros((n, self.cells), dtype=cell_dtype)
+        self.occupancy = np.zeros((n, self.cells), dtype=np.uint8)
+        self.head_ptr = np.zeros(n, dtype=np.int64)
+        self.tail_ptr = np.zeros(n, dtype=np.int64)
+        self.head = np.zeros(n, dtype=np.int64)
+        self.length = np.zeros(n, dtype=np.int64)
+        self.direction = np.zeros(n, dtype=np.int8)
+        self.grow_pending = np.zeros(n, dtype=bool)
+        self.food = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.ticks = np.zeros(n, dtype=np.int64)
+
+        self.rows_index = np.arange(n)
+        self.obs = np.zeros((n, rows, cols), dtype=np.uint8)
+        self.reset()
+
+    def reset(self, mask=None):
+        idx = self.rows_index if mask is None else np.flatnonzero(mask)
+        if idx.size == 0:
+            return
+        start = (self.rows // 2) * self.cols + self.cols // 2
+        self.occupancy[idx] = 0
+        self.occupancy[idx, start] = 1
+        self.body[idx, 0] = start
+        self.head_ptr[idx] = 0
+        self.tail_ptr[idx] = 0
+        self.head[idx] = start
+        self.length[idx] = 1
+        self.direction[idx] = 3  # RIGHT
+        self.grow_pending[idx] = False
+        self.score[idx] = 0
+        self.ticks[idx] = 0
+        self.spawn_food(idx)
+
+    def spawn_food(self, idx):
+        # Uniform choice among each board's free cells: argmax over random
+        # keys that are zeroed on occupied cells. Full boards get -1.
+        keys = self.rng.random((idx.size, self.cells))
+        free = self.occupancy[idx] == 0
+        keys *= free
+        food = keys.argmax(axis=1)
+        food[~free.any(axis=1)] = -1
+        self.food[idx] = food
+
+    def step(self, actions=None):
+        # Advance every game one tick. Returns (rewards, dones); rewards are
+        # +1 for eating and -1 for dying. Finished games are reset in place,
+        # so dones flags the games that ended on this tick.
+        rows = self.rows_index
+        if actions is not None:
+            actions = np.asarray(actions, dtype=np.int8)
+            turn = (actions >= 0) & (actions != OPPOSITE[self.direction])
+            self.direction = np.where(turn, actions, self.direction)
+
+        cap = self.cells
+        x = (self.head % self.cols + DX[self.direction]) % self.cols
+        y = (self.head // self.cols + DY[self.direction]) % self.rows
+        new_head = y * self.cols + x
+
+        # Free the tail first unless growing, so chasing the tail is allowed
+        moving = ~self.grow_pending
+        tail_rows = rows[moving]
+        tail_cells = self.body[tail_rows, self.tail_ptr[tail_rows]]
+        self.occupancy[tail_rows, tail_cells] -= 1
+        self.tail_ptr[tail_rows] = (self.tail_ptr[tail_rows] + 1) % cap
+        self.length += self.grow_pending
+        self.grow_pending[:] = False
+
+        crashed = self.occupancy[rows, new_head] > 0
+
+        self.head_ptr = (self.head_ptr + 1) % cap
+        self.body[rows, self.head_ptr] = new_head
+        self.occupancy[rows, new_head] += 1
+        self.head = new_head
+        self.ticks += 1
+
+        ate = (new_head == self.food) & ~crashed
+        self.score += ate
+        self.grow_pending |= ate
+        rewards = ate.astype(np.int64) - crashed
+
+        dones = crashed.copy()
+        if ate.any():
+            eaten = np.flatnonzero(ate)
+            self.spawn_food(eaten)
+            # No free cell left: the board is full and the game is won
+            dones[eaten[self.food[eaten] < 0]] = True
+
+        if dones.any():
+            self.reset(dones)
+        return rewards, dones
+
+    def observe(self):
+        # All boards as one contiguous (n, rows, cols) uint8 array
+        flat = self.obs.reshape(self.n, self.cells)
+        np.minimum(self.occupancy, BODY, out=flat)
+        has_food = self.food >= 0
+        flat[self.rows_index[has_food], self.food[has_food]] = FOOD
+        flat[self.rows_index, self.head] = HEAD
+        return self.obs
+
+
+def benchmark(sizes, steps, cols=COLS, rows=ROWS, seed=0):
+    results = []
+    rng = np.random.default_rng(seed)
+    for n in sizes:
+        game = BatchGame(n, cols, rows, seed=seed)
+        # Mostly keep heading, turn on ~10% of ticks
+        actions = np.where(rng.random((steps, n)) < 0.1,
+                           rng.integers(0, 4, (steps, n)), -1).astype(np.int8)
+        start = time.perf_counter()
+        for t in range(steps):
+            game.step(actions[t])
+        elapsed = time.perf_counter() - start
+        results.append({
+            "n": n,
+            "steps": steps,
+            "seconds": round(elapsed, 4),
+            "game_steps_per_sec": round(n * steps / elapsed),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batched NumPy snake engine benchmark")
+    parser.add_argument("--sizes", default="1,16,256,1024,4096",
+                        help="comma separated batch sizes")
+    parser.add_argument("--steps", type=int, default=500)
+    parser.add_argument("--cols", type=int, default=COLS)
+    parser.add_argument("--rows", type=int, default=ROWS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    print(f"{'N':>6} {'seconds':>9} {'game steps/s':>14}")
+    for row in benchmark(sizes, args.steps, args.cols, args.rows, args.seed):
+        print(f"{row['n']:>6} {row['seconds']:>9.3f} {row['game_steps_per_sec']:>14,}")
@@ -0,0 +1,298 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import snake_core
+from snake_core import direction_between, layout_snake, serpentine_cycle
+
+# Reproducible benchmarks for the simulation, the renderer and the finger
+# controller. Results are written as JSON and can be compared against a
+# stored baseline so a slowdown shows up as a numeric diff:
+#
+#   python snake_bench.py --output bench.json
+#   python snake_bench.py --save-baseline bench_baseline.json
+#   python snake_bench.py --baseline bench_baseline.json --tolerance 0.1
+#   python snake_bench.py --video recording.mp4     # finger controller too
+#
+# Every metric is {"value", "unit", "higher_is_better"}.
+
+
+def metric(value, unit, higher_is_better=True):
+    return {"value": round(value, 4), "unit": unit, "higher_is_better": higher_is_better}
+
+
+def bench_simulation(lengths, steps, seed):
+    results = {}
+    game = snake_core.Game(seed=seed)
+    cols, rows = game.cols, game.rows
+    cycle = serpentine_cycle(cols, rows)
+    cells = len(cycle)
+    # Directions along the cycle, precomputed so the loop only steps
+    turns = [direction_between(cycle[i], cycle[(i + 1) % cells], cols, rows) for i in range(cells)]
+
+    for length in lengths:
+        length = max(1, min(length, cells - 1))
+        elapsed = 0.0
+        done_steps = 0
+        while done_steps < steps:
+            game.reset(seed)
+            head = layout_snake(game, cycle, length)
+            start = time.perf_counter()
+            chunk = 0
+            while done_steps + chunk < steps:
+                _, done = game.step(turns[head])
+                chunk += 1
+                if done:
+                    break
+                head = (head + 1) % cells
+            elapsed += time.perf_counter() - start
+            done_steps += chunk
+        results[f"sim.game_step.len_{length}"] = metric(done_steps / elapsed, "steps/s")
+
+    rng = random.Random(seed)
+    game = snake_core.Game(seed=seed)
+    food_system = snake_core.FoodSystem(game.board, game.clock)
+    start = time.perf_counter()
+    for _ in range(steps):
+        food_system.update()
+    results["sim.food_system_update"] = metric(steps / (time.perf_counter() - start), "calls/s")
+
+    level_system = snake_core.LevelSystem(rng)
+    start = time.perf_counter()
+    for score in range(steps):
+        level_system.update(score % 500)
+    results["sim.level_system_update"] = metric(steps / (time.perf_counter() - start), "calls/s")
+    return results
+
+
+def bench_fork(lengths, repeat, seed):
+    # Snapshot and restore throughput (what rollout planners branch with),
+    # and random playout steps/s from a restored snapshot
+    from snake_rollout import Rollouts, bench_fork as fork_rates
+
+    results = {}
+    game = snake_core.Game(seed=seed)
+    cycle = serpentine_cycle(game.cols, game.rows)
+    for length in lengths:
+        length = max(1, min(length, len(cycle) - 1))
+        layout_snake(game, cycle, length)
+        rates = fork_rates(game, repeat * 10)
+        results[f"fork.snapshot.len_{length}"] = metric(rates["snapshot"], "calls/s")
+        results[f"fork.restore.len_{length}"] = metric(rates["restore"], "calls/s")
+        results[f"fork.bytes.len_{length}"] = metric(rates["bytes"], "bytes", False)
+
+    layout_snake(game, cycle, 10)
+    planner = Rollouts(seed=seed)
+    snapshot = game.snapshot()
+    start = time.perf_counter()
+    planner.run(snapshot, k=repeat, depth=50)
+    elapsed = time.perf_counter() - start
+    results["fork.rollout"] = metric(planner.playouts / elapsed, "playouts/s")
+    results["fork.rollout_steps"] = metric(planner.steps / elapsed, "steps/s")
+    return results
+
+
+def bench_autopilot(steps, seed, cols=80, rows=60):
+    # Planning time per tick on a large board, short snake to nearly full
+    from snake_autopilot import soak
+
+    results = {}
+    cells = cols * rows
+    for length in (1, cells // 2, cells - cells // 50):
+        _, stats = soak(cols, rows, steps, seed, budget_ms=1.0, length=length)
+        results[f"autopilot.plan.len_{length}.mean"] = metric(stats["mean_ms"], "ms/tick", False)
+        results[f"autopilot.plan.len_{length}.p99"] = metric(stats["p99_ms"], "ms/tick", False)
+    return results
+
+
+def time_per_call(fn, repeat):
+    fn()  # Warm caches
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def bench_render(lengths, repeat, seed):
+    # Offscreen: SDL's dummy video driver, no window is opened
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    try:
+        import snake_game
+    except ImportError as exc:
+        print(f"render benchmarks skipped: {exc}", file=sys.stderr)
+        return {}
+
+    pygame = snake_game.pygame
+    snake_game.init_display()
+    snake_game.load_fonts()
+    surface = pygame.Surface((snake_game.WIDTH, snake_game.HEIGHT)).convert()
+    game = snake_game.Game(snake_game.WIDTH // snake_game.CELL_SIZE,
+                           snake_game.HEIGHT // snake_game.CELL_SIZE, seed=seed)
+    cycle = serpentine_cycle(game.cols, game.rows)
+    results = {}
+
+    for length in lengths:
+        length = max(1, min(length, len(cycle) - 1))
+        game.reset(seed)
+        layout_snake(game, cycle, length)
+        snake = game.snake
+        # Give every segment a birth tick so the gradient matches its index
+        snake.moves = length
+        for i, cell in enumerate(snake.positions):
+            snake.birth[cell] = length - i
+        snake.prev_head = snake.positions[0]
+        ms = time_per_call(lambda: snake.draw(surface), repeat)
+        results[f"render.snake_draw.len_{length}"] = metric(ms, "ms/call", False)
+
+    food = game.food
+    food.update()
+    results["render.food_draw"] = metric(
+        time_per_call(lambda: (food.update(), food.draw(surface)), repeat), "ms/call", False)
+
+    powerup = snake_game.PowerUp(game.board)
+    results["render.powerup_draw"] = metric(
+        time_per_call(lambda: (powerup.update(), powerup.draw(surface)), repeat), "ms/call", False)
+
+    background = snake_game.BackgroundLayer()
+    level_system = game.level_system
+    results["render.background_draw"] = metric(
+        time_per_call(lambda: background.draw(surface, level_system), repeat), "ms/call", False)
+
+    # A whole level-up transition per quality; the max is the worst frame.
+    # The ghost's buffers are allocated up front, as main() does.
+    level_system.ghost_surfaces(surface)
+    for quality in level_system.TRANSITION_QUALITIES:
+        level_system.transition_quality = quality
+        frames = []
+        for _ in range(max(1, repeat // 20)):
+            level_system.target_score = 0
+            level_system.update(0)
+            while level_system.zooming:
+                background.draw(surface, level_system)
+                start = time.perf_counter()
+                level_system.draw_transition(surface)
+                frames.append((time.perf_counter() - start) * 1000)
+                level_system.update_transition()
+        if frames:
+            results[f"render.level_transition.{quality}.mean"] = metric(
+                sum(frames) / len(frames), "ms/frame", False)
+            results[f"render.level_transition.{quality}.max"] = metric(max(frames), "ms/frame", False)
+    return results
+
+
+def bench_controller(video_path, max_frames):
+    # Finger controller on a recorded video instead of a live camera
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    try:
+        import snake_game
+    except ImportError as exc:
+        print(f"controller benchmark skipped: {exc}", file=sys.stderr)
+        return {}
+
+    controller = snake_game.FingerController(source=video_path, threaded=False)
+    timings = []
+    while len(timings) < max_frames:
+        ret, frame = controller.cap.read()
+        if not ret:
+            break
+        start = time.perf_counter()
+        controller.process_frame(frame)
+        timings.append((time.perf_counter() - start) * 1000)
+    controller.release()
+    if not timings:
+        print(f"controller benchmark skipped: no frames in {video_path}", file=sys.stderr)
+        return {}
+
+    timings.sort()
+    return {
+        "controller.process_frame.mean": metric(sum(timings) / len(timings), "ms/frame", False),
+        "controller.process_frame.p95": metric(snake_core.percentile(timings, 95), "ms/frame", False),
+        "controller.frames": metric(len(timings), "frames"),
+    }
+
+
+def compare(results, baseline, tolerance):
+    # Returns (rows, regressed); each row is (name, base, now, change, regressed)
+    rows = []
+    regressed = False
+    for name, now in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None or not base["value"]:
+            continue
+        change = (now["value"] - base["value"]) / base["value"]
+        worse = -change if now["higher_is_better"] else change
+        flag = worse > tolerance
+        regressed |= flag
+        rows.append((name, base["value"], now["value"], change, flag))
+    return rows, regressed
+
+
+def run(args):
+    random.seed(args.seed)
+    lengths = [int(n) for n in args.lengths.split(",")]
+    results = {}
+    results.update(bench_simulation(lengths, args.steps, args.seed))
+    results.update(bench_fork(lengths, args.repeat, args.seed))
+    if not args.no_autopilot:
+        results.update(bench_autopilot(min(args.steps, 2000), args.seed))
+    if not args.no_render:
+        results.update(bench_render(lengths, args.repeat, args.seed))
+    if args.video:
+        results.update(bench_controller(args.video, args.frames))
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "steps": args.steps,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snake engine, renderer and controller benchmarks")
+    parser.add_argument("--lengths", default="1,10,100,600,1199",
+                        help="comma separated snake lengths (clamped to the board)")
+    parser.add_argument("--steps", type=int, default=20000, help="simulation steps per length")
+    parser.add_argument("--repeat", type=int, default=200, help="draw calls per render benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-autopilot", action="store_true", help="skip the autopilot planning benchmark")
+    parser.add_argument("--no-render", action="store_true", help="skip the renderer benchmarks")
+    parser.add_argument("--video", help="recorded video for the finger controller benchmark")
+    parser.add_argument("--frames", type=int, default=300, help="max video frames to process")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against this results JSON")
+    parser.add_argument("--save-baseline", metavar="PATH", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="relative slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    report = run(args)
+    results = report["results"]
+    text = json.dumps(report, indent=2)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                f.write(text + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        rows, regressed = compare(results, baseline, args.tolerance)
+        print(f"{'metric':<36}{'baseline':>14}{'now':>14}{'change':>9}")
+        for name, base, now, change, flag in rows:
+            print(f"{name:<36}{base:>14.4f}{now:>14.4f}{change:>+9.1%}{'  REGRESSION' if flag else ''}")
+        sys.exit(1 if regressed else 0)
+    elif not args.output:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,862 @@
+import hashlib
+import heapq
+import random
+import struct
+import time
+from array import array
+from collections import deque
+from itertools import chain
+
+# Pure game rules for the snake game. Nothing in here touches pygame,
+# OpenCV or MediaPipe, so it can run in workers with no display.
+# Everything is in grid cells: (column, row) with wrap-around edges.
+
+COLS, ROWS = 40, 30
+
+# Directions
+UP = (0, -1)
+DOWN = (0, 1)
+LEFT = (-1, 0)
+RIGHT = (1, 0)
+
+# Integer actions accepted by Game.step (None keeps the current heading)
+ACTIONS = (UP, DOWN, LEFT, RIGHT)
+
+POWERUP_TYPES = ("speed_boost", "slow_down", "score_multiplier", "shield")
+
+# How long timed power-up effects last once picked up (milliseconds)
+EFFECT_DURATIONS = {"speed_boost": 5000, "slow_down": 5000, "shield": 5000}
+
+# Game.snapshot() layout (little endian). The header below, then
+#   occupancy   cols * rows bytes
+#   slots       cols * rows i32, each cell's slot in the free cell pool
+#   free cells  free_count i32
+#   rng         625 u32 of Mersenne Twister state
+#   body        length x (x:u16 y:u16), head first
+#   pickups     pickup_count x SNAPSHOT_PICKUP
+#   effects     effect_count x SNAPSHOT_EFFECT
+# The board-sized sections are copied as raw memory both ways.
+SNAPSHOT_MAGIC = b"SNKS"
+SNAPSHOT = struct.Struct("<4sHHqIIqqqIhBBBIIBBBIHHIHHBd")
+# kind (0 food, 1 + POWERUP_TYPES index), is the game's food, x, y,
+# spawn time, expiry time (-1 for none), expiry tie-breaker
+SNAPSHOT_PICKUP = struct.Struct("<BBHHqqI")
+# POWERUP_TYPES index, end time, value to undo
+SNAPSHOT_EFFECT = struct.Struct("<Bqi")
+
+
+class CellPool:
+    # Set of free cells, as flat indices (y * cols + x), with O(1)
+    # add/remove and uniform random choice: swap-with-last removal over a
+    # dense array plus every cell's slot in it (-1 when absent). That is
+    # two 4-byte ints per board cell, so a 1000x1000 arena needs 8 MB.
+    def __init__(self, size, full=True):
+        # Starts out holding every cell, or none
+        if full:
+            self.cells = array('i', range(size))
+            self.slot = array('i', range(size))
+        else:
+            self.cells = array('i')
+            self.slot = array('i', b"\xff" * (4 * size))
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, i):
+        return self.slot[i] >= 0
+
+    def add(self, i):
+        if self.slot[i] < 0:
+            self.slot[i] = len(self.cells)
+            self.cells.append(i)
+
+    def discard(self, i):
+        slot = self.slot[i]
+        if slot < 0:
+            return
+        self.slot[i] = -1
+        last = self.cells.pop()
+        if slot < len(self.cells):
+            self.cells[slot] = last
+            self.slot[last] = slot
+
+    def choice(self, rng=random):
+        if not self.cells:
+            return None
+        return self.cells[rng.randrange(len(self.cells))]
+
+
+class Board:
+    # Occupancy grid (one byte per cell, counting overlapping bodies) plus
+    # the pool of cells no body is on. Cells are (column, row) tuples in
+    # the API and flat indices inside.
+    def __init__(self, cols=COLS, rows=ROWS, rng=random):
+        self.cols = cols
+        self.rows = rows
+        self.rng = rng
+        self.reset()
+
+    def reset(self):
+        self.occupancy = bytearray(self.cols * self.rows)
+        self.free_cells = CellPool(self.cols * self.rows)
+
+    def occupy(self, cell):
+        i = cell[1] * self.cols + cell[0]
+        count = self.occupancy[i]
+        self.occupancy[i] = count + 1
+        if count == 0:
+            self.free_cells.discard(i)
+
+    def vacate(self, cell):
+        i = cell[1] * self.cols + cell[0]
+        count = self.occupancy[i] - 1
+        self.occupancy[i] = count
+        if count == 0:
+            self.free_cells.add(i)
+
+    def count(self, cell):
+        return self.occupancy[cell[1] * self.cols + cell[0]]
+
+    def is_free(self, cell):
+        return self.occupancy[cell[1] * self.cols + cell[0]] == 0
+
+    def random_free_cell(self):
+        i = self.free_cells.choice(self.rng)
+        return None if i is None else (i % self.cols, i // self.cols)
+
+
+class Snake:
+    def __init__(self, board):
+        self.board = board
+        self.reset()
+
+    def reset(self):
+        board = self.board
+        self.positions = deque([(board.cols // 2, board.rows // 2)])
+        board.occupy(self.positions[0])
+        self.direction = RIGHT
+        self.grow_pending = False
+        self.speed = 10
+        self.length = 1
+        self.difficulty = "Easy"
+
+    def move(self):
+        board = self.board
+        head_x, head_y = self.positions[0]
+        dir_x, dir_y = self.direction
+        new_head = ((head_x + dir_x) % board.cols, (head_y + dir_y) % board.rows)
+
+        if self.grow_pending:
+            self.positions.appendleft(new_head)
+            board.occupy(new_head)
+            self.length += 1
+            self.update_difficulty()
+            self.grow_pending = False
+        else:
+            # Free the tail first so chasing it into its old cell is allowed
+            board.vacate(self.positions.pop())
+            self.positions.appendleft(new_head)
+            board.occupy(new_head)
+
+    def update_difficulty(self):
+        if self.length < 10:
+            self.difficulty = "Easy"
+        elif self.length < 20:
+            self.difficulty = "Medium"
+        else:
+            self.difficulty = "Hard"
+
+    def grow(self):
+        self.grow_pending = True
+
+    def change_direction(self, direction):
+        if (direction[0] * -1, direction[1] * -1) != self.direction:
+            self.direction = direction
+
+    def check_collision(self):
+        return self.board.count(self.positions[0]) > 1
+
+
+class Food:
+    kind = "food"
+
+    def __init__(self, board):
+        self.board = board
+        self.position = (0, 0)
+        self.randomize_position()
+
+    def randomize_position(self):
+        cell = self.board.random_free_cell()
+        if cell is None:
+            return False  # Board is full
+        self.position = cell
+        return True
+
+
+class PowerUp:
+    kind = "powerup"
+
+    def __init__(self, board, spawn_time=0, type=None):
+        self.board = board
+        self.type = type or board.rng.choice(POWERUP_TYPES)
+        self.position = (0, 0)
+        self.spawn_time = spawn_time
+        self.randomize_position()
+
+    def randomize_position(self):
+        cell = self.board.random_free_cell()
+        if cell is None:
+            return False
+        self.position = cell
+        return True
+
+
+class LevelSystem:
+    target_step = 15  # Level n ends at score n * target_step
+
+    def __init__(self, rng=random):
+        self.rng = rng
+        self.level = 1
+        self.target_score = 10
+        self.border_color = (255, 255, 255)
+
+    def update(self, score):
+        if score >= self.target_score:
+            self.level += 1
+            self.target_score = self.level * self.target_step
+            self.border_color = (
+                self.rng.randint(100, 255),
+                self.rng.randint(100, 255),
+                self.rng.randint(100, 255)
+            )
+            return True
+        return False
+
+
+class Pickups:
+    # Foods and power-ups on the board, at most one per cell, keyed by cell
+    # so the head's cell is a single dict lookup. Pickups with a lifespan
+    # also go on a heap ordered by expiry time, and expire(now) only pops
+    # what is due; entries for pickups already eaten are skipped then.
+    def __init__(self):
+        self.by_cell = {}
+        self.counts = {}
+        self.deadlines = []
+        self.pushed = 0  # Tie-breaker so the heap never compares entities
+
+    def __len__(self):
+        return len(self.by_cell)
+
+    def __iter__(self):
+        return iter(self.by_cell.values())
+
+    def __contains__(self, cell):
+        return cell in self.by_cell
+
+    def at(self, cell):
+        return self.by_cell.get(cell)
+
+    def count(self, kind):
+        return self.counts.get(kind, 0)
+
+    def add(self, entity, expires_at=None):
+        self.by_cell[entity.position] = entity
+        self.counts[entity.kind] = self.counts.get(entity.kind, 0) + 1
+        if expires_at is not None:
+            self.pushed += 1
+            heapq.heappush(self.deadlines, (expires_at, self.pushed, entity))
+
+    def remove(self, entity):
+        if self.by_cell.get(entity.position) is not entity:
+            return False
+        del self.by_cell[entity.position]
+        self.counts[entity.kind] -= 1
+        return True
+
+    def expire(self, now):
+        # Removes and returns the pickups whose time is up
+        expired = []
+        deadlines = self.deadlines
+        while deadlines and deadlines[0][0] <= now:
+            entity = heapq.heappop(deadlines)[2]
+            if self.remove(entity):
+                expired.append(entity)
+        return expired
+
+
+class FoodSystem:
+    # Owns every pickup on the board. Game places its food and power-ups
+    # through it; update() adds ambient spawns on top (extra food now and
+    # then, a power-up every 600 calls).
+    food_class = Food
+    powerup_class = PowerUp
+    powerup_lifespan = 10000  # ms on the board before a power-up vanishes
+
+    def __init__(self, board, clock):
+        self.board = board
+        self.clock = clock
+        self.pickups = Pickups()
+        self.special_food_timer = 0
+
+    def place(self, entity, expires_at=None):
+        # Registers entity on a cell with no body and no other pickup,
+        # re-rolling its position a few times if needed, then taking the
+        # first such cell in the free-cell pool. Fails only when every
+        # free cell already has a pickup.
+        board, pickups = self.board, self.pickups
+        for _ in range(8):
+            if board.is_free(entity.position) and entity.position not in pickups:
+                pickups.add(entity, expires_at)
+                return True
+            if not entity.randomize_position():
+                return False  # Board is full
+        cell = self.free_cell()
+        if cell is None:
+            return False
+        entity.position = cell
+        pickups.add(entity, expires_at)
+        return True
+
+    def free_cell(self):
+        # Walks the free-cell pool from a random slot, skipping cells that
+        # hold a pickup. There are only a few pickups, so this stops within
+        # a few cells however big the board is.
+        board = self.board
+        cells = board.free_cells.cells
+        count = len(cells)
+        if not count:
+            return None
+        start = board.rng.randrange(count)
+        for k in range(count):
+            i = cells[(start + k) % count]
+            cell = (i % board.cols, i // board.cols)
+            if cell not in self.pickups:
+                return cell
+        return None
+
+    def respawn(self, entity):
+        # Moves a pickup (the game's food after it's eaten) somewhere new
+        self.pickups.remove(entity)
+        entity.randomize_position()
+        return self.place(entity)
+
+    def spawn_powerup(self):
+        now = self.clock()
+        powerup = self.powerup_class(self.board, now)
+        return powerup if self.place(powerup, now + self.powerup_lifespan) else None
+
+    def take(self, cell):
+        # The pickup at cell, removed from the board, or None
+        entity = self.pickups.at(cell)
+        if entity is not None:
+            self.pickups.remove(entity)
+        return entity
+
+    def expire(self):
+        return self.pickups.expire(self.clock())
+
+    def update(self):
+        rng = self.board.rng
+        # Regular food spawn
+        if rng.random() < 0.01 and self.pickups.count("food") < 3:
+            self.place(self.food_class(self.board))
+
+        # Special food spawn
+        self.special_food_timer += 1
+        if self.special_food_timer > 600 and self.pickups.count("powerup") < 2:  # Every 10 seconds
+            self.spawn_powerup()
+            self.special_food_timer = 0
+
+        self.expire()
+
+
+class Effects:
+    # Timed power-up effects. Each active effect has an end time and a
+    # value to undo when it ends (a speed change, say). Picking up one that
+    # is already running extends it rather than stacking it. Ends are kept
+    # on a heap; superseded entries are skipped when popped.
+    def __init__(self):
+        self.ends = {}
+        self.values = {}
+        self.deadlines = []
+
+    def __contains__(self, name):
+        return name in self.ends
+
+    def start(self, name, now, duration, value=None):
+        # Returns True if the effect wasn't running (so value applies)
+        started = name not in self.ends
+        if started:
+            self.values[name] = value
+        self.ends[name] = now + duration
+        heapq.heappush(self.deadlines, (now + duration, name))
+        return started
+
+    def remaining(self, name, now):
+        return max(0, self.ends[name] - now) if name in self.ends else 0
+
+    def expire(self, now):
+        # Returns [(name, value)] for the effects that just ended
+        ended = []
+        deadlines = self.deadlines
+        while deadlines and deadlines[0][0] <= now:
+            end, name = heapq.heappop(deadlines)
+            if self.ends.get(name) == end:
+                del self.ends[name]
+                ended.append((name, self.values.pop(name)))
+        return ended
+
+
+def is_reverse(a, b):
+    return a[0] == -b[0] and a[1] == -b[1]
+
+
+def percentile(sorted_values, p):
+    # Nearest-rank percentile of an already sorted sequence. Every p50/p95/
+    # p99 the game, server, benchmarks and tools report comes from here
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class TurnQueue:
+    # Bounded FIFO of timestamped turn requests from every input source
+    # (keyboard, touch, finger, ...). The game consumes at most one turn per
+    # tick, so quick double taps within a tick are both honoured in order and
+    # a flood of events can't change how often the snake moves. Timestamps
+    # use the given clock (seconds); the delay from input to the tick that
+    # applies it is recorded per source.
+    def __init__(self, maxlen=3, clock=time.perf_counter):
+        self.maxlen = maxlen
+        self.clock = clock
+        self.turns = deque()
+        self.latencies = {}
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.turns)
+
+    def clear(self):
+        self.turns.clear()
+
+    def push(self, direction, source, heading=None, timestamp=None):
+        # heading: the snake's current direction, used to validate the turn
+        # when nothing is queued yet
+        last = self.turns[-1][0] if self.turns else heading
+        if last is not None and (direction == last or is_reverse(direction, last)):
+            self.dropped += 1
+            return False
+        if len(self.turns) >= self.maxlen:
+            self.turns.popleft()  # Keep the most recent intent
+            self.dropped += 1
+        self.turns.append((direction, source, self.clock() if timestamp is None else timestamp))
+        return True
+
+    def pop(self, heading):
+        # Next turn that is still valid for the current heading, or None
+        while self.turns:
+            direction, source, timestamp = self.turns.popleft()
+            if direction != heading and not is_reverse(direction, heading):
+                samples = self.latencies.get(source)
+                if samples is None:
+                    samples = self.latencies[source] = deque(maxlen=256)
+                samples.append(self.clock() - timestamp)
+                return direction
+        return None
+
+    def latency_stats(self):
+        # Input-to-move latency per source, in milliseconds
+        stats = {}
+        for source, samples in self.latencies.items():
+            values = sorted(samples)
+            stats[source] = {
+                "turns": len(values),
+                "mean_ms": round(sum(values) / len(values) * 1000, 1),
+                "p95_ms": round(percentile(values, 95) * 1000, 1),
+            }
+        return stats
+
+
+class Game:
+    # One game of snake driven one tick at a time through step(action).
+    # The clock is a zero-argument callable returning milliseconds; by
+    # default it is simulated time advanced by every tick. Subclasses swap
+    # in their own entity classes (e.g. drawable ones) via the attributes.
+    board_class = Board
+    snake_class = Snake
+    food_class = Food
+    powerup_class = PowerUp
+    level_class = LevelSystem
+    food_system_class = FoodSystem
+    # Rule knobs, overridden by variants (see snake_tournament)
+    powerup_chance = 0.3  # Chance of a power-up each time food is eaten
+    level_speed_bump = 1  # Speed added on every level up
+
+    def __init__(self, cols=COLS, rows=ROWS, seed=None, clock=None):
+        self.cols = cols
+        self.rows = rows
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.clock = clock or self.sim_clock
+        self.board = self.board_class(cols, rows, self.rng)
+        self.snake = self.snake_class(self.board)
+        self.restored = None  # (snapshot, its RNG state, its body) from the last restore()
+        self.reset(seed)
+
+    def sim_clock(self):
+        return self.time_ms
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.rng.seed(seed)
+            self.seed = seed
+        self.board.reset()
+        self.snake.reset()
+        self.food_system = self.food_system_class(self.board, self.clock)
+        self.food = self.food_class(self.board)
+        self.food_system.place(self.food)
+        self.effects = Effects()
+        self.level_system = self.level_class(self.rng)
+        self.score = 0
+        self.powerups_used = 0
+        self.ticks = 0
+        self.time_ms = 0
+        self.game_over = False
+
+    def step(self, action=None):
+        # Advance one tick. Returns (reward, done).
+        if self.game_over:
+            return 0, True
+
+        snake = self.snake
+        if action is not None:
+            snake.change_direction(ACTIONS[action] if isinstance(action, int) else action)
+
+        snake.move()
+        self.ticks += 1
+        self.time_ms += 1000 // snake.speed
+
+        # Effects and power-ups that have run out
+        food_system = self.food_system
+        for _, speed_change in self.effects.expire(self.clock()):
+            if speed_change:
+                snake.speed -= speed_change
+        food_system.expire()
+        if food_system.pickups.at(self.food.position) is not self.food:
+            # Had nowhere to go when it was last eaten; try again
+            food_system.place(self.food)
+
+        if snake.check_collision() and "shield" not in self.effects:
+            self.game_over = True
+            return 0, True
+
+        start_score = self.score
+        pickup = food_system.take(snake.positions[0])
+        if pickup is self.food:
+            snake.grow()
+            self.score += 1
+            food_system.respawn(self.food)
+
+            # Chance to spawn a new powerup
+            if self.rng.random() < self.powerup_chance:
+                food_system.spawn_powerup()
+        elif pickup is not None:
+            if pickup.kind == "powerup":
+                self.apply_powerup(pickup)
+            else:
+                # Extra food from FoodSystem.update
+                snake.grow()
+                self.score += 1
+
+        # Level progression
+        if self.level_system.update(self.score):
+            snake.speed += self.level_speed_bump
+
+        return self.score - start_score, False
+
+    def apply_powerup(self, powerup):
+        # Score is instant; speed boost, slow down and shield are timed
+        # effects (the shield lets the snake pass through itself)
+        snake = self.snake
+        effect = powerup.type
+        self.powerups_used += 1
+        if effect == "score_multiplier":
+            self.score += 5
+            return
+        if effect == "speed_boost":
+            speed_change = 5
+        elif effect == "slow_down":
+            speed_change = max(5, snake.speed - 3) - snake.speed
+        else:
+            speed_change = 0
+        if self.effects.start(effect, self.clock(), EFFECT_DURATIONS[effect], speed_change):
+            snake.speed += speed_change
+
+    def state_hash(self):
+        # 64-bit digest of everything that decides how the game plays on
+        # from here, RNG included; replays compare these to catch desyncs
+        snake = self.snake
+        level = self.level_system
+        state = (list(snake.positions), snake.direction, snake.grow_pending, snake.speed,
+                 sorted((e.position, e.kind, getattr(e, "type", None), getattr(e, "spawn_time", None))
+                        for e in self.food_system.pickups),
+                 sorted(self.effects.ends.items()), self.score, self.ticks, self.time_ms, level.level, level.target_score,
+                 self.game_over, self.rng.getstate())
+        digest = hashlib.blake2b(bytes(self.board.occupancy), digest_size=8)
+        digest.update(repr(state).encode())
+        return int.from_bytes(digest.digest(), "little")
+
+    def snapshot(self):
+        # The whole game state, RNG included, packed into an immutable
+        # bytes object (layout above SNAPSHOT). Any number of branches can
+        # share one snapshot, since restore() copies out of it and never
+        # into it. Render-only state (the drawable subclasses' animations)
+        # is not included.
+        snake, board, level = self.snake, self.board, self.level_system
+        pool = board.free_cells
+        pickups = self.food_system.pickups
+        effects = self.effects
+        version, mt_state, gauss = self.rng.getstate()
+        header = SNAPSHOT.pack(
+            SNAPSHOT_MAGIC, self.cols, self.rows, -1 if self.seed is None else self.seed,
+            len(pool), len(snake.positions), self.ticks, self.time_ms, self.score, self.powerups_used,
+            snake.speed, ACTIONS.index(snake.direction), snake.grow_pending, self.game_over,
+            snake.length, level.level, *level.border_color, level.target_score,
+            *self.food.position, self.food_system.special_food_timer, len(pickups), len(effects.ends),
+            gauss is not None, gauss or 0.0)
+        out = bytearray(header)
+        out += board.occupancy
+        out += pool.slot
+        out += pool.cells
+        out += array('I', mt_state)
+        out += array('H', chain.from_iterable(snake.positions))
+
+        # Only live pickups have a live heap entry
+        deadlines = {id(entity): (expires_at, pushed) for expires_at, pushed, entity in pickups.deadlines
+                     if pickups.at(entity.position) is entity}
+        for entity in pickups:
+            expires_at, pushed = deadlines.get(id(entity), (-1, 0))
+            kind = 0 if entity.kind == "food" else 1 + POWERUP_TYPES.index(entity.type)
+            out += SNAPSHOT_PICKUP.pack(kind, entity is self.food, *entity.position,
+                                        getattr(entity, "spawn_time", 0), expires_at, pushed)
+        for name, end in effects.ends.items():
+            out += SNAPSHOT_EFFECT.pack(POWERUP_TYPES.index(name), end, effects.values[name] or 0)
+        return bytes(out)
+
+    def restore(self, snapshot):
+        # Puts this game in the state snapshot() captured. The board must
+        # be the same size. This is an eager copy: the board-sized sections
+        # (occupancy and the free-cell pool, 9 bytes a cell) are memcpy'd
+        # back, so it is O(cells), though a 40x30 board is only 11 KB. The
+        # snake, food system, effects, level and pickup entities are
+        # updated in place rather than rebuilt.
+        fields = SNAPSHOT.unpack_from(snapshot)
+        (magic, cols, rows, seed, free_count, body_length, ticks, time_ms, score, powerups_used, speed, direction,
+         grow_pending, game_over, length, level, red, green, blue, target_score, food_x, food_y,
+         special_food_timer, pickup_count, effect_count, has_gauss, gauss) = fields
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("not a game snapshot")
+        if (cols, rows) != (self.cols, self.rows):
+            raise ValueError(f"snapshot is of a {cols}x{rows} board, this game is {self.cols}x{self.rows}")
+        view = memoryview(snapshot)
+        cells = cols * rows
+        offset = SNAPSHOT.size
+
+        def section(size):
+            nonlocal offset
+            offset += size
+            return view[offset - size:offset]
+
+        board = self.board
+        pool = board.free_cells
+        board.occupancy[:] = section(cells)
+        memoryview(pool.slot).cast('B')[:] = section(4 * cells)
+        free_cells = pool.cells
+        if len(free_cells) > free_count:
+            del free_cells[free_count:]
+        else:
+            free_cells.frombytes(bytes(4 * (free_count - len(free_cells))))
+        memoryview(free_cells).cast('B')[:] = section(4 * free_count)
+        # Decoding the RNG state and the body into tuples is most of the
+        # cost, and planners restore the same snapshot over and over, so
+        # the last one's are kept
+        if self.restored is not None and self.restored[0] is snapshot:
+            _, mt_state, positions = self.restored
+            offset += 4 * 625 + 4 * body_length
+        else:
+            mt_state = array('I')
+            mt_state.frombytes(section(4 * 625))
+            mt_state = tuple(mt_state)
+            coords = array('H')
+            coords.frombytes(section(4 * body_length))
+            coords = iter(coords)
+            positions = tuple(zip(coords, coords))
+            self.restored = (snapshot, mt_state, positions)
+
+        snake = self.snake
+        snake.positions = deque(positions)
+        snake.direction = ACTIONS[direction]
+        snake.grow_pending = bool(grow_pending)
+        snake.speed = speed
+        snake.length = length
+        snake.update_difficulty()
+
+        # The pickup entities already here are reused for pickups of the
+        # same kind (and power-up type); building new ones may draw from
+        # the RNG, so it is restored last
+        food_system = self.food_system
+        food_system.special_food_timer = special_food_timer
+        pickups = food_system.pickups
+        spare = {}
+        for entity in chain(pickups, () if self.food is None or self.food in pickups.by_cell.values() else (self.food,)):
+            spare.setdefault((entity.kind, getattr(entity, "type", None)), []).append(entity)
+        pickups.by_cell.clear()
+        pickups.counts.clear()
+        pickups.deadlines.clear()
+        pickups.pushed = 0
+        self.food = None
+        for _ in range(pickup_count):
+            kind, is_food, x, y, spawn_time, expires_at, pushed = SNAPSHOT_PICKUP.unpack(section(SNAPSHOT_PICKUP.size))
+            key = ("food", None) if kind == 0 else ("powerup", POWERUP_TYPES[kind - 1])
+            if spare.get(key):
+                entity = spare[key].pop()
+            elif kind == 0:
+                entity = self.food_class(board)
+            else:
+                entity = self.powerup_class(board, spawn_time, key[1])
+            entity.position = (x, y)
+            if kind:
+                entity.spawn_time = spawn_time
+            pickups.add(entity)
+            if expires_at >= 0:
+                pickups.deadlines.append((expires_at, pushed, entity))
+                pickups.pushed = max(pickups.pushed, pushed)
+            if is_food:
+                self.food = entity
+        heapq.heapify(pickups.deadlines)
+        if self.food is None:
+            # Off the board (it had nowhere to go)
+            spares = spare.get(("food", None))
+            self.food = spares.pop() if spares else self.food_class(board)
+            self.food.position = (food_x, food_y)
+
+        effects = self.effects
+        effects.ends.clear()
+        effects.values.clear()
+        effects.deadlines.clear()
+        for _ in range(effect_count):
+            name, end, value = SNAPSHOT_EFFECT.unpack(section(SNAPSHOT_EFFECT.size))
+            name = POWERUP_TYPES[name]
+            effects.ends[name] = end
+            effects.values[name] = value
+            effects.deadlines.append((end, name))
+        heapq.heapify(effects.deadlines)
+
+        level_system = self.level_system
+        level_system.level = level
+        level_system.target_score = target_score
+        level_system.border_color = (red, green, blue)
+
+        self.seed = None if seed < 0 else seed
+        self.score = score
+        self.powerups_used = powerups_used
+        self.ticks = ticks
+        self.time_ms = time_ms
+        self.game_over = bool(game_over)
+        self.rng.setstate((3, mt_state, gauss if has_gauss else None))
+
+    @classmethod
+    def from_snapshot(cls, snapshot, clock=None):
+        # A new game in the snapshot's state. Skips __init__: a reset fills
+        # the board and pool cell by cell just for restore() to overwrite
+        # them, where zeroed memory does as well
+        _, cols, rows = SNAPSHOT.unpack_from(snapshot)[:3]
+        game = cls.__new__(cls)
+        game.cols = cols
+        game.rows = rows
+        game.rng = random.Random(0)
+        game.clock = clock or game.sim_clock
+        board = game.board = cls.board_class.__new__(cls.board_class)
+        board.cols = cols
+        board.rows = rows
+        board.rng = game.rng
+        board.occupancy = bytearray(cols * rows)
+        board.free_cells = CellPool(cols * rows, full=False)
+        game.snake = cls.snake_class(board)  # Its start cell goes in the restore
+        game.food_system = cls.food_system_class(board, game.clock)
+        game.food = None
+        game.effects = Effects()
+        game.level_system = cls.level_class(game.rng)
+        game.restored = None
+        game.restore(snapshot)
+        game.restored = None  # Forks are often one-offs; don't keep the snapshot alive
+        return game
+
+    def fork(self):
+        return self.from_snapshot(self.snapshot(), None if self.clock == self.sim_clock else self.clock)
+
+    def observe(self):
+        # Grid observation, one byte per cell:
+        # 0 empty, 1 body, 2 head, 3 food, 4 power-up
+        obs = bytearray(1 if c else 0 for c in self.board.occupancy)
+        cols = self.cols
+        for entity in self.food_system.pickups:
+            x, y = entity.position
+            obs[y * cols + x] = 3 if entity.kind == "food" else 4
+        x, y = self.snake.positions[0]
+        obs[y * cols + x] = 2
+        return obs
+
+
+# Board set-ups for benchmarks and soak tests
+def serpentine_cycle(cols, rows):
+    # Hamiltonian cycle over the board: rows left-to-right and
+    # right-to-left in turn, wrapping from the last row back to the first.
+    # Following it the snake never hits itself, whatever its length
+    # (needs an even number of rows to close up).
+    cycle = []
+    for y in range(rows):
+        xs = range(cols) if y % 2 == 0 else range(cols - 1, -1, -1)
+        cycle.extend((x, y) for x in xs)
+    return cycle
+
+
+def direction_between(a, b, cols, rows):
+    dx = (b[0] - a[0] + 1) % cols - 1
+    dy = (b[1] - a[1] + 1) % rows - 1
+    return (dx, dy)
+
+
+def layout_snake(game, cycle, length):
+    # Lay a snake of the given length along the cycle, head at the front
+    game.reset()
+    board, snake = game.board, game.snake
+    for cell in snake.positions:
+        board.vacate(cell)
+    head = length - 1
+    snake.positions = deque(cycle[i] for i in range(head, -1, -1))
+    for cell in snake.positions:
+        board.occupy(cell)
+    snake.length = length
+    snake.update_difficulty()
+    snake.direction = direction_between(cycle[head - 1], cycle[head], game.cols, game.rows) \
+        if length > 1 else RIGHT
+    game.food_system.respawn(game.food)
+    return head
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Quick headless throughput check: python snake_core.py [steps]
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    game = Game(seed=0)
+    rng = random.Random(1)
+    start = time.perf_counter()
+    for _ in range(steps):
+        _, done = game.step(rng.randrange(4) if rng.random() < 0.1 else None)
+        if done:
+            game.reset()
+    elapsed = time.perf_counter() - start
+    print(f"{steps} steps in {elapsed:.2f}s ({steps / elapsed:,.0f} steps/s)")
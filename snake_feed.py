@@ -0,0 +1,400 @@
+import argparse
+import multiprocessing
+import os
+import random
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import snake_core
+
+# Live observation feed: the game publishes every tick into a ring of
+# frames in one shared memory block, and readers in other processes look
+# at them through NumPy views (no pickling, no copies, no sockets).
+#
+#   header  HEADER_DTYPE, 64 bytes (pid: the writer's process id)
+#   slots   `slots` frames of frame_dtype(cols, rows), each a multiple of
+#           64 bytes so frames don't share cache lines
+#
+# A frame is the observe() grid (0 empty, 1 body, 2 head, 3 food,
+# 4 power-up) plus head, food, score, level and friends. Each slot starts
+# with a sequence number used as a seqlock. Publishing frame n (from 1):
+#
+#   slot (n - 1) % slots:  seq = 2n - 1 (odd: being written), write the
+#                          frame, seq = 2n
+#   header:                published = n
+#
+# The writer never waits for anyone. A reader that falls behind just skips
+# ahead to the newest frame, and one that is still looking at a slot when
+# the writer laps the ring sees seq change and knows the frame was torn.
+# The seqlock relies on stores reaching the other process in program
+# order, which holds on x86; weaker CPUs could let a torn frame through.
+#
+#   python snake_feed.py watch             # stats for a running game's feed
+#   python snake_feed.py bench             # publish cost and reader lag
+
+MAGIC = b"SNKF"
+VERSION = 2
+DEFAULT_NAME = "snake_feed"
+NO_CELL = 0xFFFF  # food_x/food_y when there is no food on the board
+
+writing = set()  # Feeds this process publishes
+
+HEADER_DTYPE = np.dtype({
+    "names": ["magic", "version", "cols", "rows", "slots", "slot_size", "published", "pid"],
+    "formats": ["S4", "<u2", "<u2", "<u2", "<u2", "<u4", "<u8", "<u4"],
+    "offsets": [0, 4, 6, 8, 10, 12, 16, 24],
+    "itemsize": 64,
+})
+
+FRAME_FIELDS = [
+    ("seq", "<u8"),
+    ("tick", "<u8"),
+    ("time_ms", "<i8"),
+    ("score", "<u4"),
+    ("length", "<u4"),
+    ("level", "<u2"),
+    ("head_x", "<u2"),
+    ("head_y", "<u2"),
+    ("food_x", "<u2"),
+    ("food_y", "<u2"),
+    ("powerups", "<u2"),
+    ("game_over", "u1"),
+]
+
+
+def untrack(shm):
+    # Stops this process's resource tracker from unlinking the block at
+    # exit. Only POSIX has one, and it knows blocks by their OS name, which
+    # keeps the leading slash that SharedMemory.name drops.
+    if os.name == "posix":
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister("/" + shm.name, "shared_memory")
+
+
+def process_alive(pid):
+    # Signal 0 only checks that the pid exists
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Someone else's
+    return True
+
+
+def frame_dtype(cols, rows):
+    fields = np.dtype(FRAME_FIELDS + [("grid", "u1", (rows, cols))], align=True)
+    return np.dtype({
+        "names": list(fields.names),
+        "formats": [fields.fields[name][0] for name in fields.names],
+        "offsets": [fields.fields[name][1] for name in fields.names],
+        "itemsize": -(-fields.itemsize // 64) * 64,
+    })
+
+
+class Feed:
+    # Views over a feed's shared memory, shared by writer and reader
+    def __init__(self, shm):
+        self.shm = shm
+        self.header = np.ndarray((1,), HEADER_DTYPE, shm.buf)
+        header = self.header[0]
+        self.cols = int(header["cols"])
+        self.rows = int(header["rows"])
+        self.slots = np.ndarray((int(header["slots"]),), frame_dtype(self.cols, self.rows),
+                                shm.buf, HEADER_DTYPE.itemsize)
+        # One array per field, so reads and writes are plain element access
+        self.fields = {name: self.slots[name] for name, _ in FRAME_FIELDS}
+        self.seq = self.fields["seq"]
+        self.grid = self.slots["grid"]
+
+    def published(self):
+        return int(self.header["published"][0])
+
+    def release(self):
+        # The views must go before the block can be closed
+        self.header = self.slots = self.fields = self.seq = self.grid = None
+        self.shm.close()
+
+
+class FeedWriter(Feed):
+    # slots: frames a reader can fall behind by before it gets torn reads
+    def __init__(self, cols, rows, name=DEFAULT_NAME, slots=8):
+        size = HEADER_DTYPE.itemsize + slots * frame_dtype(cols, rows).itemsize
+        try:
+            shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            # Reclaimed only when it is a feed whose writer is gone (a game
+            # that crashed). Windows frees a block with its last handle, so
+            # there it always belongs to a live process.
+            stale = shared_memory.SharedMemory(name)
+            header = np.ndarray((1,), HEADER_DTYPE, stale.buf)[0]
+            feed = header["magic"] == MAGIC and header["version"] == VERSION
+            pid = int(header["pid"]) if feed else 0
+            del header
+            stale.close()
+            if not feed or os.name == "nt" or process_alive(pid):
+                if stale.name not in writing:
+                    untrack(stale)
+                owner = f"in use by process {pid}" if feed else "not a snake feed"
+                raise FileExistsError(f"shared memory {name!r} already exists ({owner})")
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name, create=True, size=size)
+        header = np.ndarray((1,), HEADER_DTYPE, shm.buf)
+        header[0] = (MAGIC, VERSION, cols, rows, slots, frame_dtype(cols, rows).itemsize, 0, os.getpid())
+        del header
+        super().__init__(shm)
+        self.name = shm.name
+        self.count = 0
+        writing.add(self.name)
+
+    def publish(self, game):
+        n = self.count + 1
+        i = (n - 1) % len(self.slots)
+        fields = self.fields
+        self.seq[i] = 2 * n - 1
+
+        grid = self.grid[i]
+        occupancy = np.frombuffer(game.board.occupancy, np.uint8).reshape(self.rows, self.cols)
+        # 0/1 straight from the occupancy counts (a bool view is ~15x
+        # quicker than np.minimum on big boards)
+        np.not_equal(occupancy, 0, out=grid.view(bool))
+        powerups = 0
+        for entity in game.food_system.pickups:
+            x, y = entity.position
+            if entity.kind == "food":
+                grid[y, x] = 3
+            else:
+                grid[y, x] = 4
+                powerups += 1
+        head_x, head_y = game.snake.positions[0]
+        grid[head_y, head_x] = 2
+        food = game.food.position
+        if game.food_system.pickups.at(food) is not game.food:
+            food = (NO_CELL, NO_CELL)
+
+        fields["tick"][i] = game.ticks
+        fields["time_ms"][i] = game.time_ms
+        fields["score"][i] = game.score
+        fields["length"][i] = game.snake.length
+        fields["level"][i] = game.level_system.level
+        fields["head_x"][i] = head_x
+        fields["head_y"][i] = head_y
+        fields["food_x"][i], fields["food_y"][i] = food
+        fields["powerups"][i] = powerups
+        fields["game_over"][i] = game.game_over
+
+        self.seq[i] = 2 * n
+        self.header["published"] = n
+        self.count = n
+
+    def close(self):
+        writing.discard(self.name)
+        self.release()
+        self.shm.unlink()
+
+
+class Frame:
+    # One published frame. grid is a view straight into shared memory, so
+    # check valid() after using it: False means the writer reused the slot
+    # meanwhile and what was read may be a mix of two frames.
+    def __init__(self, feed, number, index, grid):
+        self.feed = feed
+        self.number = number
+        self.index = index
+        self.grid = grid
+        for name, _ in FRAME_FIELDS[1:]:
+            setattr(self, name, feed.fields[name][index].item())
+        self.game_over = bool(self.game_over)
+
+    @property
+    def head(self):
+        return self.head_x, self.head_y
+
+    @property
+    def food(self):
+        return None if self.food_x == NO_CELL else (self.food_x, self.food_y)
+
+    def valid(self):
+        return self.feed.seq[self.index] == 2 * self.number
+
+
+class FeedReader(Feed):
+    def __init__(self, name=DEFAULT_NAME):
+        try:
+            shm = shared_memory.SharedMemory(name, track=False)
+        except TypeError:
+            # Before Python 3.13 every attach is tracked, and the tracker
+            # unlinks the block when this process exits, under the game.
+            # Children of multiprocessing share their parent's tracker,
+            # which may be the writer's own, so leave theirs alone (and
+            # the writer's, when it reads its own feed).
+            shm = shared_memory.SharedMemory(name)
+            if multiprocessing.parent_process() is None and shm.name not in writing:
+                untrack(shm)
+        header = np.ndarray((1,), HEADER_DTYPE, shm.buf)[0]
+        if header["magic"] != MAGIC or header["version"] != VERSION:
+            del header
+            shm.close()
+            raise ValueError(f"{name}: not a snake feed (version {VERSION})")
+        del header
+        super().__init__(shm)
+        self.last = self.published()  # Only frames from now on are new
+        self.missed = 0  # Frames skipped because this reader was behind
+        self.torn = 0    # Reads that raced the writer and were retried
+
+    def latest(self, copy=False):
+        # The newest frame, or None before the first. copy: copy the grid
+        # out and check it wasn't torn, so the frame stays good to use.
+        while True:
+            n = self.published()
+            if n == 0:
+                return None
+            i = (n - 1) % len(self.slots)
+            if self.seq[i] != 2 * n:
+                # Lapped between reading published and the slot
+                self.torn += 1
+                continue
+            frame = Frame(self, n, i, self.grid[i].copy() if copy else self.grid[i])
+            if not frame.valid():
+                self.torn += 1
+                continue
+            if n > self.last:
+                self.missed += max(0, n - self.last - 1)
+                self.last = n
+            return frame
+
+    def wait(self, timeout=None, poll=0.001, copy=False):
+        # The next frame newer than the last one returned, or None on timeout.
+        # Polls: the writer never signals anyone, so it can't be held up.
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while self.published() <= self.last:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None
+            time.sleep(poll)
+        return self.latest(copy)
+
+    def close(self):
+        self.release()
+
+
+def watch(name, seconds):
+    while True:
+        try:
+            reader = FeedReader(name)
+            break
+        except FileNotFoundError:
+            # Not started yet
+            time.sleep(0.2)
+    print(f"{name}: {reader.cols}x{reader.rows}, {len(reader.slots)} slots")
+    frames = 0
+    start = time.perf_counter()
+    report = start + 1
+    try:
+        while seconds is None or time.perf_counter() - start < seconds:
+            frame = reader.wait(timeout=1.0, copy=True)
+            if frame is None:
+                continue
+            frames += 1
+            now = time.perf_counter()
+            if now >= report:
+                print(f"tick {frame.tick} score {frame.score} level {frame.level} length {frame.length} "
+                      f"head {frame.head} food {frame.food} power-ups {frame.powerups} | "
+                      f"{frames} frames, missed {reader.missed}, torn {reader.torn}")
+                report = now + 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+
+def lag_reader(name, seconds, delay_ms, results):
+    # Reads zero-copy frames in another process, spending delay_ms on each.
+    # used: still valid afterwards; stale: the writer lapped it meanwhile;
+    # bad: used frames whose grid doesn't agree with their head
+    reader = FeedReader(name)
+    used = stale = bad = 0
+    until = time.perf_counter() + seconds
+    while time.perf_counter() < until:
+        frame = reader.wait(timeout=0.5)
+        if frame is None:
+            continue
+        heads = int(np.count_nonzero(frame.grid == 2))
+        head = frame.grid[frame.head_y, frame.head_x]
+        time.sleep(delay_ms / 1000)
+        if frame.valid():
+            used += 1
+            bad += int(heads != 1 or head != 2)
+        else:
+            stale += 1
+    results.put({"used": used, "stale": stale, "bad": bad, "missed": reader.missed, "torn": reader.torn})
+    reader.close()
+
+
+def bench(cols, rows, steps, slots, delay_ms, tick_rate, seed):
+    # Publish cost per tick, then a slow reader in another process while
+    # the game runs at tick_rate (0: flat out)
+    game = snake_core.Game(cols, rows, seed=seed)
+    rng = random.Random(seed)
+    writer = FeedWriter(cols, rows, name=f"snake_feed_bench_{seed}", slots=slots)
+
+    def run(ticks, publish, until=None, tick_rate=0):
+        start = time.perf_counter()
+        busy = 0.0
+        done = 0
+        while done < ticks and (until is None or until()):
+            tick_start = time.perf_counter()
+            game.step(rng.randrange(4) if rng.random() < 0.1 else None)
+            if publish:
+                writer.publish(game)
+            if game.game_over:
+                game.reset()
+            done += 1
+            busy += time.perf_counter() - tick_start
+            if tick_rate:
+                time.sleep(max(0.0, start + done / tick_rate - time.perf_counter()))
+        return busy / done * 1e6
+
+    try:
+        bare = run(steps, False)
+        alone = run(steps, True)
+        results = multiprocessing.Queue()
+        process = multiprocessing.Process(target=lag_reader, args=(writer.name, 2.0, delay_ms, results))
+        process.start()
+        time.sleep(0.2)
+        shared = run(50 * steps, True, process.is_alive, tick_rate)
+        reader = results.get(timeout=10)
+        process.join()
+    finally:
+        writer.close()
+    return {"board": f"{cols}x{rows}", "frame_bytes": frame_dtype(cols, rows).itemsize,
+            "step_us": round(bare, 2), "step_and_publish_us": round(alone, 2),
+            "with_reader_us": round(shared, 2), "reader": reader}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared memory observation feed (snake_game.py --feed)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    watch_parser = commands.add_parser("watch", help="print what a running game publishes")
+    watch_parser.add_argument("name", nargs="?", default=DEFAULT_NAME)
+    watch_parser.add_argument("--seconds", type=float)
+    bench_parser = commands.add_parser("bench", help="publish cost, and a slow reader in another process")
+    bench_parser.add_argument("--board", default="40x30", help="COLSxROWS")
+    bench_parser.add_argument("--steps", type=int, default=20000)
+    bench_parser.add_argument("--slots", type=int, default=8)
+    bench_parser.add_argument("--delay-ms", type=float, default=1.0, help="reader time per frame")
+    bench_parser.add_argument("--tick-rate", type=float, default=0, help="ticks/s with the reader on (0: flat out)")
+    bench_parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "watch":
+        watch(args.name, args.seconds)
+    else:
+        cols, rows = (int(n) for n in args.board.lower().split("x"))
+        for key, value in bench(cols, rows, args.steps, args.slots, args.delay_ms, args.tick_rate, args.seed).items():
+            print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,19 @@
+import time
+IMPORT_START = time.perf_counter()
+
 import pygame
 import random
-import cv2
-import mediapipe as mp
 import numpy as np
-from collections import deque
+from collections import OrderedDict
+from itertools import islice
 import math
+import threading
 
-# Initialize Pygame
-pygame.init()
+import snake_core
+from snake_autopilot import Autopilot
+from snake_gestures import GestureFilter
+from snake_profiler import FrameProfiler
+from snake_replay import ReplayWriter
 
 # Screen dimensions
 WIDTH, HEIGHT = 800, 600
@@ -30,32 +36,101 @@ CYAN = (0, 255, 255)
 MAGENTA = (255, 0, 255)
 
 # Directions
-UP = (0, -1)
-DOWN = (0, 1)
-LEFT = (-1, 0)
-RIGHT = (1, 0)
+UP, DOWN, LEFT, RIGHT = snake_core.UP, snake_core.DOWN, snake_core.LEFT, snake_core.RIGHT
+CONTROL_MODES = ('keyboard', 'finger', 'autopilot')
+ARROW_KEYS = {pygame.K_UP: UP, pygame.K_DOWN: DOWN, pygame.K_LEFT: LEFT, pygame.K_RIGHT: RIGHT}
+
+# The display, fonts and the camera libraries are set up on first use,
+# not at import (see init_display, load_fonts, load_vision)
+screen = None
+font_small = font_medium = font_large = font_title = None
+cv2 = mp = None
 
-# Set up the display
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption('Snake Game - Ultimate Edition')
+# Milliseconds spent in each startup phase, reported after the first frame
+startup_times = {}
 
 clock = pygame.time.Clock()
 
-# Fonts
-font_small = pygame.font.SysFont('Arial', 18)
-font_medium = pygame.font.SysFont('Arial', 24)
-font_large = pygame.font.SysFont('Arial', 48)
-font_title = pygame.font.SysFont('Arial', 64, bold=True)
+# Rendering runs at display refresh; the simulation ticks at the snake's
+# speed independently of it. Animations are driven by elapsed milliseconds.
+FPS = 60
+FRAME_MS = 1000 / FPS
+MAX_TICKS_PER_FRAME = 5  # Don't spiral after a long stall
 
-class PowerUp:
-    def __init__(self):
-        self.type = random.choice(["speed_boost", "slow_down", "score_multiplier", "shield"])
-        self.position = (0, 0)
+# Resolution of the snake body colour gradient lookup tables
+GRADIENT_STEPS = 1024
+
+def init_display():
+    global screen
+    start = time.perf_counter()
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption('Snake Game - Ultimate Edition')
+    startup_times["display"] = (time.perf_counter() - start) * 1000
+    return screen
+
+def load_fonts():
+    global font_small, font_medium, font_large, font_title
+    start = time.perf_counter()
+    font_small = pygame.font.SysFont('Arial', 18)
+    font_medium = pygame.font.SysFont('Arial', 24)
+    font_large = pygame.font.SysFont('Arial', 48)
+    font_title = pygame.font.SysFont('Arial', 64, bold=True)
+    startup_times["fonts"] = (time.perf_counter() - start) * 1000
+
+def load_vision():
+    # OpenCV and MediaPipe take seconds to import and only finger mode
+    # needs them
+    global cv2, mp
+    import cv2
+    import mediapipe as mp
+
+class SurfaceCache:
+    # Bounded LRU of pre-rendered surfaces. build() is only called on a miss.
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key, build):
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = build()
+        self.entries[key] = surface
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        return surface
+    
+    def stats(self):
+        return {"size": len(self.entries), "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
+
+# Sprites are keyed by (kind, size, colour/alpha bucket), text by (font, text, colour)
+sprite_cache = SurfaceCache(256)
+text_cache = SurfaceCache(512)
+
+def render_text(font, text, color):
+    return text_cache.get((font, text, color), lambda: font.render(text, True, color))
+
+def alpha_panel(size, alpha):
+    # Semi-transparent black panel used behind overlays
+    def build():
+        panel = pygame.Surface(size, pygame.SRCALPHA)
+        panel.fill((0, 0, 0, alpha))
+        return panel
+    return sprite_cache.get(("panel", size, alpha), build)
+
+class PowerUp(snake_core.PowerUp):
+    def __init__(self, board, spawn_time=0, type=None):
+        super().__init__(board, spawn_time, type)
         self.color = self.get_color()
-        self.duration = 300  # frames (5 seconds at 60fps)
-        self.active = False
-        self.spawn_time = pygame.time.get_ticks()
-        self.randomize_position()
         self.size = CELL_SIZE
         self.pulse_phase = 0
         
@@ -67,139 +142,274 @@ class PowerUp:
             "shield": BLUE
         }[self.type]
         
-    def randomize_position(self):
-        self.position = (
-            random.randint(0, (WIDTH - CELL_SIZE) // CELL_SIZE) * CELL_SIZE,
-            random.randint(0, (HEIGHT - CELL_SIZE) // CELL_SIZE) * CELL_SIZE
-        )
-        
-    def update(self):
-        self.pulse_phase = (self.pulse_phase + 0.05) % (2 * math.pi)
+    def update(self, dt=FRAME_MS):
+        self.pulse_phase = (self.pulse_phase + 0.003 * dt) % (2 * math.pi)
         self.size = CELL_SIZE * (0.9 + 0.1 * math.sin(self.pulse_phase))
         
-    def draw(self, surface):
-        pygame.draw.circle(surface, self.color, 
-                         (self.position[0] + CELL_SIZE//2, 
-                          self.position[1] + CELL_SIZE//2), 
-                         int(self.size//2))
+    def draw(self, surface, origin=(0, 0)):
+        # origin: world pixel drawn at the surface's top left corner
+        radius = int(self.size//2)
+        sprite = sprite_cache.get(("powerup", radius, self.color),
+                                  lambda: self.build_sprite(radius))
+        half = sprite.get_width() // 2
+        surface.blit(sprite, (self.position[0] * CELL_SIZE - origin[0] + CELL_SIZE//2 - half, 
+                              self.position[1] * CELL_SIZE - origin[1] + CELL_SIZE//2 - half))
+    
+    def build_sprite(self, radius):
+        half = radius + 3
+        sprite = pygame.Surface((half * 2, half * 2), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, self.color, (half, half), radius)
         
         # Draw outer ring
-        pygame.draw.circle(surface, WHITE, 
-                         (self.position[0] + CELL_SIZE//2, 
-                          self.position[1] + CELL_SIZE//2), 
-                         int(self.size//2 + 2), 2)
+        pygame.draw.circle(sprite, WHITE, (half, half), radius + 2, 2)
+        return sprite
 
-class LevelSystem:
-    def __init__(self):
-        self.level = 1
-        self.target_score = 10
-        self.border_color = (255, 255, 255)
+class LevelSystem(snake_core.LevelSystem):
+    # Level-up effect by quality (per-frame cost at 800x600 in brackets):
+    #   off     nothing
+    #   low     pulsing border (~0.03 ms)
+    #   medium  border, and rings zooming out from the centre (~0.05 ms)
+    #   high    both, plus a ghost of the frame at level up swelling and
+    #           fading over the game (~0.4 ms)
+    # The ghost is a half size snapshot taken on the first frame. Each zoom
+    # step is scaled up from it, and dimmed to that step's opacity, a band
+    # of rows per frame into a back buffer, then swapped in and added onto
+    # the frame (additive, so black adds nothing and no alpha blending is
+    # needed). Both buffers are kept from one level up to the next. The
+    # old effect rescaled the whole screen every frame (~0.8 ms mean, ~1
+    # ms worst). The buffers are shared by every game in the run and can
+    # be allocated up front with ghost_surfaces(), since fresh memory
+    # costs ~1.5 ms a buffer the first time it is touched.
+    TRANSITION_QUALITIES = ("off", "low", "medium", "high")
+    transition_quality = "medium"
+    transition_ms = 500
+    ring_count = 3
+    ghost_downscale = 2
+    ghost_steps = 6
+    ghost_bands = 4     # Frames it takes to build one zoom step
+    ghost_zoom = 0.08   # How far the ghost grows over the transition
+    ghost_alpha = 150   # Its brightness at the start, fading to 0
+    ghost_cache = {}    # Window size -> (snapshot, [shown, being built], shade)
+    
+    def __init__(self, rng=random):
+        super().__init__(rng)
         self.transition_timer = 0
         self.zooming = False
+        self.captured = False
+        self.snapshot = self.buffers = self.shade = None
+        self.built = 0       # Zoom steps finished this transition
+        self.band = 0        # Bands of the next step done so far
         
     def update(self, score):
-        if score >= self.target_score:
-            self.level += 1
-            self.target_score = self.level * 15
-            self.border_color = (
-                random.randint(100, 255),
-                random.randint(100, 255),
-                random.randint(100, 255)
-            )
-            self.transition_timer = 30  # 0.5 seconds at 60fps
-            self.zooming = True
+        if super().update(score):
+            if self.transition_quality != "off":
+                self.transition_timer = self.transition_ms
+                self.zooming = True
+                self.captured = False
             return True
         return False
     
-    def draw_border(self, surface):
+    def update_transition(self, dt=FRAME_MS):
         if self.transition_timer > 0:
-            self.transition_timer -= 1
-            zoom_factor = 1.0 + 0.05 * math.sin(self.transition_timer * 0.2)
-            
-            # Create zoom effect
-            zoomed = pygame.transform.scale(surface, 
-                                          (int(WIDTH * zoom_factor), 
-                                           int(HEIGHT * zoom_factor)))
-            surface.blit(zoomed, 
-                        ((WIDTH - WIDTH * zoom_factor) // 2, 
-                         (HEIGHT - HEIGHT * zoom_factor) // 2))
-            
+            self.transition_timer = max(0, self.transition_timer - dt)
             if self.transition_timer == 0:
                 self.zooming = False
+    
+    def draw_transition(self, surface):
+        if not self.zooming or self.transition_quality == "off":
+            return
+        progress = 1 - self.transition_timer / self.transition_ms
+        width, height = surface.get_size()
+        
+        if self.transition_quality == "high":
+            self.draw_ghost(surface, progress, width, height)
+        if self.transition_quality != "low":
+            # Outlines growing from the centre to the edges, fading as they go
+            for i in range(self.ring_count):
+                t = progress * 1.5 - i * 0.25
+                if 0 < t < 1:
+                    color = [int(c * (1 - t)) for c in self.border_color]
+                    rect = pygame.Rect(0, 0, int(width * t), int(height * t))
+                    rect.center = (width // 2, height // 2)
+                    pygame.draw.rect(surface, color, rect, 2)
+        
+        # Border pulse: swells and settles back once over the transition
+        thickness = 2 + int(10 * math.sin(math.pi * progress))
+        pygame.draw.rect(surface, self.border_color, surface.get_rect(), thickness)
+    
+    @classmethod
+    def ghost_surfaces(cls, surface):
+        # Snapshot, buffers (sized for the biggest step) and dimming band
+        # for a window of this size, in the screen's pixel format
+        size = surface.get_size()
+        surfaces = cls.ghost_cache.get(size)
+        if surfaces is None:
+            width, height = size
+            biggest = cls.ghost_rect(cls.ghost_steps - 1, width, height)
+            snapshot = pygame.Surface((width // cls.ghost_downscale, height // cls.ghost_downscale), 0, surface)
+            buffers = [pygame.Surface(biggest.size, 0, surface) for _ in range(2)]
+            shade = pygame.Surface((biggest.width, biggest.height // cls.ghost_bands + 1), 0, surface)
+            surfaces = cls.ghost_cache[size] = (snapshot, buffers, shade)
+        return surfaces
+    
+    @classmethod
+    def ghost_rect(cls, step, width, height):
+        zoom = 1 + cls.ghost_zoom * (step + 1) / cls.ghost_steps
+        return pygame.Rect(0, 0, int(width * zoom), int(height * zoom))
+    
+    def build_band(self, width, height):
+        # Scales and dims the next band of rows of the next zoom step
+        step, band, bands = self.built, self.band, self.ghost_bands
+        source = self.snapshot
+        target = self.ghost_rect(step, width, height)
+        top, bottom = (source.get_height() * k // bands for k in (band, band + 1))
+        rows = pygame.Rect(0, target.height * band // bands, target.width, 0)
+        rows.height = target.height * (band + 1) // bands - rows.top
+        buffer = self.buffers[1]
+        pygame.transform.scale(source.subsurface(0, top, source.get_width(), bottom - top),
+                               rows.size, buffer.subsurface(rows))
+        level = int(self.ghost_alpha * (1 - (step + 0.5) / self.ghost_steps))
+        self.shade.fill((level, level, level))
+        buffer.blit(self.shade, rows, rows.move(0, -rows.top), special_flags=pygame.BLEND_RGB_MULT)
+        self.band += 1
+        if self.band == bands:
+            self.buffers.reverse()
+            self.built += 1
+            self.band = 0
+    
+    def draw_ghost(self, surface, progress, width, height):
+        if not self.captured:
+            # The first frame of the transition, before the HUD goes on
+            self.snapshot, self.buffers, self.shade = self.ghost_surfaces(surface)
+            pygame.transform.scale(surface, self.snapshot.get_size(), self.snapshot)
+            self.captured = True
+            self.built = self.band = 0
+            return
+        # Keep at most one step ahead of the transition
+        if self.built < self.ghost_steps and progress * self.ghost_steps >= self.built - 1:
+            self.build_band(width, height)
+        if self.built:
+            ghost = self.ghost_rect(self.built - 1, width, height)
+            surface.blit(self.buffers[0], ((width - ghost.width) // 2, (height - ghost.height) // 2),
+                         ghost, special_flags=pygame.BLEND_RGB_ADD)
+
+class BackgroundLayer:
+    # Grid, border and level indicator pre-rendered into one surface and
+    # blitted in a single call. Rebuilt only when the level, border colour
+    # or window size changes.
+    def __init__(self):
+        self.surface = None
+        self.key = None
+        self.rebuilds = 0
+    
+    def build(self, size, level, border_color):
+        width, height = size
+        background = pygame.Surface(size).convert()
+        background.fill(BLACK)
+        
+        # Draw grid (faint)
+        for x in range(0, width, CELL_SIZE):
+            pygame.draw.line(background, GRID_COLOR, (x, 0), (x, height))
+        for y in range(0, height, CELL_SIZE):
+            pygame.draw.line(background, GRID_COLOR, (0, y), (width, y))
         
-        pygame.draw.rect(surface, self.border_color, (0, 0, WIDTH, HEIGHT), 5)
+        pygame.draw.rect(background, border_color, (0, 0, width, height), 5)
         
         # Draw level indicator
-        level_text = font_medium.render(f"Level: {self.level}", True, self.border_color)
-        surface.blit(level_text, (WIDTH - level_text.get_width() - 20, HEIGHT - 40))
+        level_text = render_text(font_medium, f"Level: {level}", border_color)
+        background.blit(level_text, (width - level_text.get_width() - 20, height - 40))
+        return background
+    
+    def refresh(self, size, level_system):
+        key = (size, level_system.level, level_system.border_color)
+        if key != self.key:
+            self.surface = self.build(*key)
+            self.key = key
+            self.rebuilds += 1
+        return self.surface
+    
+    def draw(self, surface, level_system):
+        surface.blit(self.refresh(surface.get_size(), level_system), (0, 0))
 
 
 
-class Snake:
-    def __init__(self):
-        self.reset()
-        
+def build_gradient(difficulty, steps=GRADIENT_STEPS):
+    # Colour of a segment at fraction t = i / length along the body
+    palette = np.zeros((steps, 3), dtype=np.uint8)
+    t = np.arange(steps) / steps
+    if difficulty == "Easy":
+        # Green to light green gradient
+        palette[:, 1] = 150 + (105 * t).astype(int)
+    elif difficulty == "Medium":
+        # Orange to yellow gradient
+        palette[:, 0] = 200 + (55 * t).astype(int)
+        palette[:, 1] = 100 + (155 * t).astype(int)
+    else:
+        # Red to pink gradient
+        palette[:, 0] = 180 + (75 * t).astype(int)
+        palette[:, 2] = (75 * t).astype(int)
+    return palette
+
+BODY_PALETTES = {difficulty: build_gradient(difficulty) for difficulty in ("Easy", "Medium", "Hard")}
+# The same as tuples, for per-segment fills
+BODY_COLORS = {difficulty: [tuple(int(c) for c in row) for row in palette]
+               for difficulty, palette in BODY_PALETTES.items()}
+
+class Snake(snake_core.Snake):
+    # From this length on the body is drawn as one layer (see
+    # draw_body_layer); below it a fill per segment is cheaper
+    layer_min_length = 100
+    
     def reset(self):
-        self.positions = [(WIDTH//2, HEIGHT//2)]
-        self.direction = RIGHT
-        self.grow_pending = False
-        self.speed = 10
-        self.length = 1
-        self.difficulty = "Easy"
-        self.body_colors = []
+        super().reset()
+        self.prev_head = self.positions[0]
+        # Cells whose contents changed since the renderer last looked
+        self.dirty_cells = set()
+        
+        # Move number at which each cell was last entered. A body cell's
+        # segment index is its age, so colours never need rebuilding.
+        board = self.board
+        self.moves = 0
+        self.birth = np.zeros((board.cols, board.rows), dtype=np.int32)
+        self.occupancy_view = np.frombuffer(board.occupancy, dtype=np.uint8).reshape(board.rows, board.cols).T
+        self.body_layer = None
+        self.body_scaled = None
+        self.body_layer_key = None
         
     def move(self):
-        head_x, head_y = self.positions[0]
-        dir_x, dir_y = self.direction
-        new_head = ((head_x + dir_x * CELL_SIZE) % WIDTH, 
-                   (head_y + dir_y * CELL_SIZE) % HEIGHT)
-        
-        if self.grow_pending:
-            self.positions.insert(0, new_head)
-            self.length += 1
-            self.update_difficulty()
-            self.update_body_colors()
-            self.grow_pending = False
-        else:
-            self.positions = [new_head] + self.positions[:-1]
+        grew = self.grow_pending
+        tail = self.positions[-1]
+        # The interpolated head may still be drawn over the older cell
+        self.dirty_cells.add(self.prev_head)
+        self.prev_head = self.positions[0]
+        super().move()
+        self.moves += 1
+        self.birth[self.positions[0]] = self.moves
+        self.dirty_cells.update((self.prev_head, self.positions[0]))
+        if not grew:
+            self.dirty_cells.add(tail)
     
-    def update_difficulty(self):
-        if self.length < 10:
-            self.difficulty = "Easy"
-        elif self.length < 20:
-            self.difficulty = "Medium"
-        else:
-            self.difficulty = "Hard"
-    
-    def update_body_colors(self):
-        # Create a smooth color transition based on length
-        self.body_colors = []
-        for i in range(self.length):
-            if self.difficulty == "Easy":
-                # Green to light green gradient
-                intensity = 150 + int(105 * (i / self.length))
-                self.body_colors.append((0, intensity, 0))
-            elif self.difficulty == "Medium":
-                # Orange to yellow gradient
-                intensity_r = 200 + int(55 * (i / self.length))
-                intensity_g = 100 + int(155 * (i / self.length))
-                self.body_colors.append((intensity_r, intensity_g, 0))
-            else:
-                # Red to pink gradient
-                intensity_r = 180 + int(75 * (i / self.length))
-                intensity_b = int(75 * (i / self.length))
-                self.body_colors.append((intensity_r, 0, intensity_b))
+    def segment_color(self, cell):
+        # Gradient colour of the body segment on cell, from the lookup table
+        i = self.moves - int(self.birth[cell]) - 1
+        return BODY_COLORS[self.difficulty][i * GRADIENT_STEPS // self.length]
     
-    def grow(self):
-        self.grow_pending = True
+    def head_pixel(self, alpha=1.0):
+        # Head position interpolated between the last two ticks
+        (px, py), (hx, hy) = self.prev_head, self.positions[0]
+        if abs(hx - px) > 1 or abs(hy - py) > 1:
+            alpha = 1.0  # Wrapped around an edge, don't slide across the board
+        return (int((px + (hx - px) * alpha) * CELL_SIZE),
+                int((py + (hy - py) * alpha) * CELL_SIZE))
     
-    def change_direction(self, direction):
-        if (direction[0] * -1, direction[1] * -1) != self.direction:
-            self.direction = direction
+    def draw(self, surface, alpha=1.0):
+        self.draw_body(surface)
+        self.draw_head(surface, alpha)
     
-    def draw(self, surface):
+    def draw_head(self, surface, alpha=1.0, origin=(0, 0)):
         # Draw round head with eyes
-        head = self.positions[0]
+        head = self.head_pixel(alpha)
+        head = (head[0] - origin[0], head[1] - origin[1])
         pygame.draw.circle(surface, BLUE, 
                          (head[0] + CELL_SIZE//2, head[1] + CELL_SIZE//2), 
                          CELL_SIZE//2)
@@ -221,198 +431,833 @@ class Snake:
         
         pygame.draw.circle(surface, WHITE, eye1_pos, eye_size)
         pygame.draw.circle(surface, WHITE, eye2_pos, eye_size)
-        
-        # Draw body with smooth color transition
-        for i, pos in enumerate(self.positions[1:]):
-            color_index = min(i, len(self.body_colors)-1)
-            pygame.draw.rect(surface, self.body_colors[color_index], 
-                           pygame.Rect(pos[0], pos[1], CELL_SIZE, CELL_SIZE))
     
-    def check_collision(self):
-        return self.positions[0] in self.positions[1:]
+    def draw_body(self, surface, cells=None):
+        # Draw body with smooth color transition, optionally only the
+        # segments that lie in the given set of cells
+        if cells is None:
+            if self.length < self.layer_min_length:
+                self.draw_body_segments(surface)
+            else:
+                self.draw_body_layer(surface)
+            return
+        head = self.positions[0]
+        occupancy = self.occupancy_view
+        for pos in cells:
+            if pos == head or not (0 <= pos[0] < self.board.cols and 0 <= pos[1] < self.board.rows):
+                continue
+            if occupancy[pos]:
+                pygame.draw.rect(surface, self.segment_color(pos), 
+                               pygame.Rect(pos[0] * CELL_SIZE, pos[1] * CELL_SIZE, CELL_SIZE, CELL_SIZE))
+    
+    def draw_body_segments(self, surface):
+        # Segment k (head is 0) is k - 1 moves old, so its colour comes
+        # straight from its index
+        palette = BODY_COLORS[self.difficulty]
+        length = self.length
+        fill = surface.fill
+        for i, (x, y) in enumerate(islice(self.positions, 1, None)):
+            fill(palette[i * GRADIENT_STEPS // length], (x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
+    
+    def draw_body_layer(self, surface):
+        # Whole body in one blit: colour every cell of a one-pixel-per-cell
+        # surface from the lookup table, then scale it up by CELL_SIZE.
+        # Colours only change when the snake moves, so frames in between
+        # reuse the scaled layer.
+        if len(self.positions) < 2:
+            return
+        key = (self.moves, self.length, self.difficulty)
+        if key != self.body_layer_key:
+            cols, rows = self.board.cols, self.board.rows
+            if self.body_layer is None:
+                self.body_layer = pygame.Surface((cols, rows)).convert()
+                self.body_scaled = pygame.Surface((cols * CELL_SIZE, rows * CELL_SIZE)).convert()
+                self.body_scaled.set_colorkey(BLACK)
+            age = self.moves - self.birth
+            index = np.clip((age - 1) * GRADIENT_STEPS // self.length, 0, GRADIENT_STEPS - 1)
+            pixels = BODY_PALETTES[self.difficulty][index]
+            pixels[self.occupancy_view == 0] = 0
+            pixels[self.positions[0]] = 0
+            pygame.surfarray.blit_array(self.body_layer, pixels)
+            pygame.transform.scale(self.body_layer, self.body_scaled.get_size(), self.body_scaled)
+            self.body_layer_key = key
+        surface.blit(self.body_scaled, (0, 0))
 
-class Food:
-    def __init__(self):
-        self.position = (0, 0)
+class Food(snake_core.Food):
+    def __init__(self, board):
         self.color = RED
         self.glow_phase = 0
         self.size_phase = 0
-        self.randomize_position()
+        self.dirty_cells = set()
+        super().__init__(board)
     
     def randomize_position(self):
-        self.position = (
-            random.randint(0, (WIDTH - CELL_SIZE) // CELL_SIZE) * CELL_SIZE,
-            random.randint(0, (HEIGHT - CELL_SIZE) // CELL_SIZE) * CELL_SIZE
-        )
+        self.dirty_cells.add(self.position)
+        moved = super().randomize_position()
+        self.dirty_cells.add(self.position)
+        return moved
     
-    def update(self):
+    def update(self, dt=FRAME_MS):
         # Add pulsing glow and size effect
-        self.glow_phase = (self.glow_phase + 0.05) % (2 * np.pi)
-        self.size_phase = (self.size_phase + 0.1) % (2 * np.pi)
+        self.glow_phase = (self.glow_phase + 0.003 * dt) % (2 * np.pi)
+        self.size_phase = (self.size_phase + 0.006 * dt) % (2 * np.pi)
         
         glow_intensity = int((np.sin(self.glow_phase) + 1)) * 50
         self.color = (min(255, RED[0] + glow_intensity), 
                      min(255, RED[1] + glow_intensity//2), 
                      min(255, RED[2] + glow_intensity//3))
     
-    def draw(self, surface):
+    def draw(self, surface, origin=(0, 0)):
         # Calculate pulsing size
         size_factor = 0.8 + 0.2 * math.sin(self.size_phase)
         current_size = int(CELL_SIZE * size_factor)
-        offset = (CELL_SIZE - current_size) // 2
+        x, y = self.position[0] * CELL_SIZE - origin[0], self.position[1] * CELL_SIZE - origin[1]
         
         # Draw food with glow effect
         pygame.draw.circle(surface, self.color, 
-                         (self.position[0] + CELL_SIZE//2, 
-                          self.position[1] + CELL_SIZE//2), 
+                         (x + CELL_SIZE//2, y + CELL_SIZE//2), 
                          current_size//2)
         
-        # Add subtle glow
+        # Add subtle glow (alpha quantised to buckets of 8 so sprites get reused)
         glow_radius = int(CELL_SIZE * 1.2)
+        glow_intensity = int(50 * (math.sin(self.glow_phase) + 1)) // 8 * 8
+        glow_surface = sprite_cache.get(("glow", glow_radius, self.color, glow_intensity),
+                                        lambda: self.build_glow(glow_radius, glow_intensity))
+        surface.blit(glow_surface, (x - glow_radius + CELL_SIZE//2, 
+                                  y - glow_radius + CELL_SIZE//2))
+    
+    def build_glow(self, glow_radius, glow_intensity):
         glow_surface = pygame.Surface((glow_radius*2, glow_radius*2), pygame.SRCALPHA)
-        glow_intensity = int(50 * (math.sin(self.glow_phase) + 1))
         pygame.draw.circle(glow_surface, (*self.color, glow_intensity), 
                           (glow_radius, glow_radius), glow_radius)
-        surface.blit(glow_surface, (self.position[0] - glow_radius + CELL_SIZE//2, 
-                                  self.position[1] - glow_radius + CELL_SIZE//2))
+        return glow_surface
 
-class FoodSystem:
-    def __init__(self):
-        self.foods = []
-        self.powerups = []
-        self.special_food_timer = 0
-        
-    def update(self):
-        # Regular food spawn
-        if random.random() < 0.01 and len(self.foods) < 3:
-            self.foods.append(Food())
-            
-        # Special food spawn
-        self.special_food_timer += 1
-        if self.special_food_timer > 600 and len(self.powerups) < 2:  # Every 10 seconds
-            self.powerups.append(PowerUp())
-            self.special_food_timer = 0
-            
-        # Update all foods
-        for food in self.foods:
-            food.update()
-        for powerup in self.powerups:
-            powerup.update()
-            
-        # Remove expired powerups
-        current_time = pygame.time.get_ticks()
-        self.powerups = [p for p in self.powerups 
-                         if current_time - p.spawn_time < 10000]  # 10 second lifespan
+class FoodSystem(snake_core.FoodSystem):
+    food_class = Food
+    powerup_class = PowerUp
+        
+    def update(self, dt=FRAME_MS):
+        super().update()
+        self.animate(dt)
+    
+    def animate(self, dt=FRAME_MS):
+        for entity in self.pickups:
+            entity.update(dt)
     
     def draw(self, surface):
-        for food in self.foods:
-            food.draw(surface)
-        for powerup in self.powerups:
-            powerup.draw(surface)
+        for entity in self.pickups:
+            entity.draw(surface)
+
+class Game(snake_core.Game):
+    # The headless rules from snake_core with drawable entities plugged in
+    snake_class = Snake
+    food_class = Food
+    powerup_class = PowerUp
+    level_class = LevelSystem
+    food_system_class = FoodSystem
+
+class DirtyRenderer:
+    # Redraws only the cells that changed since the last frame and hands
+    # their rects to pygame.display.update(). Cells get dirty when the snake
+    # moves, food respawns or pickups come and go; pickups, the
+    # head and the HUD animate every frame so their areas are always dirty.
+    # Body colours depend on segment index, so every move shifts the whole
+    # gradient along; the colour each body cell was last painted with is
+    # kept, and the cells whose colour changed are repainted too. That is
+    # bounded by the number of shades in the palette, not the length.
+    HUD_HEIGHT = 70
+    HUD_WIDTH = 220
+    
+    def __init__(self, profiler=None):
+        self.profiler = profiler or FrameProfiler()
+        self.painted = None  # (cols, rows, 3) colour last painted per body cell
+        self.painted_key = None
+        self.prev_pickups = set()
+        self.background_key = None
+        self.needs_full = True
+        self.last_rect_count = 0
+    
+    def invalidate(self):
+        self.needs_full = True
+    
+    def area_cells(self, cell, cols, rows, radius=1):
+        # Cells covered by a sprite centred on cell (glows spill over)
+        x, y = cell
+        return [(cx, cy)
+                for cy in range(max(0, y - radius), min(rows, y + radius + 1))
+                for cx in range(max(0, x - radius), min(cols, x + radius + 1))]
+    
+    def rect_cells(self, rect, cols, rows):
+        x0, y0 = rect.left // CELL_SIZE, rect.top // CELL_SIZE
+        x1 = min(cols, (rect.right + CELL_SIZE - 1) // CELL_SIZE)
+        y1 = min(rows, (rect.bottom + CELL_SIZE - 1) // CELL_SIZE)
+        return [(x, y) for y in range(y0, y1) for x in range(x0, x1)]
+    
+    def draw_full(self, surface, game, background, alpha, draw_hud):
+        profiler = self.profiler
+        with profiler.stage("draw_background"):
+            background.draw(surface, game.level_system)
+        with profiler.stage("draw_snake"):
+            game.snake.draw(surface, alpha)
+        with profiler.stage("draw_food"):
+            game.food_system.draw(surface)
+        with profiler.stage("draw_transition"):
+            game.level_system.draw_transition(surface)
+        with profiler.stage("draw_hud"):
+            draw_hud(surface)
+    
+    def body_colors(self, snake):
+        # Cells of the body behind the head and the colour each should be
+        segments = len(snake.positions) - 1
+        cells = np.array(list(islice(snake.positions, 1, None)), dtype=np.intp).reshape(segments, 2)
+        index = np.arange(segments) * GRADIENT_STEPS // snake.length
+        return cells[:, 0], cells[:, 1], BODY_PALETTES[snake.difficulty][index]
+    
+    def stale_body_cells(self, snake):
+        # Body cells painted in a colour they no longer have
+        key = (snake.moves, snake.length, snake.difficulty)
+        if key == self.painted_key or len(snake.positions) < 2:
+            return []
+        self.painted_key = key
+        xs, ys, colors = self.body_colors(snake)
+        changed = (self.painted[xs, ys] != colors).any(axis=1)
+        self.painted[xs, ys] = colors
+        return zip(xs[changed].tolist(), ys[changed].tolist())
+    
+    def mark_clean(self, game, background):
+        # The screen now holds a complete frame
+        snake = game.snake
+        board = snake.board
+        if self.painted is None or self.painted.shape[:2] != (board.cols, board.rows):
+            self.painted = np.zeros((board.cols, board.rows, 3), dtype=np.uint8)
+        self.painted_key = None
+        if len(snake.positions) > 1:
+            xs, ys, colors = self.body_colors(snake)
+            self.painted[xs, ys] = colors
+            self.painted_key = (snake.moves, snake.length, snake.difficulty)
+        game.snake.dirty_cells.clear()
+        game.food.dirty_cells.clear()
+        self.prev_pickups = set(game.food_system.pickups.by_cell)
+        self.background_key = background.key
+        self.needs_full = False
+    
+    def draw(self, surface, game, background, alpha, draw_hud):
+        # Returns the list of rects to pass to pygame.display.update()
+        width, height = surface.get_size()
+        cols, rows = width // CELL_SIZE, height // CELL_SIZE
+        snake = game.snake
+        bg = background.refresh((width, height), game.level_system)
+        
+        if self.needs_full or background.key != self.background_key:
+            self.draw_full(surface, game, background, alpha, draw_hud)
+            self.mark_clean(game, background)
+            self.last_rect_count = 1
+            return [surface.get_rect()]
+        
+        cells = set(snake.dirty_cells)
+        cells.update(game.food.dirty_cells)
+        cells.add(snake.prev_head)
+        cells.add(snake.positions[0])
+        
+        pickups = set(game.food_system.pickups.by_cell)
+        for cell in pickups | self.prev_pickups:
+            cells.update(self.area_cells(cell, cols, rows))
+        self.prev_pickups = pickups
+        
+        # Segments whose place in the gradient moved them to another shade
+        cells.update(self.stale_body_cells(snake))
+        
+        hud_rects = [pygame.Rect(0, 0, self.HUD_WIDTH, self.HUD_HEIGHT),
+                     pygame.Rect(width - self.HUD_WIDTH, 0, self.HUD_WIDTH, self.HUD_HEIGHT)]
+        for rect in hud_rects:
+            cells.update(self.rect_cells(rect, cols, rows))
+        
+        # Restore the background under every dirty cell, then repaint
+        profiler = self.profiler
+        rects = []
+        with profiler.stage("draw_background"):
+            for x, y in cells:
+                if 0 <= x < cols and 0 <= y < rows:
+                    rect = pygame.Rect(x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE)
+                    surface.blit(bg, rect, rect)
+                    rects.append(rect)
+        
+        with profiler.stage("draw_snake"):
+            snake.draw_body(surface, cells)
+            snake.draw_head(surface, alpha)
+        with profiler.stage("draw_food"):
+            game.food_system.draw(surface)
+        with profiler.stage("draw_hud"):
+            draw_hud(surface)
+        
+        snake.dirty_cells.clear()
+        game.food.dirty_cells.clear()
+        self.last_rect_count = len(rects)
+        return rects
+
+class ArenaRenderer:
+    # Renders boards far bigger than the window (1000x1000 cells and up)
+    # through a camera that follows the head. The board is cut into chunks
+    # of CHUNK x CHUNK cells that are rendered once into cached surfaces and
+    # then only patched where cells changed, so a frame costs a handful of
+    # blits however big the arena is. Body colours are stripes keyed on the
+    # move a cell was entered (not the segment index) so a painted cell
+    # never goes stale. A minimap in the corner keeps one pixel per block
+    # of cells, also updated from the changed cells only. Memory is not
+    # flat though: with the board's own tables, a 1000x1000 arena costs
+    # ~14 MB in per-cell arrays, plus 0.4 MB per cached chunk (up to 48).
+    CHUNK = 16
+    MINIMAP_SIZE = 160
+    STRIPE_PERIOD = 48  # Moves per light-dark-light body stripe
+    EMPTY_BLOCK = (20, 20, 20)
+    
+    def __init__(self, profiler=None, cache_size=48):
+        self.profiler = profiler or FrameProfiler()
+        self.chunks = SurfaceCache(cache_size)
+        self.birth = None
+        self.difficulty = None
+        chunk_px = self.CHUNK * CELL_SIZE
+        self.grid_tile = pygame.Surface((chunk_px, chunk_px)).convert()
+        self.grid_tile.fill(BLACK)
+        for i in range(0, chunk_px, CELL_SIZE):
+            pygame.draw.line(self.grid_tile, GRID_COLOR, (i, 0), (i, chunk_px))
+            pygame.draw.line(self.grid_tile, GRID_COLOR, (0, i), (chunk_px, i))
+        # Stripe number -> gradient index, a triangle wave so there's no seam
+        t = np.arange(self.STRIPE_PERIOD)
+        self.stripes = np.minimum(t, self.STRIPE_PERIOD - t) * (2 * GRADIENT_STEPS - 1) // self.STRIPE_PERIOD
+    
+    def invalidate(self):
+        # Every frame is drawn in full anyway, and the chunk caches follow
+        # the game state on their own (see sync)
+        pass
+    
+    def sync(self, snake):
+        # Start over after a reset (new grids) or a palette change
+        if snake.birth is not self.birth:
+            self.birth = snake.birth
+            self.difficulty = None
+            self.build_minimap(snake)
+        if snake.difficulty != self.difficulty:
+            self.difficulty = snake.difficulty
+            self.colors = BODY_PALETTES[snake.difficulty][self.stripes]
+            self.block_color = tuple(int(c) for c in BODY_PALETTES[snake.difficulty][GRADIENT_STEPS // 2])
+            self.chunks.entries.clear()
+            self.paint_minimap()
+    
+    def chunk_size(self, board, cx, cy):
+        # In cells; the last row and column of chunks can be short
+        return (min(self.CHUNK, board.cols - cx * self.CHUNK),
+                min(self.CHUNK, board.rows - cy * self.CHUNK))
+    
+    def build_chunk(self, snake, cx, cy):
+        w, h = self.chunk_size(snake.board, cx, cy)
+        x0, y0 = cx * self.CHUNK, cy * self.CHUNK
+        chunk = pygame.Surface((w * CELL_SIZE, h * CELL_SIZE)).convert()
+        chunk.blit(self.grid_tile, (0, 0))
+        occupied = snake.occupancy_view[x0:x0 + w, y0:y0 + h] != 0
+        hx, hy = snake.positions[0]
+        if x0 <= hx < x0 + w and y0 <= hy < y0 + h:
+            occupied[hx - x0, hy - y0] = False  # The head is drawn on top
+        if occupied.any():
+            pixels = self.colors[snake.birth[x0:x0 + w, y0:y0 + h] % self.STRIPE_PERIOD]
+            pixels[~occupied] = 0
+            layer = pygame.Surface((w, h)).convert()
+            pygame.surfarray.blit_array(layer, pixels)
+            layer = pygame.transform.scale(layer, chunk.get_size())
+            layer.set_colorkey(BLACK)
+            chunk.blit(layer, (0, 0))
+        return chunk
+    
+    def patch(self, snake, cell):
+        # Repaint one changed cell in its chunk, if that chunk is cached
+        x, y = cell
+        chunk = self.chunks.entries.get((x // self.CHUNK, y // self.CHUNK))
+        if chunk is None:
+            return
+        rect = pygame.Rect(x % self.CHUNK * CELL_SIZE, y % self.CHUNK * CELL_SIZE, CELL_SIZE, CELL_SIZE)
+        if snake.occupancy_view[cell] and cell != snake.positions[0]:
+            r, g, b = self.colors[snake.birth[cell] % self.STRIPE_PERIOD]
+            chunk.fill((int(r), int(g), int(b)), rect)
+        else:
+            chunk.blit(self.grid_tile, rect, rect)
+    
+    def build_minimap(self, snake):
+        # Occupied cells per block, from a block sum of the occupancy grid
+        board = snake.board
+        self.block = block = max(1, -(-max(board.cols, board.rows) // self.MINIMAP_SIZE))
+        mcols, mrows = -(-board.cols // block), -(-board.rows // block)
+        occupied = np.zeros((mcols * block, mrows * block), dtype=np.int32)
+        occupied[:board.cols, :board.rows] = snake.occupancy_view != 0
+        self.block_counts = occupied.reshape(mcols, block, mrows, block).sum(axis=(1, 3))
+        # What the minimap last counted for each cell
+        self.counted = snake.occupancy_view != 0
+        self.minimap = pygame.Surface((mcols, mrows)).convert()
+        self.minimap_scale = max(1, self.MINIMAP_SIZE // max(mcols, mrows))
+    
+    def paint_minimap(self):
+        pixels = np.empty(self.block_counts.shape + (3,), dtype=np.uint8)
+        pixels[:] = self.EMPTY_BLOCK
+        pixels[self.block_counts > 0] = self.block_color
+        pygame.surfarray.blit_array(self.minimap, pixels)
+    
+    def count_cell(self, snake, cell):
+        occupied = snake.occupancy_view[cell] != 0
+        if occupied == self.counted[cell]:
+            return
+        self.counted[cell] = occupied
+        bx, by = cell[0] // self.block, cell[1] // self.block
+        self.block_counts[bx, by] += 1 if occupied else -1
+        count = self.block_counts[bx, by]
+        if count == (1 if occupied else 0):
+            self.minimap.set_at((bx, by), self.block_color if occupied else self.EMPTY_BLOCK)
+    
+    def update(self, game):
+        # Bring cached chunks and the minimap up to date with the cells
+        # that changed since the last frame
+        snake = game.snake
+        self.sync(snake)
+        for cell in snake.dirty_cells:
+            self.patch(snake, cell)
+            self.count_cell(snake, cell)
+        snake.dirty_cells.clear()
+        game.food.dirty_cells.clear()
+    
+    def camera(self, snake, alpha, size):
+        # World pixel at the top left of the view, centred on the head
+        hx, hy = snake.head_pixel(alpha)
+        return ((hx + CELL_SIZE // 2 - size[0] // 2) % (snake.board.cols * CELL_SIZE),
+                (hy + CELL_SIZE // 2 - size[1] // 2) % (snake.board.rows * CELL_SIZE))
+    
+    def draw_chunks(self, surface, snake, camera):
+        # Walk the view in world pixels, wrapping around the board edges
+        board = snake.board
+        world_w, world_h = board.cols * CELL_SIZE, board.rows * CELL_SIZE
+        chunk_px = self.CHUNK * CELL_SIZE
+        width, height = surface.get_size()
+        sy = 0
+        while sy < height:
+            wy = (camera[1] + sy) % world_h
+            cy = wy // chunk_px
+            top = wy - cy * chunk_px
+            h = min(self.chunk_size(board, 0, cy)[1] * CELL_SIZE - top, height - sy)
+            sx = 0
+            while sx < width:
+                wx = (camera[0] + sx) % world_w
+                cx = wx // chunk_px
+                left = wx - cx * chunk_px
+                w = min(self.chunk_size(board, cx, 0)[0] * CELL_SIZE - left, width - sx)
+                chunk = self.chunks.get((cx, cy), lambda: self.build_chunk(snake, cx, cy))
+                surface.blit(chunk, (sx, sy), (left, top, w, h))
+                sx += w
+            sy += h
+    
+    def view_origin(self, pixel, camera, board, margin=2 * CELL_SIZE):
+        # Origin to draw something at world `pixel` with, so it lands at
+        # its wrapped screen position
+        sx = (pixel[0] - camera[0] + margin) % (board.cols * CELL_SIZE) - margin
+        sy = (pixel[1] - camera[1] + margin) % (board.rows * CELL_SIZE) - margin
+        return (pixel[0] - sx, pixel[1] - sy), (sx, sy)
+    
+    def draw_minimap(self, surface, game, camera):
+        board = game.board
+        scale = self.minimap_scale
+        size = (self.minimap.get_width() * scale, self.minimap.get_height() * scale)
+        rect = pygame.Rect(surface.get_width() - size[0] - 10, surface.get_height() - size[1] - 10, *size)
+        surface.blit(pygame.transform.scale(self.minimap, size), rect)
+        
+        def point(cell):
+            return (rect.left + cell[0] * size[0] // board.cols, rect.top + cell[1] * size[1] // board.rows)
+        for entity in game.food_system.pickups:
+            pygame.draw.circle(surface, entity.color, point(entity.position), 2)
+        pygame.draw.circle(surface, BLUE, point(game.snake.positions[0]), 3)
+        
+        # Viewport, clipped to the map where it wraps past an edge
+        view = pygame.Rect(rect.left + camera[0] * size[0] // (board.cols * CELL_SIZE),
+                           rect.top + camera[1] * size[1] // (board.rows * CELL_SIZE),
+                           max(2, surface.get_width() * size[0] // (board.cols * CELL_SIZE)),
+                           max(2, surface.get_height() * size[1] // (board.rows * CELL_SIZE)))
+        surface.set_clip(rect)
+        pygame.draw.rect(surface, WHITE, view, 1)
+        surface.set_clip(None)
+        
+        level_system = game.level_system
+        pygame.draw.rect(surface, level_system.border_color, rect.inflate(4, 4), 2)
+        level_text = render_text(font_small, f"Level: {level_system.level}", level_system.border_color)
+        surface.blit(level_text, (rect.right - level_text.get_width(), rect.top - level_text.get_height() - 6))
+    
+    def draw_full(self, surface, game, background, alpha, draw_hud):
+        # background is unused: the grid lives in the chunks
+        profiler = self.profiler
+        snake = game.snake
+        board = game.board
+        with profiler.stage("draw_snake"):
+            self.update(game)
+        camera = self.camera(snake, alpha, surface.get_size())
+        with profiler.stage("draw_background"):
+            self.draw_chunks(surface, snake, camera)
+        with profiler.stage("draw_snake"):
+            origin, _ = self.view_origin(snake.head_pixel(alpha), camera, board)
+            snake.draw_head(surface, alpha, origin)
+        with profiler.stage("draw_food"):
+            width, height = surface.get_size()
+            for entity in game.food_system.pickups:
+                origin, (sx, sy) = self.view_origin((entity.position[0] * CELL_SIZE,
+                                                     entity.position[1] * CELL_SIZE), camera, board)
+                if sx < width and sy < height:
+                    entity.draw(surface, origin)
+        with profiler.stage("draw_transition"):
+            game.level_system.draw_transition(surface)
+        with profiler.stage("draw_hud"):
+            pygame.draw.rect(surface, game.level_system.border_color, surface.get_rect(), 5)
+            self.draw_minimap(surface, game, camera)
+            draw_hud(surface)
+    
+    def draw(self, surface, game, background, alpha, draw_hud):
+        # The camera moves every frame, so this is always a full frame
+        self.draw_full(surface, game, background, alpha, draw_hud)
+        return [surface.get_rect()]
 
 class FingerController:
-    def __init__(self):
+    # source: camera index or a video file path. With threaded=False no
+    # worker threads are started and frames are fed to process_frame()
+    # directly (used by the benchmark on recorded video).
+    #
+    # MediaPipe runs on a downscaled copy of the frame (inference_width
+    # pixels wide), and once a fingertip is found only on a roi_size square
+    # around it. The camera image is never flipped for inference; the
+    # fingertip coordinates are mirrored instead. The preview window is
+    # optional and refreshed at most preview_fps times a second.
+    def __init__(self, source=0, threaded=True, inference_width=320, roi_size=256,
+                 preview=True, preview_fps=15):
+        load_vision()
         self.mp_hands = mp.solutions.hands
         self.hands = self.mp_hands.Hands(
             static_image_mode=False,
             max_num_hands=1,
             min_detection_confidence=0.7,
             min_tracking_confidence=0.5)
-        self.cap = cv2.VideoCapture(0)
+        self.cap = cv2.VideoCapture(source)
         self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
         
-        # For finger control
-        self.prev_finger_pos = None
-        self.direction_queue = deque(maxlen=3)
+        # For finger control: One-Euro filtered fingertip with prediction
         self.deadzone = 20  # Slightly larger deadzone for stability
-        self.smoothing_factor = 0.2  # For smoother direction changes
+        self.gesture_filter = GestureFilter(deadzone=self.deadzone)
         
-    def get_direction(self):
-        ret, frame = self.cap.read()
-        if not ret:
-            return None
+        # Frame preprocessing
+        self.inference_width = inference_width
+        self.roi_size = roi_size
+        self.roi_center = None  # Last fingertip in camera pixels (unmirrored)
+        self.buffers = {}
+        self.preview = preview
+        self.preview_interval = 1.0 / preview_fps if preview_fps else 0.0
+        self.last_preview_time = 0.0
+        self.roi_frames = 0
+        
+        # Shared state between the worker threads and the game loop.
+        # Only the newest camera frame is kept; older ones are dropped.
+        self.lock = threading.Lock()
+        self.frame_ready = threading.Condition(self.lock)
+        self.latest_frame = None
+        self.latest_frame_time = 0.0
+        self.direction = None
+        self.direction_time = 0.0
+        self.preview_frame = None
+        
+        # Pipeline statistics
+        self.frames_captured = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.capture_fps = 0.0
+        self.inference_ms = 0.0
+        self.last_capture_time = None
         
-        frame = cv2.flip(frame, 1)
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.hands.process(frame_rgb)
+        self.running = threaded
+        self.capture_thread = threading.Thread(target=self.capture_loop, daemon=True)
+        self.inference_thread = threading.Thread(target=self.inference_loop, daemon=True)
+        if threaded:
+            self.capture_thread.start()
+            self.inference_thread.start()
+    
+    def capture_loop(self):
+        while self.running:
+            ret, frame = self.cap.read()
+            if not ret:
+                time.sleep(0.01)
+                continue
+            
+            now = time.perf_counter()
+            with self.frame_ready:
+                if self.latest_frame is not None:
+                    # The inference thread never got to the previous frame
+                    self.frames_dropped += 1
+                self.latest_frame = frame
+                self.latest_frame_time = now
+                self.frames_captured += 1
+                if self.last_capture_time is not None:
+                    fps = 1.0 / max(now - self.last_capture_time, 1e-6)
+                    self.capture_fps += (fps - self.capture_fps) * 0.1
+                self.last_capture_time = now
+                self.frame_ready.notify()
+    
+    def inference_loop(self):
+        while self.running:
+            with self.frame_ready:
+                while self.running and self.latest_frame is None:
+                    self.frame_ready.wait(0.1)
+                if not self.running:
+                    break
+                frame = self.latest_frame
+                frame_time = self.latest_frame_time
+                self.latest_frame = None
+            
+            start = time.perf_counter()
+            direction, preview = self.process_frame(frame, frame_time)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            
+            with self.lock:
+                if direction:
+                    self.direction = direction
+                    self.direction_time = frame_time
+                if preview is not None:
+                    self.preview_frame = preview
+                self.frames_processed += 1
+                if self.frames_processed == 1:
+                    self.inference_ms = elapsed_ms
+                else:
+                    self.inference_ms += (elapsed_ms - self.inference_ms) * 0.1
+    
+    def buffer(self, kind, width, height):
+        # Preallocated image buffers, reused frame after frame
+        key = (kind, width, height)
+        buf = self.buffers.get(key)
+        if buf is None:
+            buf = self.buffers[key] = np.empty((height, width, 3), dtype=np.uint8)
+        return buf
+    
+    def inference_input(self, frame):
+        # Returns the RGB image to run MediaPipe on and the camera-pixel
+        # region (x0, y0, width, height) it covers
+        h, w = frame.shape[:2]
+        if self.roi_center is not None and self.roi_size < min(w, h):
+            size = self.roi_size
+            cx, cy = self.roi_center
+            x0 = min(max(0, cx - size // 2), w - size)
+            y0 = min(max(0, cy - size // 2), h - size)
+            region = (x0, y0, size, size)
+            self.roi_frames += 1
+        else:
+            region = (0, 0, w, h)
+        
+        x0, y0, rw, rh = region
+        crop = frame[y0:y0 + rh, x0:x0 + rw]  # A view, not a copy
+        scale = min(1.0, self.inference_width / w)
+        if scale < 1.0:
+            sw, sh = max(1, int(rw * scale)), max(1, int(rh * scale))
+            small = self.buffer("bgr", sw, sh)
+            cv2.resize(crop, (sw, sh), dst=small, interpolation=cv2.INTER_AREA)
+            crop = small
+        rgb = self.buffer("rgb", crop.shape[1], crop.shape[0])
+        cv2.cvtColor(crop, cv2.COLOR_BGR2RGB, dst=rgb)
+        return rgb, region
+    
+    def process_frame(self, frame, frame_time=None):
+        # Returns (direction, preview image or None)
+        if frame_time is None:
+            frame_time = time.perf_counter()
+        rgb, region = self.inference_input(frame)
+        results = self.hands.process(rgb)
+        x0, y0, rw, rh = region
+        h, w = frame.shape[:2]
         
         direction = None
+        finger = None
         
         if results.multi_hand_landmarks:
             for hand_landmarks in results.multi_hand_landmarks:
-                # Get index finger tip (landmark 8)
+                # Get index finger tip (landmark 8), back in camera pixels
                 finger_tip = hand_landmarks.landmark[8]
-                h, w = frame.shape[:2]
-                finger_x, finger_y = int(finger_tip.x * w), int(finger_tip.y * h)
-                
-                # Draw elegant tracking visuals
-                cv2.circle(frame, (finger_x, finger_y), 10, (0, 255, 0), 2)
-                cv2.circle(frame, (finger_x, finger_y), 5, (0, 255, 255), -1)
-                
-                if self.prev_finger_pos:
-                    dx = finger_x - self.prev_finger_pos[0]
-                    dy = finger_y - self.prev_finger_pos[1]
-                    
-                    # Only change direction if movement exceeds deadzone
-                    if abs(dx) > self.deadzone or abs(dy) > self.deadzone:
-                        if abs(dx) > abs(dy):
-                            direction = RIGHT if dx > 0 else LEFT
-                        else:
-                            direction = DOWN if dy > 0 else UP
+                raw_x, raw_y = x0 + finger_tip.x * rw, y0 + finger_tip.y * rh
+                self.roi_center = (int(raw_x), int(raw_y))
                 
-                self.prev_finger_pos = (finger_x, finger_y)
+                # Mirror horizontally so moving right means right on screen
+                finger_x, finger_y = int(w - 1 - raw_x), int(raw_y)
+                finger = (finger_x, finger_y)
+                direction = self.gesture_filter.update(frame_time, finger)
+        else:
+            # Lost the hand: search the whole frame again
+            self.roi_center = None
+            self.gesture_filter.reset()
+        
+        return direction, self.build_preview(frame, finger, region)
+    
+    def build_preview(self, frame, finger, region):
+        if not self.preview:
+            return None
+        now = time.perf_counter()
+        if now - self.last_preview_time < self.preview_interval:
+            return None
+        self.last_preview_time = now
+        
+        # Only the preview is flipped, and only at the preview rate
+        preview = cv2.flip(frame, 1)
+        w = frame.shape[1]
+        x0, y0, rw, rh = region
+        if rw < w:
+            cv2.rectangle(preview, (w - x0 - rw, y0), (w - 1 - x0, y0 + rh), (80, 80, 80), 1)
+        if finger:
+            # Draw elegant tracking visuals
+            cv2.circle(preview, finger, 10, (0, 255, 0), 2)
+            cv2.circle(preview, finger, 5, (0, 255, 255), -1)
+        return preview
+        
+    def get_direction(self):
+        # Never blocks: hands back whatever the worker published last
+        with self.lock:
+            direction = self.direction
+            self.direction = None
+            frame = self.preview_frame
+            self.preview_frame = None
         
-        # Show the frame with tracking
-        cv2.imshow('Finger Control - Point with index finger', frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            pass
+        # Show the frame with tracking (HighGUI has to run on the main thread)
+        if frame is not None:
+            cv2.imshow('Finger Control - Point with index finger', frame)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                pass
         
         return direction
     
+    def get_stats(self):
+        with self.lock:
+            return {
+                "capture_fps": round(self.capture_fps, 1),
+                "inference_ms": round(self.inference_ms, 2),
+                "frames_captured": self.frames_captured,
+                "frames_processed": self.frames_processed,
+                "frames_dropped": self.frames_dropped,
+                "roi_frames": self.roi_frames,
+                "gesture_latency_ms": self.gesture_filter.latency_stats(),
+                "direction_age_ms": round((time.perf_counter() - self.direction_time) * 1000, 1)
+                                    if self.direction_time else None,
+            }
+    
     def release(self):
+        self.running = False
+        with self.frame_ready:
+            self.frame_ready.notify_all()
+        for thread in (self.capture_thread, self.inference_thread):
+            if thread.is_alive():
+                thread.join(timeout=1.0)
         self.cap.release()
         cv2.destroyAllWindows()
 
+class CameraWarmup:
+    # Builds the FingerController on a background thread the first time
+    # finger mode is picked, so loading MediaPipe and opening the camera
+    # never hold up the game (or break it on machines with no camera).
+    # state: 'off', 'warming' (until the first frame has been through the
+    # model), 'ready' or 'failed'.
+    def __init__(self, timeout=10.0, **options):
+        self.options = options
+        self.timeout = timeout
+        self.controller = None
+        self.state = 'off'
+        self.error = None
+        self.warmup_ms = None
+        self.closed = False
+        self.thread = None
+    
+    def start(self):
+        if self.state == 'off':
+            self.state = 'warming'
+            self.thread = threading.Thread(target=self.warm, daemon=True)
+            self.thread.start()
+    
+    def warm(self):
+        start = time.perf_counter()
+        controller = None
+        try:
+            controller = FingerController(**self.options)
+            if not controller.cap.isOpened():
+                raise RuntimeError("no camera")
+            while controller.frames_processed == 0:
+                if self.closed:
+                    raise RuntimeError("closed while warming")
+                if time.perf_counter() - start > self.timeout:
+                    raise RuntimeError("no frames from the camera")
+                time.sleep(0.02)
+        except Exception as exc:
+            if controller is not None:
+                controller.release()
+            self.error = str(exc)
+            self.state = 'failed'
+            print("Finger control unavailable:", exc)
+            return
+        self.warmup_ms = (time.perf_counter() - start) * 1000
+        self.controller = controller
+        self.state = 'ready'
+    
+    @property
+    def direction_time(self):
+        return self.controller.direction_time if self.controller else 0.0
+    
+    def get_direction(self):
+        return self.controller.get_direction() if self.state == 'ready' else None
+    
+    def get_stats(self):
+        stats = {"state": self.state, "warmup_ms": self.warmup_ms and round(self.warmup_ms)}
+        if self.state == 'ready':
+            stats.update(self.controller.get_stats())
+        elif self.error:
+            stats["error"] = self.error
+        return stats
+    
+    def release(self):
+        self.closed = True
+        if self.thread is not None:
+            self.thread.join(timeout=self.timeout)
+        if self.controller is not None:
+            self.controller.release()
+
 def draw_game_over_screen(surface, score, high_score):
     # Dark overlay
-    overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-    overlay.fill((0, 0, 0, 180))
-    surface.blit(overlay, (0, 0))
+    surface.blit(alpha_panel((WIDTH, HEIGHT), 180), (0, 0))
     
     # Game over text
-    game_over_text = font_title.render("GAME OVER", True, RED)
+    game_over_text = render_text(font_title, "GAME OVER", RED)
     surface.blit(game_over_text, 
                 (WIDTH//2 - game_over_text.get_width()//2, HEIGHT//4))
     
     # Score display
-    score_text = font_large.render(f"Score: {score}", True, WHITE)
+    score_text = render_text(font_large, f"Score: {score}", WHITE)
     surface.blit(score_text, 
                 (WIDTH//2 - score_text.get_width()//2, HEIGHT//2 - 40))
     
     # High score display
-    high_text = font_large.render(f"High Score: {high_score}", True, YELLOW)
+    high_text = render_text(font_large, f"High Score: {high_score}", YELLOW)
     surface.blit(high_text, 
                 (WIDTH//2 - high_text.get_width()//2, HEIGHT//2 + 20))
     
     # Instructions
-    restart_text = font_medium.render("Press R to Restart", True, WHITE)
-    quit_text = font_medium.render("Press Q to Quit", True, WHITE)
+    restart_text = render_text(font_medium, "Press R to Restart", WHITE)
+    quit_text = render_text(font_medium, "Press Q to Quit", WHITE)
     
     surface.blit(restart_text, 
                 (WIDTH//2 - restart_text.get_width()//2, HEIGHT//2 + 100))
     surface.blit(quit_text, 
                 (WIDTH//2 - quit_text.get_width()//2, HEIGHT//2 + 140))
 
-def draw_minimal_ui(surface, score, high_score, difficulty, control_mode):
+def draw_minimal_ui(surface, score, high_score, difficulty, control_mode, status=None):
     # Score and high score in top left
-    score_text = font_medium.render(f"Score: {score}", True, WHITE)
-    high_text = font_small.render(f"High: {high_score}", True, YELLOW)
+    score_text = render_text(font_medium, f"Score: {score}", WHITE)
+    high_text = render_text(font_small, f"High: {high_score}", YELLOW)
     surface.blit(score_text, (10, 10))
     surface.blit(high_text, (10, 40))
     
     # Control mode indicator in top right
-    mode_text = font_small.render(f"Mode: {control_mode.upper()}", True, WHITE)
+    # status: shown next to the mode, e.g. while the camera warms up
+    mode_label = f"Mode: {control_mode.upper()}" + (f" ({status})" if status else "")
+    mode_text = render_text(font_small, mode_label, WHITE if status is None else YELLOW)
     surface.blit(mode_text, (WIDTH - mode_text.get_width() - 10, 10))
     
     # Difficulty indicator (color coded) in top right
@@ -423,209 +1268,394 @@ def draw_minimal_ui(surface, score, high_score, difficulty, control_mode):
     else:
         diff_color = RED
         
-    diff_text = font_small.render(f"Level: {difficulty}", True, diff_color)
+    diff_text = render_text(font_small, f"Level: {difficulty}", diff_color)
     surface.blit(diff_text, (WIDTH - diff_text.get_width() - 10, 40))
 
+class ProfilerOverlay:
+    # On-screen table of per-stage frame timings. The text is re-rendered a
+    # few times a second, not every frame, so it barely shows up itself.
+    def __init__(self, refresh_ms=250):
+        self.refresh_ms = refresh_ms
+        self.surface = None
+        self.last_refresh = -refresh_ms
+    
+    def build(self, profiler):
+        lines = [f"{'stage':<16}{'p50':>7}{'p95':>7}{'p99':>7}  ms"]
+        for name, stats in sorted(profiler.summary().items()):
+            lines.append(f"{name:<16}{stats['p50']:>7.2f}{stats['p95']:>7.2f}{stats['p99']:>7.2f}")
+        texts = [font_small.render(line, True, GREEN) for line in lines]
+        width = max(text.get_width() for text in texts) + 20
+        overlay = pygame.Surface((width, len(texts) * 20 + 10), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 200))
+        for i, text in enumerate(texts):
+            overlay.blit(text, (10, 5 + i * 20))
+        return overlay
+    
+    def draw(self, surface, profiler):
+        now = pygame.time.get_ticks()
+        if self.surface is None or now - self.last_refresh >= self.refresh_ms:
+            self.surface = self.build(profiler)
+            self.last_refresh = now
+        surface.blit(self.surface, (10, HEIGHT - self.surface.get_height() - 50))
+
 class TouchControls:
+    # Swipes go through the same gesture filter as the finger tracker, so a
+    # turn is decided while the finger is still dragging
     def __init__(self):
         self.touch_start = None
         self.deadzone = 50
+        self.gesture_filter = GestureFilter(deadzone=self.deadzone)
+        self.turned = False
         
     def handle_event(self, event):
+        if event.type not in (pygame.FINGERDOWN, pygame.FINGERMOTION, pygame.FINGERUP):
+            return None
+        pos = (event.x * WIDTH, event.y * HEIGHT)
+        now = time.perf_counter()
+        
         if event.type == pygame.FINGERDOWN:
-            self.touch_start = (event.x * WIDTH, event.y * HEIGHT)
-        elif event.type == pygame.FINGERUP and self.touch_start:
-            end_pos = (event.x * WIDTH, event.y * HEIGHT)
-            dx = end_pos[0] - self.touch_start[0]
-            dy = end_pos[1] - self.touch_start[1]
-            
+            self.touch_start = pos
+            self.turned = False
+            self.gesture_filter.reset()
+            self.gesture_filter.update(now, pos)
+            return None
+        if self.touch_start is None:
+            return None
+        
+        direction = self.gesture_filter.update(now, pos)
+        if direction:
+            self.turned = True
+        elif event.type == pygame.FINGERUP and not self.turned:
+            # A quick flick the filter didn't commit: fall back to the net swipe
+            dx = pos[0] - self.touch_start[0]
+            dy = pos[1] - self.touch_start[1]
             if abs(dx) > self.deadzone or abs(dy) > self.deadzone:
                 if abs(dx) > abs(dy):
-                    return RIGHT if dx > 0 else LEFT
+                    direction = RIGHT if dx > 0 else LEFT
                 else:
-                    return DOWN if dy > 0 else UP
-        return None
-def main():
-    snake = Snake()
-    food = Food()
-    powerups = [] 
-    food_system = FoodSystem()
-    level_system = LevelSystem()
-    controller = FingerController()
+                    direction = DOWN if dy > 0 else UP
+        if event.type == pygame.FINGERUP:
+            self.touch_start = None
+        return direction
+
+def main(profile_path=None, camera_preview=True, record_path=None, control_mode='finger', arena=None,
+         feed_name=None, transition_quality=None, store_path=None, verbose=False):
+    # profile_path: export per-stage timings there on exit (.json or .csv)
+    # camera_preview: show the finger-tracking preview window
+    # record_path: stream a replay of the session there (see snake_replay)
+    # control_mode: 'keyboard', 'finger' or 'autopilot' to start in
+    # arena: (cols, rows) board bigger than the window, seen through a
+    # camera that follows the snake (see ArenaRenderer)
+    # feed_name: publish every tick to that shared memory feed (see snake_feed)
+    # transition_quality: level-up effect, see LevelSystem.TRANSITION_QUALITIES
+    # store_path: SQLite database to record finished games in and to take
+    # the high score from (see snake_store)
+    # verbose: print startup times, input latency and cache stats (also on
+    # with profile_path)
+    if screen is None:
+        init_display()
+    if font_small is None:
+        load_fonts()
+    main_start = time.perf_counter()
+    verbose = verbose or profile_path is not None
+    if transition_quality:
+        LevelSystem.transition_quality = transition_quality
+    if LevelSystem.transition_quality == "high":
+        LevelSystem.ghost_surfaces(screen)
+    profiler = FrameProfiler(enabled=profile_path is not None)
+    profiler_overlay = ProfilerOverlay()
+    show_profiler = False
+    
+    # Always seeded so a recorded session can be played back exactly
+    cols, rows = arena or (WIDTH // CELL_SIZE, HEIGHT // CELL_SIZE)
+    game = Game(cols, rows, seed=random.randrange(2**32))
+    # The camera only starts once finger mode is picked
+    controller = CameraWarmup(preview=camera_preview)
     touch_controls = TouchControls()
+    background = BackgroundLayer()
+    if arena:
+        renderer = ArenaRenderer(profiler=profiler)
+    else:
+        renderer = DirtyRenderer(profiler=profiler)
+    render_mode = 'full'  # or 'dirty'
 
-    score = 0
+    # Built on first use, its tables are sized to the board
+    autopilot = None
     high_score = 0
-    control_mode = 'finger'
+    store = None
+    if store_path:
+        from snake_store import SessionStore
+        store = SessionStore(store_path)
+        high_score = store.high_score()
     game_state = "playing"  # Can be "playing" or "game_over"
     show_help = True
     help_timer = 0
+    game_over_timer = 0
+    # Every input source feeds this queue; each tick consumes one turn
+    turns = snake_core.TurnQueue()
+    accumulator = 0.0
+    recorder = None
+    if record_path:
+        recorder = ReplayWriter(record_path, game.seed, game.cols, game.rows)
+        recorder.mode(control_mode)
+    feed = None
+    if feed_name:
+        from snake_feed import FeedWriter
+        feed = FeedWriter(game.cols, game.rows, name=feed_name)
+        feed.publish(game)
     
     # Main game loop
     running = True
     while running:
-        clock.tick(snake.speed)
+        dt = clock.tick(FPS)
+        profiler.end_frame()
+        
         # Handle events
+        events_start = time.perf_counter()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
             
-            snake.move()
-
-            # Check if snake eats food
-            if snake.positions[0] == food.position:
-                snake.grow()
-                score += 1
-                food.randomize_position()
-
-                # Chance to spawn a new powerup
-                if random.random() < 0.3:  # 30% chance
-                    powerups.append(PowerUp())
-
-                # Update the level based on score
-                level_system.update(score)
-
-            for powerup in powerups[:]:
-                if snake.positions[0] == powerup.position:
-                    if powerup.type == "speed_boost":
-                        snake.speed += 5
-                    elif powerup.type == "slow_down":
-                        snake.speed = max(5, snake.speed - 3)
-                    elif powerup.type == "score_multiplier":
-                        score += 5
-                    elif powerup.type == "shield":
-                        # (optional) you can implement shield logic
-                        pass
-                    powerups.remove(powerup)
-
-            for powerup in powerups:
-                powerup.update()
-
-            snake.draw(screen)
-
-            # Draw all powerups
-            for powerup in powerups:
-                powerup.draw(screen)
-
-            # Draw border and level
-            level_system.draw_border(screen)
+            if game_state == "playing":
+                swipe = touch_controls.handle_event(event)
+                if swipe:
+                    turns.push(swipe, 'touch', game.snake.direction)
 
             if event.type == pygame.KEYDOWN:
                 if game_state == "playing":
-                    if event.key == pygame.K_UP:
-                        snake.change_direction(UP)
-                    elif event.key == pygame.K_DOWN:
-                        snake.change_direction(DOWN)
-                    elif event.key == pygame.K_LEFT:
-                        snake.change_direction(LEFT)
-                    elif event.key == pygame.K_RIGHT:
-                        snake.change_direction(RIGHT)
+                    if event.key in ARROW_KEYS:
+                        turns.push(ARROW_KEYS[event.key], 'keyboard', game.snake.direction)
                     elif event.key == pygame.K_c:
-                        control_mode = 'keyboard' if control_mode == 'finger' else 'finger'
+                        control_mode = CONTROL_MODES[(CONTROL_MODES.index(control_mode) + 1)
+                                                     % len(CONTROL_MODES)]
+                        turns.clear()
+                        if recorder:
+                            recorder.mode(control_mode)
                     elif event.key == pygame.K_h:
                         show_help = not show_help
+                    elif event.key == pygame.K_d:
+                        render_mode = 'dirty' if render_mode == 'full' else 'full'
+                        renderer.invalidate()
+                
+                if event.key == pygame.K_F3:
+                    # Performance overlay; turns profiling on the first time
+                    show_profiler = not show_profiler
+                    profiler.enabled = True
+                    renderer.invalidate()
                 
                 # These work in both game states
                 if event.key == pygame.K_r:
                     # Reset game
-                    if score > high_score:
-                        high_score = score
-                    snake.reset()
-                    food.randomize_position()
-                    score = 0
+                    if game.score > high_score:
+                        high_score = game.score
+                    if store and game_state == "playing" and game.ticks:
+                        store.record(game, control_mode, "restart")
+                    if recorder:
+                        recorder.check(game)
+                        recorder.reset()
+                    game.reset()
+                    if feed:
+                        feed.publish(game)
                     game_state = "playing"
                     show_help = True
                     help_timer = 0
+                    game_over_timer = 0
+                    turns.clear()
+                    accumulator = 0.0
+                    renderer.invalidate()
                 elif event.key == pygame.K_q:
                     running = False
+        profiler.add("events", (time.perf_counter() - events_start) * 1000)
         
         if game_state == "playing":
             # Get direction based on control mode
             if control_mode == 'finger':
-                direction = controller.get_direction()
-                if direction:
-                    snake.change_direction(direction)
-            
-            # Game logic
-            snake.move()
-            food.update()
-            
-            # Check collisions
-            if snake.check_collision():
-                if score > high_score:
-                    high_score = score
-                game_state = "game_over"
+                controller.start()
+                with profiler.stage("finger"):
+                    finger_direction = controller.get_direction()
+                if finger_direction:
+                    # Timestamped with the camera frame it was seen in
+                    turns.push(finger_direction, 'finger', game.snake.direction,
+                               controller.direction_time)
             
-            # Check if snake ate food
-            if snake.positions[0] == food.position:
-                snake.grow()
-                food.randomize_position()
-                while food.position in snake.positions:
-                    food.randomize_position()
-                score += 1
+            # Fixed-timestep simulation: run as many ticks as the elapsed
+            # time covers at the current speed, independent of frame rate
+            simulation_start = time.perf_counter()
+            accumulator += dt
+            ticks = 0
+            while game_state == "playing" and ticks < MAX_TICKS_PER_FRAME:
+                tick_ms = 1000 / game.snake.speed
+                if accumulator < tick_ms:
+                    break
+                accumulator -= tick_ms
+                ticks += 1
                 
-        for powerup in food_system.powerups[:]:
-            if snake.positions[0] == powerup.position:
-                    snake.activate_powerup(powerup.type)
-                    food_system.powerups.remove(powerup)
-                    score += 3
-            
-            # Level progression
-        if level_system.update(score):
-            snake.speed += 1  # Increase speed each level
-        # Drawing
-        screen.fill(BLACK)
-        
-        # Draw grid (faint)
-        for x in range(0, WIDTH, CELL_SIZE):
-            pygame.draw.line(screen, GRID_COLOR, (x, 0), (x, HEIGHT))
-        for y in range(0, HEIGHT, CELL_SIZE):
-            pygame.draw.line(screen, GRID_COLOR, (0, y), (WIDTH, y))
+                # Game logic lives in snake_core
+                if control_mode == 'autopilot':
+                    if autopilot is None:
+                        autopilot = Autopilot(game)
+                    action = autopilot.next_turn()
+                else:
+                    action = turns.pop(game.snake.direction)
+                _, done = game.step(action)
+                if recorder:
+                    recorder.tick(game.snake.direction)
+                if feed:
+                    # Never waits on readers; they skip ahead if they're slow
+                    feed.publish(game)
+                
+                # Check collisions
+                if done:
+                    if game.score > high_score:
+                        high_score = game.score
+                    if store:
+                        # Queued; written on the store's own thread
+                        store.record(game, control_mode)
+                    game_state = "game_over"
+            if ticks == MAX_TICKS_PER_FRAME:
+                accumulator = min(accumulator, 1000 / game.snake.speed)
+            if ticks:
+                profiler.add("simulation", (time.perf_counter() - simulation_start) * 1000)
+        elif control_mode == 'autopilot':
+            # Unattended (demo kiosk): start the next game on its own
+            game_over_timer += dt
+            if game_over_timer > 3000:
+                pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_r))
         
-        # Draw game elements
-        snake.draw(screen)
-        food.draw(screen)
+        # Animations run on wall-clock time, not on ticks
+        with profiler.stage("animation"):
+            game.food_system.animate(dt)
+            game.level_system.update_transition(dt)
+        alpha = min(1.0, accumulator * game.snake.speed / 1000) if game_state == "playing" else 1.0
         
         # Draw UI elements
-        draw_minimal_ui(screen, score, high_score, snake.difficulty, control_mode)
-        
-        # Show help temporarily at start or when requested
-        if show_help and game_state == "playing":
-            help_text = [
-                "CONTROLS:",
-                "Arrow Keys - Move (keyboard mode)",
-                "Point finger - Move (finger mode)",
-                "C - Toggle control mode",
-                "H - Toggle this help",
-                " ",
-                "R - Reset game anytime",
-                "Q - Quit game"
-            ]
+        def draw_hud(surface):
+            status = None
+            if control_mode == 'finger' and controller.state != 'ready':
+                status = "no camera" if controller.state == 'failed' else "camera warming"
+            draw_minimal_ui(surface, game.score, high_score, game.snake.difficulty, control_mode, status)
+        
+        help_visible = show_help and game_state == "playing"
+        if (render_mode == 'dirty' and not help_visible and game_state == "playing"
+                and not game.level_system.zooming and not show_profiler):
+            # Only the changed cells are redrawn and sent to the display
+            rects = renderer.draw(screen, game, background, alpha, draw_hud)
+            with profiler.stage("display"):
+                pygame.display.update(rects)
+        else:
+            # Full redraw: cached background in one blit, game elements, zoom, HUD
+            renderer.draw_full(screen, game, background, alpha, draw_hud)
+            renderer.invalidate()
+            
+            # Show help temporarily at start or when requested
+            if help_visible:
+                help_text = [
+                    "CONTROLS:",
+                    "Arrow Keys - Move (keyboard mode)",
+                    "Point finger - Move (finger mode)",
+                    "C - Cycle keyboard/finger/autopilot",
+                    "H - Toggle this help",
+                    "D - Toggle dirty-rect rendering",
+                    "F3 - Performance overlay",
+                    " ",
+                    "R - Reset game anytime",
+                    "Q - Quit game"
+                ]
+                
+                # Semi-transparent background
+                screen.blit(alpha_panel((300, 275), 180), (WIDTH//2 - 150, HEIGHT//2 - 137))
+                
+                for i, text in enumerate(help_text):
+                    text_surface = render_text(font_small, text, WHITE)
+                    screen.blit(text_surface, 
+                               (WIDTH//2 - text_surface.get_width()//2, 
+                                HEIGHT//2 - 117 + i * 25))
+                
+                help_timer += dt
+                if help_timer > 5000:  # Hide after 5 seconds
+                    show_help = False
             
-            # Semi-transparent background
-            help_bg = pygame.Surface((300, 200), pygame.SRCALPHA)
-            help_bg.fill((0, 0, 0, 180))
-            screen.blit(help_bg, (WIDTH//2 - 150, HEIGHT//2 - 100))
+            # Draw game over screen if needed
+            if game_state == "game_over":
+                draw_game_over_screen(screen, game.score, high_score)
             
-            for i, text in enumerate(help_text):
-                text_surface = font_small.render(text, True, WHITE)
-                screen.blit(text_surface, 
-                           (WIDTH//2 - text_surface.get_width()//2, 
-                            HEIGHT//2 - 80 + i * 25))
+            if show_profiler:
+                profiler_overlay.draw(screen, profiler)
             
-            help_timer += 1
-            if help_timer > 300:  # Hide after 5 seconds (60fps * 5)
-                show_help = False
-        
-        # Draw game over screen if needed
-        if game_state == "game_over":
-            draw_game_over_screen(screen, score, high_score)
+            with profiler.stage("display"):
+                pygame.display.flip()
         
-        pygame.display.flip()
-        clock.tick(snake.speed)
+        if verbose and "first_frame" not in startup_times:
+            now = time.perf_counter()
+            startup_times["first_frame"] = (now - main_start) * 1000
+            print("Startup:", ", ".join(f"{name} {ms:.0f} ms" for name, ms in startup_times.items()),
+                  f"(total {(now - IMPORT_START) * 1000:.0f} ms)")
     
+    # Stop the tracking threads first: they append to the stats being read
     controller.release()
+    if verbose:
+        if controller.state != 'off':  # Finger mode was picked at some point
+            print("Finger tracking stats:", controller.get_stats())
+        print("Input-to-move latency:", turns.latency_stats(), "dropped turns:", turns.dropped)
+        if autopilot and autopilot.times.count:
+            print("Autopilot planning:", autopilot.stats())
+        print("Sprite cache:", sprite_cache.stats(), "Text cache:", text_cache.stats())
+    if profile_path:
+        profiler.export(profile_path)
+        print("Frame profile written to", profile_path)
+    if recorder:
+        recorder.close(game)
+        print(f"Replay of {recorder.ticks} ticks written to", record_path)
+    if feed:
+        print(f"Published {feed.count} frames to feed", feed.name)
+        feed.close()
+    if store:
+        if game_state == "playing" and game.ticks:
+            store.record(game, control_mode, "quit")
+        store.close()
+        if verbose:
+            print("Session store:", store.stats(), "in", store_path)
     pygame.quit()
 
+startup_times["import"] = (time.perf_counter() - IMPORT_START) * 1000
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    
+    def parse_arena(text):
+        # "COLSxROWS"; at least a window's worth of cells so the view doesn't
+        # show the same cells twice
+        try:
+            cols, rows = (int(n) for n in text.lower().split("x"))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"expected COLSxROWS, got {text!r}")
+        if cols < WIDTH // CELL_SIZE or rows < HEIGHT // CELL_SIZE or cols > 65535 or rows > 65535:
+            raise argparse.ArgumentTypeError(f"arena must be between {WIDTH // CELL_SIZE}x{HEIGHT // CELL_SIZE} "
+                                             "and 65535x65535 cells")
+        return cols, rows
+    
+    parser = argparse.ArgumentParser(description="Snake Game - Ultimate Edition")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="record per-stage frame timings and write them to PATH (.json or .csv) on exit")
+    parser.add_argument("--no-camera-preview", action="store_true",
+                        help="don't open the finger-tracking preview window")
+    parser.add_argument("--control", choices=CONTROL_MODES, default='finger',
+                        help="control mode to start in (autopilot plays by itself)")
+    parser.add_argument("--record", metavar="PATH",
+                        help="record a replay of the session to PATH (play it with snake_replay.py)")
+    parser.add_argument("--arena", metavar="COLSxROWS", type=parse_arena,
+                        help="play on a large scrolling board, e.g. 1000x1000")
+    parser.add_argument("--feed", metavar="NAME", nargs="?", const="snake_feed",
+                        help="publish each tick to a shared memory feed (read it with snake_feed.py)")
+    parser.add_argument("--transition", choices=LevelSystem.TRANSITION_QUALITIES,
+                        default=LevelSystem.transition_quality, help="level-up effect quality")
+    parser.add_argument("--store", metavar="PATH", default="snake_sessions.db",
+                        help="SQLite file for game records and the high score (see snake_store.py)")
+    parser.add_argument("--no-store", action="store_true", help="don't record games")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="print startup times, input latency and cache stats")
+    args = parser.parse_args()
+    main(profile_path=args.profile, camera_preview=not args.no_camera_preview,
+         record_path=args.record, control_mode=args.control, arena=args.arena, feed_name=args.feed,
+         transition_quality=args.transition, store_path=None if args.no_store else args.store,
+         verbose=args.verbose)
\ No newline at end of file
@@ -0,0 +1,146 @@
+import math
+from collections import deque
+
+import numpy as np
+
+from snake_core import UP, DOWN, LEFT, RIGHT, percentile
+
+# Turns a stream of pointer positions (fingertip landmarks from the camera,
+# or touch drags) into snake directions. Positions go through a One-Euro
+# filter (a low-pass whose cutoff rises with speed, so it is smooth when the
+# hand is still and responsive when it moves), velocity is fitted over the
+# recent samples, and a direction is committed as soon as the predicted
+# motion is clearly along one axis. Nothing here needs pygame or OpenCV.
+
+
+class OneEuroFilter:
+    # Works on numpy points of any dimension; time is in seconds
+    def __init__(self, min_cutoff=1.5, beta=0.01, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self.x_prev = None
+        self.dx_prev = None
+        self.t_prev = None
+
+    @staticmethod
+    def smoothing(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def __call__(self, t, x):
+        x = np.asarray(x, dtype=np.float64)
+        if self.x_prev is None:
+            self.x_prev = x
+            self.dx_prev = np.zeros_like(x)
+            self.t_prev = t
+            return x
+
+        dt = max(t - self.t_prev, 1e-6)
+        dx = (x - self.x_prev) / dt
+        a_d = self.smoothing(self.d_cutoff, dt)
+        dx_hat = self.dx_prev + a_d * (dx - self.dx_prev)
+
+        cutoff = self.min_cutoff + self.beta * float(np.linalg.norm(dx_hat))
+        a = self.smoothing(cutoff, dt)
+        x_hat = self.x_prev + a * (x - self.x_prev)
+
+        self.x_prev = x_hat
+        self.dx_prev = dx_hat
+        self.t_prev = t
+        return x_hat
+
+
+class GestureFilter:
+    # deadzone: pixels of (predicted) travel before a turn is committed
+    # lookahead: seconds of velocity extrapolation added to the position
+    # dominance: how much the major axis must beat the minor one
+    # still_speed: pixels/s below which the pointer counts as at rest; the
+    #   anchor follows it while at rest so slow drift never adds up to a
+    #   turn, and gesture-to-turn latency is measured from the last rest
+    def __init__(self, deadzone=20, min_cutoff=1.5, beta=0.01, history=8,
+                 window=0.15, lookahead=0.05, dominance=1.5, still_speed=75):
+        self.deadzone = deadzone
+        self.window = window
+        self.lookahead = lookahead
+        self.dominance = dominance
+        self.still_speed = still_speed
+        self.euro = OneEuroFilter(min_cutoff, beta)
+        self.samples = np.zeros((history, 3))  # Ring of (t, x, y) filtered
+        self.latencies = deque(maxlen=256)  # Seconds, most recent turns
+        self.reset()
+
+    def reset(self):
+        # Call when tracking is lost or a touch ends
+        self.euro.reset()
+        self.count = 0
+        self.anchor = None
+        self.still_time = None
+        self.position = None
+        self.velocity = np.zeros(2)
+
+    def fit_velocity(self, t):
+        # Least-squares slope of the samples inside the time window
+        n = min(self.count, len(self.samples))
+        if n < 2:
+            return np.zeros(2)
+        recent = self.samples[:n]
+        recent = recent[recent[:, 0] >= t - self.window]
+        if len(recent) < 2:
+            return np.zeros(2)
+        ts = recent[:, 0] - recent[:, 0].mean()
+        denom = ts @ ts
+        if denom <= 0:
+            return np.zeros(2)
+        return ts @ (recent[:, 1:] - recent[:, 1:].mean(axis=0)) / denom
+
+    def update(self, t, point):
+        # Feed one position; returns a direction the moment one is clear
+        position = self.euro(t, point)
+        self.samples[self.count % len(self.samples)] = (t, position[0], position[1])
+        self.count += 1
+        self.position = position
+        if self.anchor is None:
+            self.anchor = position
+            self.still_time = t
+            return None
+
+        self.velocity = velocity = self.fit_velocity(t)
+        if float(np.hypot(*velocity)) < self.still_speed:
+            # Pointer is (nearly) at rest: re-anchor so drift doesn't add up
+            self.anchor = position
+            self.still_time = t
+            return None
+
+        moved = position - self.anchor
+        predicted = moved + velocity * self.lookahead
+        ax, ay = abs(predicted[0]), abs(predicted[1])
+        major, minor = (ax, ay) if ax >= ay else (ay, ax)
+        if major <= self.deadzone or major < self.dominance * minor:
+            return None
+        # Don't let prediction alone commit a turn from a standstill
+        if max(abs(moved[0]), abs(moved[1])) <= self.deadzone / 2:
+            return None
+
+        if ax >= ay:
+            direction = RIGHT if predicted[0] > 0 else LEFT
+        else:
+            direction = DOWN if predicted[1] > 0 else UP
+        self.anchor = position
+        self.latencies.append(t - self.still_time)
+        self.still_time = t
+        return direction
+
+    def latency_stats(self):
+        # Gesture-to-turn latency: from the last rest to the committed turn
+        if not self.latencies:
+            return {"turns": 0, "mean_ms": None, "p95_ms": None}
+        # tuple() copies the deque in one go under the GIL; walking it item
+        # by item can race the inference thread's appends
+        values = sorted(tuple(self.latencies))
+        return {"turns": len(values),
+                "mean_ms": round(sum(values) / len(values) * 1000, 1),
+                "p95_ms": round(percentile(values, 95) * 1000, 1)}
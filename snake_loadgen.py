@@ -0,0 +1,190 @@
+import argparse
+import asyncio
+import json
+import random
+import socket
+import subprocess
+import sys
+import time
+
+from snake_core import percentile
+from snake_server import LENGTH, RoomView
+
+# Load generator for snake_server.py: simulated players on localhost that
+# join rooms, turn at random and keep a RoomView up to date from the
+# deltas. Reports how much of a core the server needed (so rooms per
+# core), bandwidth per player and tick jitter:
+#
+#   python snake_loadgen.py --rooms 100 --players 4 --seconds 30
+#   python snake_loadgen.py --port 8765 ...   # against a running server
+#
+# Without --port it starts a server of its own on a free port, so the
+# clients' own CPU use doesn't count against it.
+
+
+class Client:
+    def __init__(self, room, turn_chance, rng):
+        self.room = room
+        self.turn_chance = turn_chance
+        self.rng = rng
+        self.view = RoomView()
+        self.bytes = 0
+        self.deltas = 0
+        self.keyframes = 0
+        self.gaps = []  # ms between consecutive deltas
+        self.error = None
+
+    async def run(self, host, port, until):
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+        except OSError as exc:
+            self.error = repr(exc)
+            return
+        payload = b"J" + self.room.encode()
+        writer.write(LENGTH.pack(len(payload)) + payload)
+        last = None
+        loop = asyncio.get_running_loop()
+        try:
+            while loop.time() < until:
+                header = await reader.readexactly(LENGTH.size)
+                payload = await reader.readexactly(LENGTH.unpack(header)[0])
+                self.bytes += LENGTH.size + len(payload)
+                kind = self.view.apply(payload)
+                if kind == b"E":
+                    self.error = payload[1:].decode()
+                    break
+                if kind == b"K":
+                    self.keyframes += 1
+                elif kind == b"D":
+                    now = loop.time()
+                    if last is not None:
+                        self.gaps.append((now - last) * 1000)
+                    last = now
+                    self.deltas += 1
+                    if self.view.you in self.view.snakes and self.rng.random() < self.turn_chance:
+                        writer.write(LENGTH.pack(2) + bytes((ord("T"), self.rng.randrange(4))))
+        except (asyncio.IncompleteReadError, ConnectionError) as exc:
+            self.error = repr(exc)
+        finally:
+            writer.close()
+
+
+async def request_stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(LENGTH.pack(1) + b"S")
+    header = await reader.readexactly(LENGTH.size)
+    payload = await reader.readexactly(LENGTH.unpack(header)[0])
+    writer.close()
+    return json.loads(payload[1:])
+
+
+async def run_load(host, port, rooms, players, seconds, turn_chance, seed, ramp):
+    rng = random.Random(seed)
+    clients = [Client(f"room-{i}", turn_chance, random.Random(rng.random()))
+               for i in range(rooms) for _ in range(players)]
+    before = await request_stats(host, port)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    until = start + ramp + seconds
+    tasks = []
+    for i, client in enumerate(clients):
+        tasks.append(asyncio.create_task(client.run(host, port, until)))
+        # Spread the joins over the ramp-up so rooms don't all tick in step
+        await asyncio.sleep(ramp / len(clients))
+    # Measure from the end of the ramp-up, when everyone is in
+    await asyncio.sleep(max(0, start + ramp - loop.time()))
+    measured = await request_stats(host, port)
+    for client in clients:
+        client.bytes_at_ramp, client.gaps_at_ramp = client.bytes, len(client.gaps)
+    await asyncio.gather(*tasks)
+    after = await request_stats(host, port)
+    return clients, before, measured, after
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, tick_rate, max_players):
+    process = subprocess.Popen([sys.executable, "snake_server.py", "--port", str(port),
+                                "--tick-rate", str(tick_rate), "--max-players", str(max_players)],
+                               stdout=subprocess.DEVNULL, cwd=sys.path[0] or ".")
+    deadline = time.perf_counter() + 10
+    while time.perf_counter() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated players for snake_server.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="server to load (default: start one)")
+    parser.add_argument("--rooms", type=int, default=20)
+    parser.add_argument("--players", type=int, default=4, help="players per room")
+    parser.add_argument("--seconds", type=float, default=10, help="measured time after ramp-up")
+    parser.add_argument("--ramp", type=float, default=2, help="seconds to spread the joins over")
+    parser.add_argument("--turn-chance", type=float, default=0.2, help="chance of a turn per tick")
+    parser.add_argument("--tick-rate", type=float, default=10, help="for the server this starts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report as JSON here")
+    args = parser.parse_args()
+
+    process = None
+    port = args.port
+    if port is None:
+        port = free_port()
+        process = start_server(port, args.tick_rate, max(8, args.players))
+    try:
+        clients, before, measured, after = asyncio.run(run_load(
+            args.host, port, args.rooms, args.players, args.seconds, args.turn_chance, args.seed, args.ramp))
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    wall = after["uptime_s"] - measured["uptime_s"]
+    cpu = after["cpu_s"] - measured["cpu_s"]
+    core_share = cpu / wall if wall > 0 else 0.0
+    gaps = sorted(g for client in clients for g in client.gaps[client.gaps_at_ramp:])
+    tick_ms = 1000 / args.tick_rate
+    failed = [client for client in clients if client.error and "IncompleteRead" not in client.error]
+    report = {
+        "rooms": after["rooms"],
+        "players": len(clients),
+        "seconds": round(wall, 2),
+        "server_core_share": round(core_share, 4),
+        "rooms_per_core": round(args.rooms / core_share) if core_share else None,
+        "bytes_per_player_per_s": round(sum(c.bytes - c.bytes_at_ramp for c in clients) / len(clients) / wall, 1),
+        "server_tick_jitter_p50_ms": after["jitter_p50_ms"],
+        "server_tick_jitter_p99_ms": after["jitter_p99_ms"],
+        "server_tick_jitter_max_ms": after["jitter_max_ms"],
+        "server_step_mean_ms": after["step_mean_ms"],
+        "client_delta_gap_p50_ms": round(percentile(gaps, 50), 2),
+        "client_delta_gap_p99_ms": round(percentile(gaps, 99), 2),
+        "client_delta_gap_max_ms": round(gaps[-1], 2) if gaps else None,
+        "tick_ms": round(tick_ms, 2),
+        "keyframes": sum(c.keyframes for c in clients),
+        "resyncs": after["resyncs"] - before["resyncs"],
+        "skipped_sends": after["skipped"] - before["skipped"],
+        "view_errors": sum(c.view.errors for c in clients),
+        "failed_clients": len(failed),
+    }
+    for key, value in report.items():
+        print(f"{key}: {value}")
+    for client in failed[:5]:
+        print(f"client in {client.room} failed: {client.error}", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if failed or report["view_errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
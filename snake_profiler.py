@@ -0,0 +1,98 @@
+import csv
+import json
+import time
+from array import array
+from contextlib import contextmanager, nullcontext
+
+from snake_core import percentile
+
+# Opt-in per-stage frame timing. Every stage keeps its last `window`
+# samples (milliseconds) in a fixed-size ring buffer, so memory stays flat
+# however long the game runs and percentiles reflect recent behaviour.
+
+PERCENTILES = (50, 95, 99)
+
+
+class RingBuffer:
+    def __init__(self, size):
+        self.samples = array('d', bytes(8 * size))
+        self.size = size
+        self.index = 0
+        self.count = 0
+
+    def add(self, value):
+        self.samples[self.index] = value
+        self.index = (self.index + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def values(self):
+        return self.samples[:self.count]
+
+
+class FrameProfiler:
+    def __init__(self, window=600, enabled=False):
+        self.window = window
+        self.enabled = enabled
+        self.stages = {}
+        self.frame_start = None
+        self.frames = 0
+
+    def buffer(self, name):
+        ring = self.stages.get(name)
+        if ring is None:
+            ring = self.stages[name] = RingBuffer(self.window)
+        return ring
+
+    def stage(self, name):
+        # with profiler.stage("simulation"): ...
+        if not self.enabled:
+            return nullcontext()
+        return self.timed(name)
+
+    @contextmanager
+    def timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.buffer(name).add((time.perf_counter() - start) * 1000)
+
+    def add(self, name, ms):
+        if self.enabled:
+            self.buffer(name).add(ms)
+
+    def end_frame(self):
+        # Call once per frame; records the whole frame as the "frame" stage
+        now = time.perf_counter()
+        if self.enabled and self.frame_start is not None:
+            self.buffer("frame").add((now - self.frame_start) * 1000)
+            self.frames += 1
+        self.frame_start = now
+
+    def summary(self):
+        result = {}
+        for name, ring in self.stages.items():
+            values = sorted(ring.values())
+            if not values:
+                continue
+            stats = {"count": len(values), "mean": sum(values) / len(values)}
+            for p in PERCENTILES:
+                stats[f"p{p}"] = percentile(values, p)
+            stats["max"] = values[-1]
+            result[name] = {key: round(value, 4) for key, value in stats.items()}
+        return result
+
+    def export(self, path):
+        # Format follows the extension: .csv, anything else is JSON
+        summary = self.summary()
+        if path.endswith(".csv"):
+            fields = ["stage", "count", "mean"] + [f"p{p}" for p in PERCENTILES] + ["max"]
+            with open(path, "w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=fields)
+                writer.writeheader()
+                for name, stats in summary.items():
+                    writer.writerow({"stage": name, **stats})
+        else:
+            with open(path, "w") as f:
+                json.dump({"frames": self.frames, "window": self.window, "stages": summary}, f, indent=2)
@@ -0,0 +1,277 @@
+import argparse
+import struct
+import sys
+import time
+
+import snake_core
+
+# Session replays: the seed plus the heading the snake moved in on every
+# simulation tick, which is all snake_core.Game needs to play a session out
+# again tick for tick. File layout (little endian):
+#
+#   header  b"SNKR" version:u8 cols:u16 rows:u16 seed:u64
+#   tokens  unsigned LEB128 varints, appended while the session runs:
+#             (count << 2) | heading   count >= 1 ticks moving in that
+#                                      heading (index into ACTIONS, 2 bits)
+#             op < 4                   one of the ops below
+#
+# Headings change rarely, so a run of ticks usually costs one or two bytes.
+# The writer only holds the current run in memory and a truncated file
+# (crashed session) still replays up to where it stops.
+#
+#   python snake_replay.py session.snkr            # headless, verify hashes
+#   python snake_replay.py session.snkr --render   # watch it
+
+MAGIC = b"SNKR"
+VERSION = 2  # 2: timed power-up effects and expiring power-ups
+HEADER = struct.Struct("<4sBHHQ")
+HASH = struct.Struct("<Q")
+
+# Ops
+RESET = 0  # game.reset(), the RNG carries on
+MODE = 1   # control mode switch, followed by one byte (CONTROL_MODES index)
+CHECK = 2  # followed by varints ticks and score, then the u64 state hash
+END = 3    # clean end of the session
+
+CONTROL_MODES = ("keyboard", "finger", "autopilot")
+HEADINGS = {direction: i for i, direction in enumerate(snake_core.ACTIONS)}
+
+
+class ReplayWriter:
+    def __init__(self, path, seed, cols, rows, buffering=64 * 1024):
+        self.file = open(path, "wb", buffering=buffering)
+        self.file.write(HEADER.pack(MAGIC, VERSION, cols, rows, seed))
+        self.heading = None
+        self.run = 0
+        self.ticks = 0
+
+    def write_varint(self, value):
+        out = bytearray()
+        while value >= 0x80:
+            out.append(value & 0x7F | 0x80)
+            value >>= 7
+        out.append(value)
+        self.file.write(out)
+
+    def flush_run(self):
+        if self.run:
+            self.write_varint(self.run << 2 | self.heading)
+            self.run = 0
+
+    def tick(self, direction):
+        # Call after every game.step() with the snake's direction
+        heading = HEADINGS[direction]
+        if heading != self.heading:
+            self.flush_run()
+            self.heading = heading
+        self.run += 1
+        self.ticks += 1
+
+    def op(self, op):
+        self.flush_run()
+        self.write_varint(op)
+
+    def reset(self):
+        self.op(RESET)
+
+    def mode(self, control_mode):
+        self.op(MODE)
+        self.file.write(bytes((CONTROL_MODES.index(control_mode),)))
+
+    def check(self, game):
+        self.op(CHECK)
+        self.write_varint(game.ticks)
+        self.write_varint(game.score)
+        self.file.write(HASH.pack(game.state_hash()))
+
+    def close(self, game=None):
+        # game: write a final check against its state first
+        if self.file.closed:
+            return
+        if game is not None:
+            self.check(game)
+        self.op(END)
+        self.file.close()
+
+
+class ReplayReader:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError(f"{path}: not a replay (file too short)")
+        magic, version, self.cols, self.rows, self.seed = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a replay")
+        if version != VERSION:
+            raise ValueError(f"{path}: unsupported replay version {version}")
+        self.truncated = False
+
+    def events(self):
+        # Streams ("run", heading, count), ("reset",), ("mode", name),
+        # ("check", ticks, score, hash) and ("end",) without loading the file
+        with open(self.path, "rb", buffering=64 * 1024) as f:
+            f.seek(HEADER.size)
+            read = f.read
+
+            def varint():
+                value = shift = 0
+                while True:
+                    byte = read(1)
+                    if not byte:
+                        raise EOFError
+                    value |= (byte[0] & 0x7F) << shift
+                    if byte[0] < 0x80:
+                        return value
+                    shift += 7
+
+            def exact(n):
+                data = read(n)
+                if len(data) < n:
+                    raise EOFError
+                return data
+
+            while True:
+                try:
+                    token = varint()
+                except EOFError:
+                    # Clean files stop at END; running out before that
+                    # means the session never closed the file
+                    self.truncated = True
+                    return
+                try:
+                    if token >= 4:
+                        yield ("run", token & 3, token >> 2)
+                    elif token == RESET:
+                        yield ("reset",)
+                    elif token == MODE:
+                        yield ("mode", CONTROL_MODES[exact(1)[0]])
+                    elif token == CHECK:
+                        ticks, score = varint(), varint()
+                        yield ("check", ticks, score, HASH.unpack(exact(HASH.size))[0])
+                    else:
+                        yield ("end",)
+                        return
+                except EOFError:
+                    self.truncated = True
+                    return
+
+
+def play(path, game=None, on_tick=None):
+    # Re-simulates a replay and checks every recorded score and state hash.
+    # game: a fresh Game to drive (e.g. a drawable one), seeded from the file
+    # by default; on_tick(game) runs after every step and may return False
+    # to stop early. Returns a report dict.
+    reader = ReplayReader(path)
+    if game is None:
+        game = snake_core.Game(reader.cols, reader.rows, seed=reader.seed)
+    else:
+        game.reset(reader.seed)
+
+    ticks = checks = resets = 0
+    mismatches = []
+    modes = {}
+    mode = None
+    stopped = False
+    start = time.perf_counter()
+    for event in reader.events():
+        kind = event[0]
+        if kind == "run":
+            action = snake_core.ACTIONS[event[1]]
+            for _ in range(event[2]):
+                game.step(action)
+                ticks += 1
+                if mode is not None:
+                    modes[mode] = modes.get(mode, 0) + 1
+                if on_tick is not None and on_tick(game) is False:
+                    stopped = True
+                    break
+            if stopped:
+                break
+        elif kind == "reset":
+            game.reset()
+            resets += 1
+        elif kind == "mode":
+            mode = event[1]
+        elif kind == "check":
+            checks += 1
+            expected = event[1:]
+            actual = (game.ticks, game.score, game.state_hash())
+            if actual != expected:
+                mismatches.append({"check": checks, "expected": expected, "actual": actual})
+    elapsed = time.perf_counter() - start
+
+    return {
+        "seed": reader.seed,
+        "ticks": ticks,
+        "resets": resets,
+        "checks": checks,
+        "mismatches": mismatches,
+        "ticks_by_mode": modes,
+        "final_score": game.score,
+        "truncated": reader.truncated,
+        "stopped": stopped,
+        "ticks_per_sec": round(ticks / elapsed) if elapsed > 0 else None,
+    }
+
+
+def render(path, speedup=1.0):
+    # Plays a replay in the game window at (a multiple of) real speed
+    import snake_game
+    pygame = snake_game.pygame
+    snake_game.init_display()
+    snake_game.load_fonts()
+
+    reader = ReplayReader(path)
+    game = snake_game.Game(reader.cols, reader.rows, seed=reader.seed)
+    background = snake_game.BackgroundLayer()
+    if (reader.cols * snake_game.CELL_SIZE > snake_game.WIDTH
+            or reader.rows * snake_game.CELL_SIZE > snake_game.HEIGHT):
+        renderer = snake_game.ArenaRenderer()  # Recorded with --arena
+    else:
+        renderer = snake_game.DirtyRenderer()
+    clock = pygame.time.Clock()
+
+    def draw_hud(surface):
+        snake_game.draw_minimal_ui(surface, game.score, 0, game.snake.difficulty, "replay")
+
+    def on_tick(game):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_q):
+                return False
+        dt = clock.tick(game.snake.speed * speedup)
+        game.food_system.animate(dt)
+        game.level_system.update_transition(dt)
+        renderer.draw_full(snake_game.screen, game, background, 1.0, draw_hud)
+        pygame.display.flip()
+        return True
+
+    try:
+        return play(path, game, on_tick)
+    finally:
+        pygame.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay and verify a recorded snake session")
+    parser.add_argument("replay", help="file written by snake_game.py --record")
+    parser.add_argument("--render", action="store_true", help="show the replay in the game window")
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed multiplier for --render")
+    args = parser.parse_args()
+
+    report = render(args.replay, args.speed) if args.render else play(args.replay)
+    for key, value in report.items():
+        if key != "mismatches":
+            print(f"{key}: {value}")
+    for mismatch in report["mismatches"]:
+        print(f"MISMATCH at check {mismatch['check']}: expected (ticks, score, hash) "
+              f"{mismatch['expected']}, got {mismatch['actual']}")
+    if report["mismatches"]:
+        sys.exit(1)
+    if report["truncated"]:
+        print("warning: replay ends without an END marker (session did not exit cleanly)")
+
+
+if __name__ == "__main__":
+    main()
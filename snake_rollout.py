@@ -0,0 +1,138 @@
+import argparse
+import random
+import time
+
+import snake_core
+
+# Monte Carlo lookahead for planning agents. A decision branches the game
+# many times: Game.snapshot() packs the state once, and every playout
+# restores it into the same scratch game rather than deep-copying Python
+# objects. Playouts follow a policy (random turns by default) for `depth`
+# ticks and score the discounted reward, with a penalty for dying.
+#
+#   python snake_rollout.py --games 20 --rollouts 16 --depth 40
+
+
+def random_policy(rng, turn_chance=0.2):
+    # Turns at random now and then, never straight back into the body
+    def policy(game):
+        if rng.random() < turn_chance:
+            return rng.randrange(4)
+        return None
+    return policy
+
+
+class Rollouts:
+    # game_class: what to restore snapshots into (snake_core.Game, or a
+    # variant from snake_tournament.game_class)
+    # reseed: give each playout a fresh RNG, so food turns up where it might
+    # rather than where the real game will put it
+    def __init__(self, game_class=snake_core.Game, gamma=0.97, death_penalty=10.0, reseed=True, seed=0):
+        self.game_class = game_class
+        self.gamma = gamma
+        self.death_penalty = death_penalty
+        self.reseed = reseed
+        self.rng = random.Random(seed)
+        self.scratch = None
+        self.playouts = 0
+        self.steps = 0
+        self.deaths = 0
+
+    def game(self, snapshot):
+        # The scratch game, restored to snapshot
+        if self.scratch is None:
+            self.scratch = self.game_class.from_snapshot(snapshot)
+        else:
+            self.scratch.restore(snapshot)
+        if self.reseed:
+            self.scratch.rng.seed(self.rng.getrandbits(64))
+        return self.scratch
+
+    def playout(self, game, depth, policy, first_action=None):
+        # Discounted return of one playout from game's current state
+        value = 0.0
+        discount = 1.0
+        action = first_action
+        for tick in range(depth):
+            if tick or action is None:
+                action = policy(game)
+            reward, done = game.step(action)
+            self.steps += 1
+            if done:
+                self.deaths += 1
+                return value - discount * self.death_penalty
+            value += discount * reward
+            discount *= self.gamma
+        return value
+
+    def run(self, snapshot, k=32, depth=50, policy=None, first_action=None):
+        # Returns of k playouts from snapshot
+        policy = policy or random_policy(self.rng)
+        values = []
+        for _ in range(k):
+            values.append(self.playout(self.game(snapshot), depth, policy, first_action))
+        self.playouts += k
+        return values
+
+    def estimate(self, snapshot, k=32, depth=50, policy=None, first_action=None):
+        # Mean and standard error of the playout returns, and how many died
+        deaths = self.deaths
+        values = self.run(snapshot, k, depth, policy, first_action)
+        mean = sum(values) / len(values)
+        variance = sum((v - mean) ** 2 for v in values) / max(1, len(values) - 1)
+        return {"mean": mean, "stderr": (variance / len(values)) ** 0.5, "deaths": self.deaths - deaths}
+
+    def action_values(self, game, k=16, depth=40, policy=None):
+        # {action: estimate} for every action but reversing
+        snapshot = game.snapshot()
+        heading = game.snake.direction
+        return {action: self.estimate(snapshot, k, depth, policy, action)
+                for action, direction in enumerate(snake_core.ACTIONS)
+                if not snake_core.is_reverse(direction, heading)}
+
+    def best_action(self, game, k=16, depth=40, policy=None):
+        values = self.action_values(game, k, depth, policy)
+        return max(values, key=lambda action: values[action]["mean"])
+
+
+def bench_fork(game, repeat):
+    # Calls per second of snapshot(), restore() and from_snapshot()
+    snapshot = game.snapshot()
+    scratch = type(game).from_snapshot(snapshot)
+    results = {"bytes": len(snapshot)}
+    for name, fn in (("snapshot", game.snapshot),
+                     ("restore", lambda: scratch.restore(snapshot)),
+                     ("from_snapshot", lambda: type(game).from_snapshot(snapshot))):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        results[name] = repeat / (time.perf_counter() - start)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play headless games choosing moves by random rollouts")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--rollouts", type=int, default=16, help="playouts per action")
+    parser.add_argument("--depth", type=int, default=40, help="ticks per playout")
+    parser.add_argument("--max-ticks", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    planner = Rollouts(seed=args.seed)
+    scores = []
+    start = time.perf_counter()
+    for seed in range(args.seed, args.seed + args.games):
+        game = snake_core.Game(seed=seed)
+        for _ in range(args.max_ticks):
+            _, done = game.step(planner.best_action(game, args.rollouts, args.depth))
+            if done:
+                break
+        scores.append(game.score)
+    elapsed = time.perf_counter() - start
+    print(f"scores: {scores} (mean {sum(scores) / len(scores):.1f})")
+    print(f"{planner.playouts} playouts, {planner.steps} steps in {elapsed:.1f}s "
+          f"({planner.playouts / elapsed:,.0f} playouts/s, {planner.steps / elapsed:,.0f} steps/s)")
+    fork = bench_fork(game, 5000)
+    print(f"snapshot {fork['bytes']} bytes: " + ", ".join(f"{name} {fork[name]:,.0f}/s"
+                                                         for name in ("snapshot", "restore", "from_snapshot")))
@@ -0,0 +1,656 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import struct
+import sys
+import time
+import traceback
+from collections import deque
+
+import snake_core
+from snake_profiler import RingBuffer
+
+# Authoritative multiplayer server. Every room is one shared board with a
+# snake per player, stepped by the snake_core rules (Snake, FoodSystem,
+# LevelSystem, Effects) at a fixed tick rate. All rooms run on one asyncio
+# event loop. Players only send turns; each tick the server sends every
+# player the same compact delta of what changed, never the whole board.
+#
+#   python snake_server.py --port 8765
+#   python snake_loadgen.py --rooms 50 --players 4 --seconds 30
+#
+# Rooms keep a keyframe (the full room state) made every KEYFRAME ticks
+# plus the deltas since. A player who joins late, or whose connection fell
+# behind and missed deltas, gets that keyframe and those deltas and is
+# then up to date.
+#
+# Wire format, little endian. Over plain TCP every message is a u32
+# length and then the payload. Browsers can connect to the same port with
+# WebSocket and get one binary message per payload.
+#
+#   client -> server
+#     b"J" room:utf8       join a room (created on first join)
+#     b"T" action:u8       turn, an index into snake_core.ACTIONS
+#     b"S"                 ask for server stats
+#
+#   server -> client
+#     b"W" id:u16          welcome, your player id
+#     b"K" keyframe        tick:u32 cols:u16 rows:u16, then
+#                          players:u16 x (id:u16 score:u32 level:u16 length:u32
+#                                         length x (x:u16 y:u16), head first)
+#                          pickups:u16 x (x:u16 y:u16 kind:u8)
+#     b"D" delta           tick:u32, then ops (below) until the end
+#     b"S" stats:json
+#     b"E" error:utf8      e.g. the room is full; the server hangs up
+#
+#   delta ops
+#     MOVE   id:u16 code:u8    head moved one cell in ACTIONS[code & 3];
+#                              the tail stays put when code & 4 (grew)
+#     SPAWN  id:u16 x:u16 y:u16
+#     DIE    id:u16             (the snake is gone, the player stays)
+#     LEAVE  id:u16
+#     PICKUP x:u16 y:u16 kind:u8  (kind 0 food, 1 + POWERUP_TYPES index)
+#     TAKEN  x:u16 y:u16          (eaten or expired)
+#     SCORE  id:u16 score:u32 level:u16
+
+LENGTH = struct.Struct("<I")
+MAX_MESSAGE = 64 * 1024  # From clients, which only send a few bytes
+
+TICK = struct.Struct("<cI")
+WELCOME = struct.Struct("<cH")
+BOARD = struct.Struct("<HH")
+COUNT = struct.Struct("<H")
+PLAYER = struct.Struct("<HIHI")
+CELL = struct.Struct("<HH")
+ITEM = struct.Struct("<HHB")
+
+MOVE, SPAWN, DIE, LEAVE, PICKUP, TAKEN, SCORE = range(1, 8)
+OPS = {
+    MOVE: struct.Struct("<BHB"),
+    SPAWN: struct.Struct("<BHHH"),
+    DIE: struct.Struct("<BH"),
+    LEAVE: struct.Struct("<BH"),
+    PICKUP: struct.Struct("<BHHB"),
+    TAKEN: struct.Struct("<BHH"),
+    SCORE: struct.Struct("<BHIH"),
+}
+
+HEADINGS = {direction: i for i, direction in enumerate(snake_core.ACTIONS)}
+
+
+def pickup_kind(entity):
+    return 0 if entity.kind == "food" else 1 + snake_core.POWERUP_TYPES.index(entity.type)
+
+
+class RoomSnake(snake_core.Snake):
+    # A snake that starts on a given cell instead of the board centre
+    def __init__(self, board, cell):
+        self.start = cell
+        super().__init__(board)
+
+    def reset(self):
+        super().reset()
+        self.board.vacate(self.positions[0])
+        self.positions = deque([self.start])
+        self.board.occupy(self.start)
+
+
+class Player:
+    def __init__(self, pid, conn, rng):
+        self.id = pid
+        self.conn = conn
+        self.snake = None
+        self.score = 0
+        self.level_system = snake_core.LevelSystem(rng)
+        self.effects = snake_core.Effects()
+        self.turns = snake_core.TurnQueue()
+        self.respawn_tick = 0
+        self.behind = False  # Missed deltas, needs the keyframe again
+
+
+class Room:
+    # One shared board. Every snake moves once per tick, so speed power-ups
+    # can't change a snake's pace here; they score like score_multiplier.
+    # A snake that crashes (into itself, another snake or head-on) leaves the
+    # board and its player respawns after respawn_ticks.
+    powerup_chance = 0.3
+    respawn_ticks = 10
+
+    def __init__(self, name, cols=snake_core.COLS, rows=snake_core.ROWS, tick_rate=10,
+                 max_players=8, keyframe_interval=100, seed=None, window=600):
+        self.name = name
+        self.cols = cols
+        self.rows = rows
+        self.tick_ms = 1000 / tick_rate
+        self.max_players = max_players
+        self.keyframe_interval = keyframe_interval
+        self.rng = random.Random(seed)
+        self.board = snake_core.Board(cols, rows, self.rng)
+        self.food_system = snake_core.FoodSystem(self.board, self.clock)
+        self.foods = set()  # Food kept on the board, one per player
+        self.players = {}
+        self.next_id = 0
+        self.ticks = 0
+        self.time_ms = 0
+        self.ops = bytearray()
+        self.keyframe = None
+        self.backlog = []  # Deltas since the keyframe
+        self.task = None
+        self.closed = False
+        self.jitter = RingBuffer(window)  # How late each tick started (ms)
+        self.step_times = RingBuffer(window)
+        self.bytes_sent = 0
+        self.skipped = 0
+        self.resyncs = 0
+        self.refill_food()
+        self.make_keyframe()
+
+    def clock(self):
+        return self.time_ms
+
+    def emit(self, op, *fields):
+        self.ops += OPS[op].pack(op, *fields)
+
+    def refill_food(self):
+        while len(self.foods) < max(1, len(self.players)):
+            food = snake_core.Food(self.board)
+            if not self.food_system.place(food):
+                break
+            self.foods.add(food)
+
+    def join(self, conn):
+        # Returns the new Player, or None when the room is full. The player
+        # gets the keyframe and backlog now and live deltas from next tick.
+        if len(self.players) >= self.max_players:
+            return None
+        # Ids go round all 16 bits before one is used again, skipping any
+        # still held (there are at most max_players of those)
+        pid = self.next_id
+        while pid in self.players:
+            pid = (pid + 1) % 65536
+        self.next_id = (pid + 1) % 65536
+        player = self.players[pid] = Player(pid, conn, self.rng)
+        conn.send(WELCOME.pack(b"W", pid))
+        self.send_keyframe(player)
+        return player
+
+    def leave(self, player):
+        if self.players.pop(player.id, None) is None:
+            return
+        if player.snake is not None:
+            self.remove_snake(player)
+        self.emit(LEAVE, player.id)
+
+    def remove_snake(self, player):
+        for cell in player.snake.positions:
+            self.board.vacate(cell)
+        player.snake = None
+        player.effects = snake_core.Effects()
+
+    def spawn(self, player):
+        # On a free cell that has no pickup
+        for _ in range(8):
+            cell = self.board.random_free_cell()
+            if cell is None:
+                return False
+            if cell not in self.food_system.pickups:
+                break
+        else:
+            return False
+        player.snake = RoomSnake(self.board, cell)
+        player.snake.direction = snake_core.ACTIONS[self.rng.randrange(4)]
+        player.turns.clear()
+        self.emit(SPAWN, player.id, *cell)
+        return True
+
+    def step(self):
+        # Advance one tick; the changes collect in self.ops
+        self.ticks += 1
+        self.time_ms += self.tick_ms
+        pickups = self.food_system.pickups
+        before = dict(pickups.by_cell)
+        players = list(self.players.values())
+
+        for player in players:
+            if player.snake is None and self.ticks >= player.respawn_tick:
+                self.spawn(player)
+
+        alive = [player for player in players if player.snake is not None]
+        for player in alive:
+            snake = player.snake
+            turn = player.turns.pop(snake.direction)
+            if turn is not None:
+                snake.change_direction(turn)
+            grew = snake.grow_pending
+            snake.move()
+            self.emit(MOVE, player.id, HEADINGS[snake.direction] | (4 if grew else 0))
+            player.effects.expire(self.time_ms)
+
+        # Decide every crash before removing any snake, so a head-on
+        # collision takes out both
+        board = self.board
+        crashed = [player for player in alive
+                   if board.count(player.snake.positions[0]) > 1 and "shield" not in player.effects]
+        for player in crashed:
+            self.remove_snake(player)
+            player.respawn_tick = self.ticks + self.respawn_ticks
+            self.emit(DIE, player.id)
+
+        food_system = self.food_system
+        for player in alive:
+            if player.snake is None:
+                continue
+            pickup = food_system.take(player.snake.positions[0])
+            if pickup is None:
+                continue
+            start_score = player.score
+            if pickup.kind == "food":
+                player.snake.grow()
+                player.score += 1
+                if pickup in self.foods:
+                    self.foods.discard(pickup)
+                    if self.rng.random() < self.powerup_chance:
+                        food_system.spawn_powerup()
+            elif pickup.type == "shield":
+                player.effects.start("shield", self.time_ms, snake_core.EFFECT_DURATIONS["shield"])
+            else:
+                player.score += 5
+            if player.score != start_score:
+                player.level_system.update(player.score)
+                self.emit(SCORE, player.id, player.score, player.level_system.level)
+
+        food_system.update()
+        self.refill_food()
+
+        # Pickup changes, found by comparing the board before and after
+        after = pickups.by_cell
+        for cell, entity in before.items():
+            if after.get(cell) is not entity:
+                self.emit(TAKEN, *cell)
+        for cell, entity in after.items():
+            if before.get(cell) is not entity:
+                self.emit(PICKUP, *cell, pickup_kind(entity))
+
+    def make_keyframe(self):
+        out = bytearray(TICK.pack(b"K", self.ticks))
+        out += BOARD.pack(self.cols, self.rows)
+        out += COUNT.pack(len(self.players))
+        for player in self.players.values():
+            positions = player.snake.positions if player.snake is not None else ()
+            out += PLAYER.pack(player.id, player.score, player.level_system.level, len(positions))
+            for cell in positions:
+                out += CELL.pack(*cell)
+        pickups = self.food_system.pickups
+        out += COUNT.pack(len(pickups))
+        for entity in pickups:
+            out += ITEM.pack(*entity.position, pickup_kind(entity))
+        self.keyframe = bytes(out)
+        self.backlog = []
+
+    def send(self, player, payload):
+        player.conn.send(payload)
+        self.bytes_sent += len(payload)
+
+    def send_keyframe(self, player):
+        self.send(player, self.keyframe)
+        for delta in self.backlog:
+            self.send(player, delta)
+        player.behind = False
+
+    def broadcast(self):
+        delta = TICK.pack(b"D", self.ticks) + self.ops
+        self.ops = bytearray()
+        self.backlog.append(delta)
+        if self.ticks % self.keyframe_interval == 0:
+            self.make_keyframe()
+        for player in self.players.values():
+            if player.conn.congested():
+                # Don't queue more on a connection that isn't draining;
+                # it catches up from the keyframe once it does
+                player.behind = True
+                self.skipped += 1
+            elif player.behind:
+                self.send_keyframe(player)
+                self.resyncs += 1
+            else:
+                self.send(player, delta)
+
+    async def run(self):
+        # Ticks on a fixed schedule while anyone is in the room. A tick
+        # that starts late doesn't move the ones after it, unless the
+        # loop fell a whole tick behind.
+        loop = asyncio.get_running_loop()
+        interval = self.tick_ms / 1000
+        next_tick = loop.time()
+        try:
+            while self.players:
+                next_tick += interval
+                delay = next_tick - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                elif delay < -interval:
+                    next_tick = loop.time()
+                start = loop.time()
+                self.jitter.add((start - next_tick) * 1000)
+                self.step()
+                self.broadcast()
+                self.step_times.add((loop.time() - start) * 1000)
+        finally:
+            self.closed = True
+
+
+class Connection:
+    # Length-prefixed messages over a TCP stream. `header` is the first
+    # length prefix if the server already read it.
+    max_buffer = 256 * 1024  # Bytes queued before a client counts as behind
+
+    def __init__(self, reader, writer, header=None):
+        self.reader = reader
+        self.writer = writer
+        self.header = header
+
+    async def recv(self):
+        # Next message, or None once the client is gone
+        try:
+            header = self.header or await self.reader.readexactly(LENGTH.size)
+            self.header = None
+            size = LENGTH.unpack(header)[0]
+            if size > MAX_MESSAGE:
+                return None
+            return await self.reader.readexactly(size)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return None
+
+    def send(self, payload):
+        self.writer.write(LENGTH.pack(len(payload)) + payload)
+
+    def congested(self):
+        return self.writer.transport.get_write_buffer_size() > self.max_buffer
+
+    def close(self):
+        self.writer.close()
+
+
+class WebSocketConnection(Connection):
+    # RFC 6455, binary messages only; enough for the browser client
+    GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+    async def handshake(self, request_start):
+        try:
+            request = request_start + await self.reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            return False
+        key = None
+        for line in request.split(b"\r\n")[1:]:
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"sec-websocket-key":
+                key = value.strip()
+        if key is None:
+            self.writer.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+            return False
+        accept = base64.b64encode(hashlib.sha1(key + self.GUID).digest())
+        self.writer.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                          b"Connection: Upgrade\r\nSec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+        return True
+
+    async def recv(self):
+        message = bytearray()
+        try:
+            while True:
+                first, second = await self.reader.readexactly(2)
+                opcode = first & 0x0F
+                size = second & 0x7F
+                if size == 126:
+                    size = int.from_bytes(await self.reader.readexactly(2), "big")
+                elif size == 127:
+                    size = int.from_bytes(await self.reader.readexactly(8), "big")
+                if size + len(message) > MAX_MESSAGE:
+                    return None
+                mask = await self.reader.readexactly(4) if second & 0x80 else None
+                data = await self.reader.readexactly(size)
+                if mask:
+                    key = (mask * (size // 4 + 1))[:size]
+                    data = (int.from_bytes(data, "little") ^ int.from_bytes(key, "little")).to_bytes(size, "little")
+                if opcode == 0x8:
+                    # Answer the close with the same status code, as RFC
+                    # 6455 asks, then hang up
+                    self.frame(0x8, data[:2])
+                    return None
+                if opcode == 0x9:
+                    self.frame(0xA, data)  # Pong
+                    continue
+                if opcode == 0xA:
+                    continue
+                message += data
+                if first & 0x80:
+                    return bytes(message)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return None
+
+    def frame(self, opcode, payload):
+        size = len(payload)
+        if size < 126:
+            header = bytes((0x80 | opcode, size))
+        elif size < 65536:
+            header = bytes((0x80 | opcode, 126)) + size.to_bytes(2, "big")
+        else:
+            header = bytes((0x80 | opcode, 127)) + size.to_bytes(8, "big")
+        self.writer.write(header + payload)
+
+    def send(self, payload):
+        self.frame(0x2, payload)
+
+
+class GameServer:
+    def __init__(self, cols=snake_core.COLS, rows=snake_core.ROWS, tick_rate=10, max_players=8,
+                 keyframe_interval=100, seed=None):
+        self.options = {"cols": cols, "rows": rows, "tick_rate": tick_rate,
+                        "max_players": max_players, "keyframe_interval": keyframe_interval}
+        self.rng = random.Random(seed)
+        self.rooms = {}
+        self.started = time.perf_counter()
+        self.connections = 0
+        self.retired = {"ticks": 0, "bytes_sent": 0, "skipped": 0, "resyncs": 0}
+
+    def room(self, name):
+        room = self.rooms.get(name)
+        if room is None or room.closed:
+            room = self.rooms[name] = Room(name, seed=self.rng.randrange(2**32), **self.options)
+        return room
+
+    def start_room(self, room):
+        room.task = asyncio.create_task(room.run())
+        room.task.add_done_callback(lambda task: self.close_room(room, task))
+
+    def close_room(self, room, task=None):
+        if self.rooms.get(room.name) is room:
+            del self.rooms[room.name]
+        for key in self.retired:
+            self.retired[key] += getattr(room, key)
+        if task is not None and not task.cancelled() and task.exception() is not None:
+            # The tick loop crashed. Hang up on everyone still in the room
+            # so their clients reconnect to a fresh one instead of waiting
+            # for ticks that will never come
+            exc = task.exception()
+            print(f"room {room.name!r} stopped: {exc!r}", file=sys.stderr)
+            traceback.print_exception(type(exc), exc, exc.__traceback__)
+            for player in list(room.players.values()):
+                player.conn.close()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            start = await reader.readexactly(4)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        if start == b"GET ":
+            conn = WebSocketConnection(reader, writer)
+            if not await conn.handshake(start):
+                conn.close()
+                return
+        else:
+            conn = Connection(reader, writer, start)
+
+        player = room = None
+        try:
+            while True:
+                message = await conn.recv()
+                if message is None:  # Gone; an empty message is just ignored
+                    break
+                kind = message[:1]
+                if kind == b"T" and player is not None and len(message) == 2 and message[1] < 4:
+                    snake = player.snake
+                    player.turns.push(snake_core.ACTIONS[message[1]], "net",
+                                      snake.direction if snake is not None else None)
+                elif kind == b"S":
+                    conn.send(b"S" + json.dumps(self.stats()).encode())
+                elif kind == b"J" and player is None:
+                    room = self.room(message[1:].decode("utf-8", "replace"))
+                    player = room.join(conn)
+                    if player is None:
+                        conn.send(b"E" + b"room is full")
+                        break
+                    if room.task is None:
+                        self.start_room(room)
+                await writer.drain()
+        finally:
+            if player is not None:
+                room.leave(player)
+            conn.close()
+
+    def stats(self):
+        rooms = list(self.rooms.values())
+        jitter = sorted(v for room in rooms for v in room.jitter.values())
+        step_times = sorted(v for room in rooms for v in room.step_times.values())
+        totals = {key: value + sum(getattr(room, key) for room in rooms) for key, value in self.retired.items()}
+        return {
+            "rooms": len(rooms),
+            "players": sum(len(room.players) for room in rooms),
+            "connections": self.connections,
+            **totals,
+            "jitter_p50_ms": round(snake_core.percentile(jitter, 50), 3),
+            "jitter_p99_ms": round(snake_core.percentile(jitter, 99), 3),
+            "jitter_max_ms": round(jitter[-1], 3) if jitter else 0.0,
+            "step_mean_ms": round(sum(step_times) / len(step_times), 4) if step_times else 0.0,
+            "step_p99_ms": round(snake_core.percentile(step_times, 99), 4),
+            "cpu_s": round(time.process_time(), 3),
+            "uptime_s": round(time.perf_counter() - self.started, 3),
+        }
+
+
+class RoomView:
+    # A client's copy of a room, rebuilt from the keyframe and kept up to
+    # date by applying deltas. Ops for unknown snakes or pickups count as
+    # errors (they mean a missed delta).
+    def __init__(self):
+        self.tick = None
+        self.cols = self.rows = 0
+        self.you = None
+        self.snakes = {}
+        self.scores = {}
+        self.pickups = {}
+        self.errors = 0
+
+    def apply(self, payload):
+        kind = payload[:1]
+        if kind == b"W":
+            self.you = WELCOME.unpack(payload)[1]
+        elif kind == b"K":
+            self.load(payload)
+        elif kind == b"D":
+            self.apply_delta(payload)
+        return kind
+
+    def load(self, payload):
+        _, self.tick = TICK.unpack_from(payload)
+        offset = TICK.size
+        self.cols, self.rows = BOARD.unpack_from(payload, offset)
+        offset += BOARD.size
+        self.snakes = {}
+        self.scores = {}
+        (count,) = COUNT.unpack_from(payload, offset)
+        offset += COUNT.size
+        for _ in range(count):
+            pid, score, level, length = PLAYER.unpack_from(payload, offset)
+            offset += PLAYER.size
+            self.scores[pid] = (score, level)
+            if length:
+                self.snakes[pid] = deque(CELL.iter_unpack(payload[offset:offset + length * CELL.size]))
+                offset += length * CELL.size
+        (count,) = COUNT.unpack_from(payload, offset)
+        offset += COUNT.size
+        self.pickups = {(x, y): kind for x, y, kind in ITEM.iter_unpack(payload[offset:offset + count * ITEM.size])}
+
+    def apply_delta(self, payload):
+        _, tick = TICK.unpack_from(payload)
+        if self.tick is None or tick <= self.tick:
+            return  # Already in the keyframe
+        if tick != self.tick + 1:
+            self.errors += 1
+        self.tick = tick
+        offset = TICK.size
+        snakes, pickups = self.snakes, self.pickups
+        while offset < len(payload):
+            op = payload[offset]
+            fields = OPS[op].unpack_from(payload, offset)
+            offset += OPS[op].size
+            if op == MOVE:
+                body = snakes.get(fields[1])
+                if body is None:
+                    self.errors += 1
+                    continue
+                dx, dy = snake_core.ACTIONS[fields[2] & 3]
+                x, y = body[0]
+                body.appendleft(((x + dx) % self.cols, (y + dy) % self.rows))
+                if not fields[2] & 4:
+                    body.pop()
+            elif op == SPAWN:
+                snakes[fields[1]] = deque([(fields[2], fields[3])])
+                self.scores.setdefault(fields[1], (0, 1))
+            elif op == DIE:
+                if snakes.pop(fields[1], None) is None:
+                    self.errors += 1
+            elif op == LEAVE:
+                snakes.pop(fields[1], None)
+                self.scores.pop(fields[1], None)
+            elif op == PICKUP:
+                pickups[fields[1], fields[2]] = fields[3]
+            elif op == TAKEN:
+                if pickups.pop((fields[1], fields[2]), None) is None:
+                    self.errors += 1
+            else:
+                self.scores[fields[1]] = fields[2:]
+
+
+async def serve(host, port, **options):
+    server = GameServer(**options)
+    listener = await asyncio.start_server(server.handle, host, port)
+    print(f"snake server on {', '.join(str(s.getsockname()) for s in listener.sockets)}", flush=True)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Authoritative multiplayer snake server (TCP and WebSocket)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cols", type=int, default=snake_core.COLS)
+    parser.add_argument("--rows", type=int, default=snake_core.ROWS)
+    parser.add_argument("--tick-rate", type=float, default=10, help="room ticks per second")
+    parser.add_argument("--max-players", type=int, default=8, help="players per room")
+    parser.add_argument("--keyframe", type=int, default=100, help="ticks between room keyframes")
+    parser.add_argument("--seed", type=int, help="seed for the rooms' RNGs")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, cols=args.cols, rows=args.rows, tick_rate=args.tick_rate,
+                          max_players=args.max_players, keyframe_interval=args.keyframe, seed=args.seed))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+import argparse
+import queue
+import random
+import sqlite3
+import sys
+import threading
+import time
+
+# Finished games in a local SQLite database, for the leaderboard and a
+# high score that survives restarts. The game thread only puts a tuple on
+# a queue; a writer thread owns the connection and inserts whatever has
+# queued up in one transaction, so the loop never waits on the disk.
+#
+#   python snake_store.py top --mode autopilot --difficulty Hard
+#   python snake_store.py bench --records 2000000   # insert and query rates
+#
+# Leaderboard queries walk an index already in (score desc, id) order and
+# stop after n rows, so they cost the same with ten rows or ten million.
+
+DEFAULT_PATH = "snake_sessions.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    finished_at REAL NOT NULL,     -- unix time
+    score INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    level INTEGER NOT NULL,
+    control_mode TEXT NOT NULL,    -- keyboard, finger or autopilot
+    difficulty TEXT NOT NULL,      -- Easy, Medium or Hard, from the final length
+    duration_ms INTEGER NOT NULL,  -- game time, not counting pauses
+    ticks INTEGER NOT NULL,
+    powerups_used INTEGER NOT NULL,
+    outcome TEXT NOT NULL,         -- crash, restart or quit
+    seed INTEGER
+);
+CREATE INDEX IF NOT EXISTS games_by_mode_difficulty ON games (control_mode, difficulty, score DESC, id);
+CREATE INDEX IF NOT EXISTS games_by_mode ON games (control_mode, score DESC, id);
+CREATE INDEX IF NOT EXISTS games_by_score ON games (score DESC, id);
+"""
+
+COLUMNS = ("finished_at", "score", "length", "level", "control_mode", "difficulty",
+           "duration_ms", "ticks", "powerups_used", "outcome", "seed")
+INSERT = f"INSERT INTO games ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+
+def connect(path):
+    connection = sqlite3.connect(path)
+    # WAL: readers (the leaderboard) don't block the writer and commits
+    # don't fsync the whole database
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def top_query(n, control_mode=None, difficulty=None):
+    # Every filter combination has an index in ORDER BY order
+    where, params = [], []
+    if control_mode is not None:
+        where.append("control_mode = ?")
+        params.append(control_mode)
+    if difficulty is not None:
+        if control_mode is None:
+            raise ValueError("difficulty needs a control mode")
+        where.append("difficulty = ?")
+        params.append(difficulty)
+    sql = f"SELECT id, {', '.join(COLUMNS)} FROM games"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql + " ORDER BY score DESC, id LIMIT ?", params + [n]
+
+
+def game_record(game, control_mode, outcome):
+    return (time.time(), game.score, game.snake.length, game.level_system.level, control_mode,
+            game.snake.difficulty, int(game.time_ms), game.ticks, game.powerups_used, outcome, game.seed)
+
+
+class SessionStore:
+    # batch_size: most records per transaction
+    # flush_interval: longest a record waits for others to share its commit
+    def __init__(self, path=DEFAULT_PATH, batch_size=500, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.SimpleQueue()
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_error = None
+        # Create the schema here so a bad path fails at startup, not later
+        # on the writer thread
+        self.reader = connect(path)
+        self.thread = threading.Thread(target=self.write_loop, daemon=True)
+        self.thread.start()
+
+    def record(self, game, control_mode, outcome="crash"):
+        # Never blocks: the writer thread picks it up
+        self.queue.put(game_record(game, control_mode, outcome))
+
+    def add(self, row):
+        # A record as a tuple in COLUMNS order
+        self.queue.put(row)
+
+    def write_loop(self):
+        connection = connect(self.path)
+        running = True
+        while running:
+            batch = []
+            waiting = []  # flush() callers to wake once this batch is in
+            item = self.queue.get()
+            deadline = time.perf_counter() + self.flush_interval
+            while True:
+                if item is None:
+                    running = False
+                elif isinstance(item, threading.Event):
+                    waiting.append(item)
+                else:
+                    batch.append(item)
+                if not running or waiting or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+            if batch:
+                self.write(connection, batch)
+            for event in waiting:
+                event.set()
+        connection.close()
+
+    def write(self, connection, batch):
+        try:
+            with connection:
+                connection.executemany(INSERT, batch)
+            self.written += len(batch)
+            self.batches += 1
+        except sqlite3.Error as exc:
+            # Lose the batch rather than the game
+            self.errors += 1
+            self.last_error = repr(exc)
+            print(f"session store: dropped {len(batch)} records: {exc}", file=sys.stderr)
+
+    def flush(self):
+        # Waits until everything recorded so far is committed
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.reader.close()
+
+    def high_score(self, control_mode=None):
+        if control_mode is None:
+            row = self.reader.execute("SELECT MAX(score) FROM games").fetchone()
+        else:
+            row = self.reader.execute("SELECT MAX(score) FROM games WHERE control_mode = ?",
+                                      (control_mode,)).fetchone()
+        return row[0] or 0
+
+    def top(self, n=10, control_mode=None, difficulty=None):
+        # Best n games, optionally for one control mode and difficulty
+        sql, params = top_query(n, control_mode, difficulty)
+        cursor = self.reader.execute(sql, params)
+        names = [column[0] for column in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+    def query_plan(self, n=10, control_mode=None, difficulty=None):
+        # How SQLite runs top(), to check it stays on an index
+        sql, params = top_query(n, control_mode, difficulty)
+        return [row[-1] for row in self.reader.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+    def count(self):
+        return self.reader.execute("SELECT COUNT(*) FROM games").fetchone()[0]
+
+    def stats(self):
+        return {"written": self.written, "batches": self.batches, "errors": self.errors,
+                "pending": self.queue.qsize()}
+
+
+def synthetic_rows(count, rng):
+    # Plausible games: mostly short, a long tail of good ones
+    modes = ("keyboard", "finger", "autopilot")
+    now = time.time()
+    for i in range(count):
+        length = 1 + int(rng.expovariate(1 / 12))
+        score = length - 1 + 5 * rng.randrange(3)
+        difficulty = "Easy" if length < 10 else "Medium" if length < 20 else "Hard"
+        ticks = length * 40 + rng.randrange(400)
+        yield (now - count + i, score, length, 1 + score // 15, rng.choice(modes), difficulty,
+               ticks * 100, ticks, rng.randrange(4), rng.choice(("crash", "crash", "restart")), i)
+
+
+def bench(path, records, seed):
+    store = SessionStore(path, batch_size=5000)
+    rng = random.Random(seed)
+    before = store.count()
+    start = time.perf_counter()
+    # The game thread's share: handing records over
+    for row in synthetic_rows(records, rng):
+        store.add(row)
+    enqueue_s = time.perf_counter() - start
+    store.flush()
+    insert_s = time.perf_counter() - start
+
+    timings = {}
+    for label, args in (("top", ()), ("top.mode", ("autopilot",)),
+                        ("top.mode_difficulty", ("autopilot", "Hard")), ("top.rare", ("finger", "Easy"))):
+        start = time.perf_counter()
+        for _ in range(200):
+            store.top(10, *args)
+        timings[label] = (time.perf_counter() - start) / 200 * 1000
+    start = time.perf_counter()
+    for _ in range(200):
+        store.high_score()
+    timings["high_score"] = (time.perf_counter() - start) / 200 * 1000
+
+    report = {
+        "records": store.count(),
+        "inserted": store.count() - before,
+        "enqueue_us_per_record": round(enqueue_s / records * 1e6, 3),
+        "inserts_per_s": round(records / insert_s),
+        "batches": store.batches,
+    }
+    report.update({f"{label}_ms": round(ms, 4) for label, ms in timings.items()})
+    report["plan.mode_difficulty"] = store.query_plan(10, "autopilot", "Hard")
+    store.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Leaderboard and records of finished snake games")
+    parser.add_argument("--db", default=DEFAULT_PATH, help="database (snake_game.py --store)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    top_parser = commands.add_parser("top", help="best games")
+    top_parser.add_argument("-n", type=int, default=10)
+    top_parser.add_argument("--mode", choices=("keyboard", "finger", "autopilot"))
+    top_parser.add_argument("--difficulty", choices=("Easy", "Medium", "Hard"))
+    bench_parser = commands.add_parser("bench", help="bulk insert synthetic games, then time the queries")
+    bench_parser.add_argument("--records", type=int, default=1_000_000)
+    bench_parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        for key, value in bench(args.db, args.records, args.seed).items():
+            print(f"{key}: {value}")
+        return
+    if args.difficulty and not args.mode:
+        parser.error("--difficulty needs --mode")
+    store = SessionStore(args.db)
+    rows = store.top(args.n, args.mode, args.difficulty)
+    print(f"{store.count()} games, high score {store.high_score(args.mode)}")
+    for rank, row in enumerate(rows, 1):
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(row["finished_at"]))
+        print(f"{rank:>3}. {row['score']:>5}  length {row['length']:>4}  level {row['level']:>3}  "
+              f"{row['control_mode']:<9} {row['difficulty']:<6} {row['duration_ms'] / 1000:>7.1f}s  "
+              f"power-ups {row['powerups_used']:>3}  {row['outcome']:<7} {when}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+import argparse
+import json
+import os
+import random
+import struct
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import snake_core
+from snake_autopilot import Autopilot
+
+# Plays many seeded headless games across a process pool to compare agents
+# and rule variants (level targets, speed bumps, power-up odds):
+#
+#   python snake_tournament.py --games 100000
+#   python snake_tournament.py --agent autopilot --agent random \
+#       --variant default --variant steep:target_step=10,speed_bump=2 \
+#       --output results.json
+#
+# Work is split into shards of consecutive seeds. A worker sends a shard's
+# results back as packed RECORD structs, one per game, and the parent
+# folds them into histograms as they arrive. If a worker dies, the pool is
+# rebuilt and the shards that were in flight are played again.
+
+DEFAULT_RULES = {"target_step": 15, "speed_bump": 1, "powerup_chance": 0.3}
+AGENTS = ("autopilot", "random")
+CAUSES = ("collision", "board_full", "max_ticks")
+
+# seed, score, length, level, ticks, cause
+RECORD = struct.Struct("<IIIHIB")
+
+_game_classes = {}
+
+
+def game_class(rules):
+    # Game subclass with the variant's rules plugged in, built once per worker
+    key = tuple(sorted(rules.items()))
+    cls = _game_classes.get(key)
+    if cls is None:
+        level_class = type("LevelSystem", (snake_core.LevelSystem,),
+                           {"target_step": rules["target_step"]})
+        cls = _game_classes[key] = type("Game", (snake_core.Game,), {
+            "level_class": level_class,
+            "level_speed_bump": rules["speed_bump"],
+            "powerup_chance": rules["powerup_chance"],
+        })
+    return cls
+
+
+def play_game(game, agent, seed, max_ticks, autopilot=None):
+    # autopilot: the Autopilot bound to `game`, reused from game to game
+    game.reset(seed)
+    if agent == "autopilot":
+        next_action = autopilot.next_turn
+    else:
+        # Random walk: turns on about one tick in ten
+        rng = random.Random(seed ^ 0x5EED)
+        def next_action():
+            return rng.randrange(4) if rng.random() < 0.1 else None
+
+    cause = 2
+    for _ in range(max_ticks):
+        _, done = game.step(next_action())
+        if done:
+            cause = 0
+            break
+        if not game.board.free_cells:
+            cause = 1
+            break
+    return RECORD.pack(seed, game.score, game.snake.length, game.level_system.level, game.ticks, cause)
+
+
+def play_shard(shard):
+    # Runs in a worker. shard: (variant, rules, agent, first_seed, count,
+    # cols, rows, max_ticks, budget_ms); returns the packed records.
+    _, rules, agent, first_seed, count, cols, rows, max_ticks, budget_ms = shard
+    game = game_class(rules)(cols, rows)
+    autopilot = Autopilot(game, budget_ms) if agent == "autopilot" else None
+    out = bytearray()
+    for seed in range(first_seed, first_seed + count):
+        out += play_game(game, agent, seed, max_ticks, autopilot)
+    return bytes(out)
+
+
+def run_shards(shards, workers, on_result, retries=2):
+    # Plays every shard on a pool of `workers` processes, calling
+    # on_result(shard, records) as each one finishes. At most two shards
+    # per worker are in flight. When a worker dies those shards are
+    # suspects: each is replayed alone on a one-process pool, so a crash
+    # there is its own and counts against its `retries`.
+    # Returns [(shard, reason)] for shards that never completed.
+    queue = deque(range(len(shards)))
+    suspects = deque()
+    attempts = [0] * len(shards)
+    failed = []
+
+    def retry(i, reason):
+        attempts[i] += 1
+        if attempts[i] > retries:
+            failed.append((shards[i], reason))
+        else:
+            queue.append(i)
+
+    def run_pool(pending, width):
+        # Returns the shards that were in flight if a worker died
+        pool = ProcessPoolExecutor(width)
+        running = {}
+        try:
+            while pending or running:
+                while pending and len(running) < 2 * width:
+                    i = pending.popleft()
+                    running[pool.submit(play_shard, shards[i])] = i
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = running.pop(future)
+                    try:
+                        records = future.result()
+                    except BrokenProcessPool:
+                        running[future] = i
+                        raise
+                    except Exception as exc:
+                        retry(i, repr(exc))
+                    else:
+                        on_result(shards[i], records)
+        except BrokenProcessPool:
+            return list(running.values())
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        return []
+
+    while queue or suspects:
+        if suspects:
+            i = suspects.popleft()
+            for i in run_pool(deque([i]), 1):
+                retry(i, "worker process died")
+        else:
+            crashed = run_pool(queue, workers)
+            if crashed:
+                print(f"worker died, replaying {len(crashed)} shard(s) one at a time", file=sys.stderr)
+                suspects.extend(crashed)
+    return failed
+
+
+def counter_percentile(counter, total, p):
+    # Nearest-rank percentile of a value -> count histogram
+    rank = max(1, round(p / 100 * total))
+    seen = 0
+    for value in sorted(counter):
+        seen += counter[value]
+        if seen >= rank:
+            return value
+    return None
+
+
+class Results:
+    # Histograms per (variant, agent)
+    def __init__(self, tick_bin=100):
+        self.tick_bin = tick_bin
+        self.groups = {}
+
+    def add(self, shard, records):
+        key = (shard[0], shard[2])
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = {
+                "games": 0, "score": Counter(), "length": Counter(), "level": Counter(),
+                "ticks": Counter(), "cause": Counter(), "score_total": 0, "ticks_total": 0,
+            }
+        tick_bin = self.tick_bin
+        for _, score, length, level, ticks, cause in RECORD.iter_unpack(records):
+            group["games"] += 1
+            group["score"][score] += 1
+            group["length"][length] += 1
+            group["level"][level] += 1
+            group["ticks"][ticks // tick_bin * tick_bin] += 1
+            group["cause"][CAUSES[cause]] += 1
+            group["score_total"] += score
+            group["ticks_total"] += ticks
+
+    def games(self):
+        return sum(group["games"] for group in self.groups.values())
+
+    def summary(self):
+        rows = []
+        for (variant, agent), group in sorted(self.groups.items()):
+            games = group["games"]
+            rows.append({
+                "variant": variant,
+                "agent": agent,
+                "games": games,
+                "score_mean": round(group["score_total"] / games, 2),
+                "score_p50": counter_percentile(group["score"], games, 50),
+                "score_p95": counter_percentile(group["score"], games, 95),
+                "score_max": max(group["score"]),
+                "level_mean": round(sum(k * v for k, v in group["level"].items()) / games, 2),
+                "ticks_mean": round(group["ticks_total"] / games, 1),
+                "causes": dict(group["cause"]),
+            })
+        return rows
+
+    def histograms(self):
+        return {f"{variant}/{agent}": {
+                    name: {str(k): v for k, v in sorted(group[name].items())}
+                    for name in ("score", "length", "level", "ticks", "cause")}
+                for (variant, agent), group in sorted(self.groups.items())}
+
+
+def parse_variant(text):
+    # "name" or "name:key=value,key=value"; unset keys keep the defaults
+    name, _, spec = text.partition(":")
+    rules = dict(DEFAULT_RULES)
+    for item in filter(None, spec.split(",")):
+        key, _, value = item.partition("=")
+        if key not in DEFAULT_RULES:
+            raise argparse.ArgumentTypeError(f"unknown rule {key!r} (expected one of {', '.join(DEFAULT_RULES)})")
+        rules[key] = type(DEFAULT_RULES[key])(value)
+    return name, rules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless snake tournament across a process pool")
+    parser.add_argument("--games", type=int, default=10000, help="games per agent and variant")
+    parser.add_argument("--agent", action="append", choices=AGENTS,
+                        help="agent to play (repeatable, default: autopilot)")
+    parser.add_argument("--variant", action="append", type=parse_variant,
+                        help="rule variant NAME[:target_step=N,speed_bump=N,powerup_chance=P] (repeatable)")
+    parser.add_argument("--seed", type=int, default=0, help="first seed; games use consecutive seeds")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--shard", type=int, default=50, help="games per work unit")
+    parser.add_argument("--cols", type=int, default=snake_core.COLS)
+    parser.add_argument("--rows", type=int, default=snake_core.ROWS)
+    parser.add_argument("--max-ticks", type=int, default=20000, help="end a game after this many ticks")
+    parser.add_argument("--budget", type=float, default=float("inf"),
+                        help="autopilot planning budget per tick in ms (default unlimited, so runs "
+                             "are reproducible)")
+    parser.add_argument("--retries", type=int, default=2, help="retries for a shard whose worker died")
+    parser.add_argument("--output", help="write summary and histograms as JSON here")
+    args = parser.parse_args()
+
+    agents = args.agent or ["autopilot"]
+    variants = args.variant or [("default", dict(DEFAULT_RULES))]
+    shards = [(name, rules, agent, first, min(args.shard, args.seed + args.games - first),
+               args.cols, args.rows, args.max_ticks, args.budget)
+              for name, rules in variants
+              for agent in agents
+              for first in range(args.seed, args.seed + args.games, args.shard)]
+
+    results = Results()
+    start = time.perf_counter()
+    failed = run_shards(shards, args.workers, results.add, args.retries)
+    elapsed = time.perf_counter() - start
+
+    games = results.games()
+    print(f"{games} games in {elapsed:.1f}s on {args.workers} workers ({games / elapsed:,.0f} games/s)")
+    print(f"{'variant':<14}{'agent':<11}{'games':>8}{'score':>8}{'p50':>6}{'p95':>6}{'max':>6}"
+          f"{'level':>7}{'ticks':>9}  causes")
+    summary = results.summary()
+    for row in summary:
+        print(f"{row['variant']:<14}{row['agent']:<11}{row['games']:>8}{row['score_mean']:>8}"
+              f"{row['score_p50']:>6}{row['score_p95']:>6}{row['score_max']:>6}{row['level_mean']:>7}"
+              f"{row['ticks_mean']:>9}  {row['causes']}")
+    for shard, reason in failed:
+        print(f"FAILED {shard[0]}/{shard[2]} seeds {shard[3]}-{shard[3] + shard[4] - 1}: {reason}",
+              file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"variants": dict(variants), "summary": summary, "histograms": results.histograms(),
+                       "failed": [[s[0], s[2], s[3], s[4], reason] for s, reason in failed]}, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import os
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import snake_core  # noqa: E402
+import snake_feed  # noqa: E402
+
+
+@pytest.fixture
+def name(request):
+    # A block name of its own per test, removed if the test left it behind
+    name = f"snake_feed_test_{os.getpid()}_{request.node.name}"[:60]
+    yield name
+    try:
+        stale = snake_feed.shared_memory.SharedMemory(name)
+    except FileNotFoundError:
+        return
+    stale.close()
+    stale.unlink()
+
+
+def test_frames_match_the_game(name):
+    game = snake_core.Game(20, 15, seed=4)
+    writer = snake_feed.FeedWriter(game.cols, game.rows, name=name, slots=4)
+    reader = snake_feed.FeedReader(name)
+    rng = random.Random(4)
+    try:
+        assert reader.latest() is None
+        for _ in range(200):
+            _, done = game.step(rng.randrange(4) if rng.random() < 0.2 else None)
+            writer.publish(game)
+            frame = reader.wait(timeout=1.0, copy=True)
+            assert frame.valid()
+            assert bytes(frame.grid.tobytes()) == bytes(game.observe())
+            assert (frame.tick, frame.score, frame.length) == (game.ticks, game.score, game.snake.length)
+            assert frame.head == game.snake.positions[0]
+            assert frame.food == game.food.position
+            if done:
+                game.reset()
+        assert reader.missed == 0
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_slow_reader_skips_ahead_and_sees_laps(name):
+    game = snake_core.Game(10, 10, seed=1)
+    writer = snake_feed.FeedWriter(game.cols, game.rows, name=name, slots=4)
+    reader = snake_feed.FeedReader(name)
+    try:
+        writer.publish(game)
+        held = reader.latest()  # Zero-copy: a view into slot 0
+        assert held.valid()
+        for _ in range(3):
+            game.step(None)
+            writer.publish(game)
+        assert held.valid()  # Slots 1-3 were used, slot 0 is untouched
+        game.step(None)
+        writer.publish(game)  # Frame 5 goes back into slot 0
+        assert not held.valid()
+
+        newest = reader.latest()
+        assert newest.number == 5 and newest.tick == game.ticks
+        assert reader.missed == 3
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_sequence_numbers_mark_finished_frames(name):
+    game = snake_core.Game(10, 10, seed=2)
+    writer = snake_feed.FeedWriter(game.cols, game.rows, name=name, slots=2)
+    try:
+        writer.publish(game)
+        # Sequence numbers: 2n when frame n is done, in slot (n - 1) % slots
+        assert list(writer.seq) == [2, 0]
+        game.step(None)
+        writer.publish(game)
+        assert list(writer.seq) == [2, 4]
+        assert writer.published() == 2
+    finally:
+        writer.close()
+
+
+def test_second_writer_is_refused_while_the_first_runs(name):
+    writer = snake_feed.FeedWriter(10, 10, name=name)
+    try:
+        with pytest.raises(FileExistsError):
+            snake_feed.FeedWriter(10, 10, name=name)
+        reader = snake_feed.FeedReader(name)  # Still there and readable
+        assert int(reader.header["pid"][0]) == os.getpid()
+        reader.close()
+    finally:
+        writer.close()
+
+
+def test_block_of_a_dead_writer_is_reclaimed(name):
+    writer = snake_feed.FeedWriter(10, 10, name=name)
+    # Pretend the writer crashed: no close(), and a pid that is gone
+    writer.header["pid"] = 2 ** 31 - 2
+    writer.release()
+    snake_feed.writing.discard(name)
+    new = snake_feed.FeedWriter(12, 8, name=name)
+    try:
+        assert (new.cols, new.rows) == (12, 8)
+        assert int(new.header["pid"][0]) == os.getpid()
+    finally:
+        new.close()
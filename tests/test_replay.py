@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+import snake_core
+import snake_replay
+
+
+def record(path, seed=7, ticks=400, resets=(150,)):
+    # Plays a session with random turns, writing it as the game loop does
+    game = snake_core.Game(20, 15, seed=seed)
+    writer = snake_replay.ReplayWriter(path, seed, game.cols, game.rows)
+    writer.mode("keyboard")
+    rng = random.Random(seed)
+    for tick in range(ticks):
+        if tick in resets:
+            game.reset()
+            writer.reset()
+        if tick == ticks // 2:
+            writer.mode("autopilot")
+        _, done = game.step(rng.randrange(4) if rng.random() < 0.2 else None)
+        writer.tick(game.snake.direction)
+        if tick % 50 == 0:
+            writer.check(game)
+        if done:
+            game.reset()
+            writer.reset()
+    writer.close(game)
+    return game
+
+
+def test_round_trip_replays_every_check(tmp_path):
+    path = tmp_path / "session.snkr"
+    game = record(path)
+    report = snake_replay.play(path)
+    assert report["mismatches"] == []
+    assert report["checks"] >= 9
+    assert report["ticks"] == 400
+    assert report["final_score"] == game.score
+    assert not report["truncated"]
+    assert sum(report["ticks_by_mode"].values()) == 400
+
+
+def test_events_decode_runs_and_ops(tmp_path):
+    path = tmp_path / "runs.snkr"
+    writer = snake_replay.ReplayWriter(path, 3, 10, 10)
+    writer.mode("finger")
+    for _ in range(300):  # A run long enough to need a two-byte varint
+        writer.tick(snake_core.RIGHT)
+    writer.tick(snake_core.UP)
+    writer.reset()
+    writer.close()
+    events = list(snake_replay.ReplayReader(path).events())
+    right, up = snake_core.ACTIONS.index(snake_core.RIGHT), snake_core.ACTIONS.index(snake_core.UP)
+    assert events == [("mode", "finger"), ("run", right, 300), ("run", up, 1), ("reset",), ("end",)]
+
+
+def test_truncated_file_replays_up_to_the_cut(tmp_path):
+    path = tmp_path / "cut.snkr"
+    record(path)
+    data = path.read_bytes()
+    path.write_bytes(data[:len(data) // 2])
+    report = snake_replay.play(path)
+    assert report["truncated"]
+    assert report["mismatches"] == []
+    assert 0 < report["ticks"] < 400
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "junk.snkr"
+    path.write_bytes(b"not a replay at all")
+    with pytest.raises(ValueError):
+        snake_replay.ReplayReader(path)
@@ -0,0 +1,58 @@
+import asyncio
+
+import snake_server
+from snake_server import LENGTH
+
+
+async def connect(server):
+    # A TCP client on a fresh local listener for server
+    listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    return listener, reader, writer
+
+
+def send(writer, payload):
+    writer.write(LENGTH.pack(len(payload)) + payload)
+
+
+async def receive(reader):
+    header = await asyncio.wait_for(reader.readexactly(LENGTH.size), 2)
+    return await asyncio.wait_for(reader.readexactly(LENGTH.unpack(header)[0]), 2)
+
+
+def test_empty_message_keeps_the_connection():
+    async def run():
+        server = snake_server.GameServer(tick_rate=50)
+        listener, reader, writer = await connect(server)
+        send(writer, b"Jroom")
+        assert (await receive(reader))[:1] == b"W"
+        send(writer, b"")
+        send(writer, b"S")
+        while (await receive(reader))[:1] != b"S":
+            pass  # Ticks until the stats reply
+        writer.close()
+        listener.close()
+
+    asyncio.run(run())
+
+
+def test_crashed_room_hangs_up_on_its_players(monkeypatch, capsys):
+    def broken(room):
+        raise RuntimeError("boom")
+
+    async def run():
+        server = snake_server.GameServer(tick_rate=50)
+        listener, reader, writer = await connect(server)
+        send(writer, b"Jroom")
+        assert (await receive(reader))[:1] == b"W"
+        monkeypatch.setattr(snake_server.Room, "step", broken)
+        # Whatever was queued, then EOF rather than silence
+        while await asyncio.wait_for(reader.read(4096), 2):
+            pass
+        assert "room" not in str(server.rooms)
+        writer.close()
+        listener.close()
+
+    asyncio.run(run())
+    assert "boom" in capsys.readouterr().err
@@ -0,0 +1,103 @@
+import random
+
+import snake_core
+import snake_server
+
+
+class FakeConn:
+    # Keeps what the room sends; congested while `blocked` is set
+    def __init__(self):
+        self.view = snake_server.RoomView()
+        self.blocked = False
+
+    def send(self, payload):
+        self.view.apply(payload)
+
+    def congested(self):
+        return self.blocked
+
+
+def truth(room):
+    snakes = {player.id: list(player.snake.positions)
+              for player in room.players.values() if player.snake is not None}
+    pickups = {entity.position: snake_server.pickup_kind(entity) for entity in room.food_system.pickups}
+    scores = {player.id: (player.score, player.level_system.level) for player in room.players.values()}
+    return snakes, pickups, scores
+
+
+def seen(view):
+    return ({pid: list(body) for pid, body in view.snakes.items()}, view.pickups,
+            {pid: tuple(score) for pid, score in view.scores.items()})
+
+
+def play(room, ticks, rng, conns, before_tick=None):
+    for tick in range(ticks):
+        if before_tick is not None:
+            before_tick(tick)
+        for player in room.players.values():
+            if player.snake is not None and rng.random() < 0.3:
+                player.turns.push(snake_core.ACTIONS[rng.randrange(4)], "net", player.snake.direction)
+        room.step()
+        room.broadcast()
+        for conn in conns:
+            if not conn.blocked:
+                assert seen(conn.view) == truth(room)
+                assert conn.view.tick == room.ticks
+
+
+def test_deltas_rebuild_the_room_from_the_keyframe():
+    room = snake_server.Room("t", cols=16, rows=12, keyframe_interval=25, seed=3)
+    conns = [FakeConn() for _ in range(3)]
+    for conn in conns:
+        room.join(conn)
+    play(room, 300, random.Random(3), conns)
+    assert all(conn.view.errors == 0 for conn in conns)
+    assert [conn.view.you for conn in conns] == list(room.players)
+
+
+def test_late_joiner_catches_up_from_keyframe_and_backlog():
+    room = snake_server.Room("t", cols=16, rows=12, keyframe_interval=40, seed=5)
+    first = FakeConn()
+    room.join(first)
+    rng = random.Random(5)
+    play(room, 57, rng, [first])  # Mid-way between keyframes
+    late = FakeConn()
+    room.join(late)
+    assert late.view.tick == room.ticks
+    assert seen(late.view)[:2] == truth(room)[:2]  # Its own score comes with its SPAWN
+    play(room, 100, rng, [first, late])
+    assert late.view.errors == 0
+
+
+def test_congested_client_resyncs_without_errors():
+    room = snake_server.Room("t", cols=16, rows=12, keyframe_interval=20, seed=9)
+    slow, steady = FakeConn(), FakeConn()
+    room.join(slow)
+    room.join(steady)
+
+    def congest(tick):
+        slow.blocked = 30 <= tick < 75
+
+    play(room, 150, random.Random(9), [slow, steady], congest)
+    assert room.resyncs == 1
+    assert slow.view.errors == 0
+
+
+def test_move_for_unknown_snake_counts_an_error():
+    view = snake_server.RoomView()
+    room = snake_server.Room("t", cols=8, rows=8, seed=1)
+    view.apply(room.keyframe)
+    delta = snake_server.TICK.pack(b"D", room.ticks + 1) + snake_server.OPS[snake_server.MOVE].pack(
+        snake_server.MOVE, 42, 0)
+    view.apply(delta)
+    assert view.errors == 1
+    assert 42 not in view.snakes
+
+
+def test_player_ids_skip_ones_in_use_when_they_wrap():
+    room = snake_server.Room("t", cols=8, rows=8, seed=1)
+    room.next_id = 65535
+    ids = [room.join(FakeConn()).id for _ in range(2)]
+    assert ids == [65535, 0]
+    room.next_id = 65535
+    assert room.join(FakeConn()).id == 1
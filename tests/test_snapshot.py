@@ -0,0 +1,89 @@
+import random
+
+import pytest
+
+import snake_core
+
+
+def played(seed=0, cols=12, rows=10):
+    # Plays until a power-up is both running and on the board, so the
+    # snapshot has every section filled in
+    game = snake_core.Game(cols, rows, seed=seed)
+    rng = random.Random(seed)
+    for _ in range(5000):
+        game.food_system.update()  # Ambient spawns, as the server's room loop does
+        _, done = game.step(rng.randrange(4) if rng.random() < 0.3 else None)
+        if done:
+            game.reset()
+        if game.effects.ends and game.food_system.pickups.count("powerup") and game.snake.length > 3:
+            return game
+    raise AssertionError("no power-up effect in 5000 ticks")
+
+
+def test_restore_gives_the_same_state_hash():
+    game = played()
+    snapshot = game.snapshot()
+    other = snake_core.Game(game.cols, game.rows, seed=99)
+    other.restore(snapshot)
+    assert other.state_hash() == game.state_hash()
+    assert other.snapshot() == snapshot
+
+
+def test_fork_plays_on_in_lockstep():
+    game = played()
+    fork = game.fork()
+    assert fork.state_hash() == game.state_hash()
+    rng = random.Random(1)
+    for _ in range(300):
+        action = rng.randrange(4)
+        assert game.step(action) == fork.step(action)
+        assert fork.state_hash() == game.state_hash()
+
+
+def test_snapshot_is_unaffected_by_later_play():
+    game = played()
+    snapshot = game.snapshot()
+    expected = game.state_hash()
+    for _ in range(50):
+        game.step(None)
+    assert snake_core.Game.from_snapshot(snapshot).state_hash() == expected
+
+
+def test_restore_into_a_reused_game_many_times():
+    # What rollout planners do: one scratch game, one shared snapshot
+    game = played()
+    snapshot = game.snapshot()
+    scratch = snake_core.Game.from_snapshot(snapshot)
+    rng = random.Random(2)
+    for _ in range(20):
+        for _ in range(30):
+            scratch.step(rng.randrange(4))
+        scratch.restore(snapshot)
+        assert scratch.state_hash() == game.state_hash()
+
+
+def test_restore_alternating_snapshots():
+    # Pickups and decoded state carried over from the last restore must not
+    # leak into the next one
+    game = played()
+    first, first_hash = game.snapshot(), game.state_hash()
+    rng = random.Random(3)
+    for _ in range(200):
+        game.food_system.update()
+        if game.step(rng.randrange(4))[1]:
+            game.reset()
+    second, second_hash = game.snapshot(), game.state_hash()
+    scratch = snake_core.Game(game.cols, game.rows)
+    for snapshot, expected in [(first, first_hash), (second, second_hash)] * 3:
+        scratch.restore(snapshot)
+        assert scratch.state_hash() == expected
+        assert scratch.snapshot() == snapshot
+        scratch.step(0)
+
+
+def test_restore_rejects_another_board_size():
+    snapshot = played().snapshot()
+    with pytest.raises(ValueError):
+        snake_core.Game(10, 10).restore(snapshot)
+    with pytest.raises(ValueError):
+        snake_core.Game().restore(b"XXXX" + snapshot[4:])